@@ -0,0 +1,165 @@
+"""
+================================================================================
+ANALYSIS ARTIFACT - TYPED HAND-OFF FROM THE ANALYZER TO THE SIMULATOR
+================================================================================
+
+portfolio_analyzer.py writes the tables the allocation simulator needs next
+to its workbook, so the simulator never re-parses the sheet layout of
+Portfolio_Analysis_Sheets.xlsx:
+
+    pair_stats           one row per (strategy, pair): Sharpe, trades, profit,
+                         drawdown, required capital, XIRR, trading period
+    pair_weights         pair weight % within its strategy, one column per
+                         allocation method
+    strategy_allocation  one row per strategy: totals, the selected pair
+                         method and the strategy weight % of every method
+
+Every table has a fixed column order and dtypes (TABLE_SCHEMAS), enforced
+when it is written, loaded or handed over in-process. manifest.json records
+ARTIFACT_VERSION; an artifact from another version is rejected instead of
+being misread.
+
+Tables are stored as Parquet when pyarrow is available, pickle otherwise.
+The artifact folder is generated output and is not tracked in git; run
+portfolio_analyzer.py to create it before using the simulator.
+
+USAGE:
+    from analysis_artifact import write_artifact, load_artifact
+    write_artifact(tables, 'Portfolio_Analysis_Artifact')
+    tables = load_artifact('Portfolio_Analysis_Artifact')
+
+================================================================================
+"""
+
+import pandas as pd
+import json
+import os
+from datetime import datetime
+
+try:
+    import pyarrow  # noqa: F401
+    ARTIFACT_FORMAT = 'parquet'
+except ImportError:
+    ARTIFACT_FORMAT = 'pickle'
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Folder written next to Portfolio_Analysis_Sheets.xlsx
+ARTIFACT_DIR = 'Portfolio_Analysis_Artifact'
+
+# Bump whenever a table's columns or meaning change
+ARTIFACT_VERSION = 1
+
+# Allocation methods, in the column order of the weight tables
+ALLOCATION_METHODS = ['Equal_Weight', 'Inverse_Volatility', 'Sharpe_Weighted', 'Risk_Parity',
+                      'Max_Sharpe', 'Max_Sharpe_MV', 'Risk_Parity_ERC', 'HRP']
+
+# table -> [(column, dtype)]; capitals, profits and drawdowns in the scaled
+# units of the stats sheets, weights in %
+TABLE_SCHEMAS = {
+    'pair_stats': [
+        ('strategy', 'str'),
+        ('display_name', 'str'),
+        ('pair', 'str'),
+        ('sharpe', 'float64'),
+        ('total_trades', 'int64'),
+        ('winning_trades', 'int64'),
+        ('losing_trades', 'int64'),
+        ('total_profit', 'float64'),
+        ('max_drawdown', 'float64'),
+        ('required_capital', 'float64'),
+        ('profit_factor', 'float64'),
+        ('xirr_pct', 'float64'),
+        ('trading_days', 'int64'),
+        ('start_date', 'datetime64[ns]'),
+        ('end_date', 'datetime64[ns]'),
+    ],
+    'pair_weights': [
+        ('strategy', 'str'),
+        ('pair', 'str'),
+    ] + [(method, 'float64') for method in ALLOCATION_METHODS],
+    'strategy_allocation': [
+        ('strategy', 'str'),
+        ('display_name', 'str'),
+        ('pairs', 'int64'),
+        ('sharpe', 'float64'),
+        ('total_profit', 'float64'),
+        ('required_capital', 'float64'),
+        ('max_drawdown', 'float64'),
+        ('pair_method', 'str'),
+    ] + [(method, 'float64') for method in ALLOCATION_METHODS],
+}
+
+
+# ============================================================================
+# SCHEMA ENFORCEMENT
+# ============================================================================
+
+def conform_tables(tables):
+    """
+    Cast {table: DataFrame} to TABLE_SCHEMAS (column order and dtypes).
+    Raises ValueError on a missing table or column.
+    """
+    conformed = {}
+    for name, schema in TABLE_SCHEMAS.items():
+        if name not in tables:
+            raise ValueError(f"Analysis artifact is missing table '{name}'")
+        df = tables[name]
+        missing = [column for column, _ in schema if column not in df.columns]
+        if missing:
+            raise ValueError(f"Analysis table '{name}' is missing column(s): {', '.join(missing)}")
+        df = df[[column for column, _ in schema]].reset_index(drop=True)
+        conformed[name] = df.astype(dict(schema))
+    return conformed
+
+
+# ============================================================================
+# PUBLIC API
+# ============================================================================
+
+def write_artifact(tables, artifact_dir):
+    """Write {table: DataFrame} and its manifest to artifact_dir; returns the folder"""
+    tables = conform_tables(tables)
+    os.makedirs(artifact_dir, exist_ok=True)
+    extension = '.parquet' if ARTIFACT_FORMAT == 'parquet' else '.pkl'
+    for name, df in tables.items():
+        data_path = os.path.join(artifact_dir, name + extension)
+        if ARTIFACT_FORMAT == 'parquet':
+            df.to_parquet(data_path, index=False)
+        else:
+            df.to_pickle(data_path)
+    manifest = {
+        'version': ARTIFACT_VERSION,
+        'format': ARTIFACT_FORMAT,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'tables': {name: {'file': name + extension, 'rows': len(df)} for name, df in tables.items()},
+    }
+    with open(os.path.join(artifact_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return artifact_dir
+
+
+def load_artifact(artifact_dir):
+    """
+    Load {table: DataFrame} written by write_artifact.
+    Raises FileNotFoundError without a manifest, ValueError on a version mismatch.
+    """
+    manifest_path = os.path.join(artifact_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"No analysis artifact in {artifact_dir} (run portfolio_analyzer.py)")
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != ARTIFACT_VERSION:
+        raise ValueError(f"Analysis artifact version {manifest.get('version')} in {artifact_dir}, "
+                         f"expected {ARTIFACT_VERSION} (re-run portfolio_analyzer.py)")
+
+    tables = {}
+    for name, entry in manifest.get('tables', {}).items():
+        data_path = os.path.join(artifact_dir, entry['file'])
+        if manifest.get('format') == 'parquet':
+            tables[name] = pd.read_parquet(data_path)
+        else:
+            tables[name] = pd.read_pickle(data_path)
+    return conform_tables(tables)
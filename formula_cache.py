@@ -0,0 +1,588 @@
+"""
+================================================================================
+FORMULA CACHE - CACHED VALUES FOR THE FORMULAS OUR WORKBOOKS EMIT
+================================================================================
+
+openpyxl writes formulas without a result, so any reader other than Excel
+(pandas, the simulator, dashboards) sees empty cells until the file has been
+opened and saved in Excel. save_workbook() evaluates every formula of a
+workbook in Python before saving and stores the result as the cell's cached
+value next to the formula.
+
+The evaluator covers the formula language the analyzers emit:
+
+    numbers, "strings", TRUE/FALSE, A1 / $A$1 / 'Sheet name'!A1 references,
+    A1:B9 ranges, + - * / ^ & = <> < > <= >= (ranges broadcast as arrays),
+    ROUND SUM AVERAGE MIN MAX ABS SQRT IF SUMIF COUNTIF SUMPRODUCT INDEX MATCH
+
+Blank cells count as 0 and errors (#DIV/0!, #N/A, ...) propagate as in Excel.
+A formula outside this subset keeps an empty cached value, and the workbook
+then still asks Excel for a full recalculation on load.
+
+Streamed (write-only) sheets keep no cells; their formulas are evaluated from
+the row values sheet_render kept while writing them.
+
+USAGE:
+    from formula_cache import save_workbook
+    save_workbook(wb, 'Portfolio_Analysis_Sheets.xlsx')
+
+================================================================================
+"""
+
+import numpy as np
+import math
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from datetime import date, datetime, time
+from decimal import Decimal, ROUND_HALF_UP
+from xml.sax.saxutils import escape
+from openpyxl.utils.cell import column_index_from_string, get_column_letter
+from openpyxl.utils.datetime import to_excel
+
+from sheet_render import kept_rows
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+      (?P<string>"(?:[^"]|"")*")
+    | (?P<func>[A-Z][A-Z0-9.]*)\s*\(
+    | (?P<ref>(?:(?:'(?:[^']|'')+'|[A-Za-z_][\w.]*)!)?\$?[A-Z]{1,3}\$?\d+(?::\$?[A-Z]{1,3}\$?\d+)?)
+    | (?P<bool>TRUE|FALSE)\b
+    | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<op><>|<=|>=|[-+*/^&=<>(),%])
+    )""", re.VERBOSE)
+
+CELL_PATTERN = re.compile(r"\$?([A-Z]{1,3})\$?(\d+)")
+
+COMPARISONS = {
+    '=': lambda a, b: a == b,
+    '<>': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '>': lambda a, b: a > b,
+    '<=': lambda a, b: a <= b,
+    '>=': lambda a, b: a >= b,
+}
+
+# Formula cells in the saved sheet XML (openpyxl writes an empty <v/>)
+FORMULA_CELL_PATTERN = re.compile(r'<c r="([A-Z]+\d+)"([^>]*)><f>(.*?)</f><v\s*/></c>', re.DOTALL)
+
+
+class FormulaError(Exception):
+    """An Excel error value (#DIV/0!, #N/A, #VALUE!, ...) raised during evaluation"""
+
+
+# ============================================================================
+# PARSER
+# ============================================================================
+# Formulas become nested tuples:
+#   ('value', v)  ('cell', sheet, row, col)  ('range', sheet, r1, c1, r2, c2)
+#   ('call', NAME, [args])  ('op', op, a, b)  ('neg', a)  ('percent', a)
+
+def tokenize(formula):
+    """(kind, text) tokens of a formula without its leading '='"""
+    tokens = []
+    pos = 0
+    text = formula.rstrip()
+    while pos < len(text):
+        match = TOKEN_PATTERN.match(text, pos)
+        if match is None or match.end() == pos:
+            raise ValueError(f"Cannot parse formula at {text[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+
+def parse_reference(text, sheet):
+    """('cell', ...) or ('range', ...) node of a reference token"""
+    if '!' in text:
+        sheet, text = text.rsplit('!', 1)
+        if sheet.startswith("'"):
+            sheet = sheet[1:-1].replace("''", "'")
+    corners = [CELL_PATTERN.fullmatch(part) for part in text.split(':')]
+    cells = [(int(m.group(2)), column_index_from_string(m.group(1))) for m in corners]
+    if len(cells) == 1:
+        return ('cell', sheet, *cells[0])
+    (r1, c1), (r2, c2) = cells
+    return ('range', sheet, min(r1, r2), min(c1, c2), max(r1, r2), max(c1, c2))
+
+
+def parse_formula(formula, sheet):
+    """Expression tree of a formula ('=...') on the given sheet"""
+    tokens = tokenize(formula[1:] if formula.startswith('=') else formula)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else (None, None)
+
+    def take(expected=None):
+        nonlocal pos
+        kind, text = peek()
+        if kind is None or (expected is not None and text != expected):
+            raise ValueError(f"Expected {expected or 'a value'} in {formula!r}")
+        pos += 1
+        return kind, text
+
+    def binary(operand, operators):
+        def parse():
+            node = operand()
+            while peek()[0] == 'op' and peek()[1] in operators:
+                op = take()[1]
+                node = ('op', op, node, operand())
+            return node
+        return parse
+
+    def unary():
+        if peek() == ('op', '-'):
+            take()
+            return ('neg', unary())
+        if peek() == ('op', '+'):
+            take()
+            return unary()
+        node = primary()
+        while peek() == ('op', '%'):
+            take()
+            node = ('percent', node)
+        return node
+
+    def primary():
+        kind, text = take()
+        if kind == 'number':
+            return ('value', float(text))
+        if kind == 'string':
+            return ('value', text[1:-1].replace('""', '"'))
+        if kind == 'bool':
+            return ('value', text == 'TRUE')
+        if kind == 'ref':
+            return parse_reference(text, sheet)
+        if kind == 'func':
+            args = []
+            if peek() != ('op', ')'):
+                args.append(expression())
+                while peek() == ('op', ','):
+                    take()
+                    args.append(expression())
+            take(')')
+            return ('call', text, args)
+        if (kind, text) == ('op', '('):
+            node = expression()
+            take(')')
+            return node
+        raise ValueError(f"Unexpected {text!r} in {formula!r}")
+
+    power = binary(unary, ('^',))
+    term = binary(power, ('*', '/'))
+    additive = binary(term, ('+', '-'))
+    concat = binary(additive, ('&',))
+    expression = binary(concat, tuple(COMPARISONS))
+
+    node = expression()
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected {tokens[pos][1]!r} in {formula!r}")
+    return node
+
+
+# ============================================================================
+# VALUES
+# ============================================================================
+
+def excel_value(value):
+    """A stored cell value as the evaluator sees it (dates as serial numbers)"""
+    if isinstance(value, (datetime, date, time)):
+        return to_excel(value)
+    if isinstance(value, (np.integer, np.floating)):
+        return float(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def to_number(value):
+    """Scalar as a number in arithmetic (blank = 0, numeric text parsed)"""
+    if isinstance(value, FormulaError):
+        raise value
+    if value is None:
+        return 0.0
+    if isinstance(value, (bool, np.bool_)):
+        return float(value)
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise FormulaError('#VALUE!')
+
+
+def to_array(value):
+    """Scalar or range as a float array for broadcast arithmetic"""
+    if isinstance(value, np.ndarray) and value.dtype == object:
+        return np.vectorize(to_number, otypes=[float])(value) if value.size else value.astype(float)
+    if isinstance(value, np.ndarray):
+        return value.astype(float)
+    return to_number(value)
+
+
+def numbers_in(values):
+    """Numeric entries of function arguments: ranges skip text, blanks and booleans"""
+    numbers = []
+    for value in values:
+        if isinstance(value, np.ndarray):
+            for item in value.ravel():
+                if isinstance(item, FormulaError):
+                    raise item
+                if isinstance(item, (int, float, np.number)) and not isinstance(item, (bool, np.bool_)):
+                    numbers.append(float(item))
+        else:
+            numbers.append(to_number(value))
+    return np.array(numbers, dtype=float)
+
+
+def compare_key(value):
+    """Excel ordering: numbers < text (case-insensitive) < booleans; blank = 0"""
+    if isinstance(value, FormulaError):
+        raise value
+    if value is None:
+        return (0, 0.0)
+    if isinstance(value, (bool, np.bool_)):
+        return (2, bool(value))
+    if isinstance(value, str):
+        return (1, value.lower())
+    return (0, float(value))
+
+
+def excel_round(value, digits):
+    """ROUND: half away from zero on the shortest decimal form, as Excel does"""
+    value = to_number(value)
+    if not math.isfinite(value):
+        return value
+    quantum = Decimal(1).scaleb(-int(to_number(digits)))
+    return float(Decimal(repr(value)).quantize(quantum, rounding=ROUND_HALF_UP))
+
+
+def criteria_test(criteria):
+    """Predicate of a SUMIF/COUNTIF criteria (">0", "<>", "text", 5, ...)"""
+    if isinstance(criteria, str):
+        match = re.match(r'(<>|<=|>=|=|<|>)?(.*)$', criteria, re.DOTALL)
+        op, operand = match.group(1) or '=', match.group(2)
+        if operand == '':
+            blank = lambda value: value is None or value == ''
+            return blank if op == '=' else (lambda value: not blank(value))
+        try:
+            operand = float(operand)
+        except ValueError:
+            pass
+    else:
+        op, operand = '=', criteria
+    compare = COMPARISONS[op]
+    target = compare_key(operand)
+
+    def test(value):
+        if value is None:
+            return False
+        key = compare_key(value)
+        if key[0] != target[0]:
+            return op == '<>'
+        return compare(key, target)
+    return test
+
+
+# ============================================================================
+# EVALUATION
+# ============================================================================
+
+def make_functions():
+    """Worksheet functions: name -> f(*evaluated args)"""
+    def sumproduct(*arrays):
+        arrays = [np.nan_to_num(to_array(array)) for array in arrays]
+        return float(np.sum(np.prod(np.broadcast_arrays(*arrays), axis=0)))
+
+    def average(*args):
+        numbers = numbers_in(args)
+        if len(numbers) == 0:
+            raise FormulaError('#DIV/0!')
+        return float(numbers.mean())
+
+    def sumif(cells, criteria, sum_cells=None):
+        sum_cells = cells if sum_cells is None else sum_cells
+        test = criteria_test(criteria)
+        total = 0.0
+        for value, amount in zip(cells.ravel(), sum_cells.ravel()):
+            if test(value) and isinstance(amount, (int, float)) and not isinstance(amount, bool):
+                total += amount
+        return total
+
+    def index(cells, row, col=None):
+        row = int(to_number(row))
+        col = 1 if col is None else int(to_number(col))
+        if cells.shape[0] == 1 and col == 1:
+            row, col = 1, row
+        if not (1 <= row <= cells.shape[0] and 1 <= col <= cells.shape[1]):
+            raise FormulaError('#REF!')
+        return cells[row - 1, col - 1]
+
+    def match(value, cells, match_type=1.0):
+        if to_number(match_type) != 0:
+            raise ValueError("Only exact MATCH (match_type 0) is supported")
+        key = compare_key(value)
+        for position, item in enumerate(cells.ravel(), start=1):
+            if item is not None and compare_key(item) == key:
+                return float(position)
+        raise FormulaError('#N/A')
+
+    def sqrt(value):
+        value = to_number(value)
+        if value < 0:
+            raise FormulaError('#NUM!')
+        return math.sqrt(value)
+
+    return {
+        'ROUND': excel_round,
+        'SUM': lambda *args: float(numbers_in(args).sum()),
+        'AVERAGE': average,
+        'MIN': lambda *args: float(numbers_in(args).min()) if len(numbers_in(args)) else 0.0,
+        'MAX': lambda *args: float(numbers_in(args).max()) if len(numbers_in(args)) else 0.0,
+        'ABS': lambda value: abs(to_number(value)),
+        'SQRT': sqrt,
+        'SUMIF': sumif,
+        'COUNTIF': lambda cells, criteria: float(sum(map(criteria_test(criteria), cells.ravel()))),
+        'SUMPRODUCT': sumproduct,
+        'INDEX': index,
+        'MATCH': match,
+    }
+
+
+def apply_operator(op, a, b):
+    """Binary operator on scalars, or element-wise when either side is a range"""
+    if op == '&':
+        return ''.join('' if v is None else ('%.15g' % v if isinstance(v, float) else str(v))
+                       for v in (to_scalar(a), to_scalar(b)))
+    if op in COMPARISONS:
+        return COMPARISONS[op](compare_key(to_scalar(a)), compare_key(to_scalar(b)))
+
+    x, y = to_array(a), to_array(b)
+    if op == '/':
+        if np.ndim(y) == 0 and y == 0:
+            raise FormulaError('#DIV/0!')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return x / y
+    if op == '^':
+        result = np.power(x, y)
+        if np.ndim(result) == 0 and not math.isfinite(result):
+            raise FormulaError('#NUM!')
+        return result
+    return {'+': np.add, '-': np.subtract, '*': np.multiply}[op](x, y)
+
+
+def to_scalar(value):
+    """Single value of a scalar or one-cell range"""
+    if isinstance(value, np.ndarray):
+        if value.size != 1:
+            raise FormulaError('#VALUE!')
+        value = value.ravel()[0]
+    if isinstance(value, FormulaError):
+        raise value
+    return value
+
+
+def is_formula(value):
+    """True for a cell value openpyxl writes as a formula"""
+    return isinstance(value, str) and value.startswith('=')
+
+
+def sheet_reader(ws):
+    """
+    (raw value of (row, col), [(row, col) of every formula]) of a worksheet;
+    streamed sheets are read from the rows sheet_render kept
+    """
+    rows = kept_rows(ws)
+    if rows is None:
+        cells = ws._cells
+
+        def read(row, col):
+            cell = cells.get((row, col))
+            return None if cell is None else cell.value
+
+        formulas = [key for key, cell in cells.items() if is_formula(cell.value)]
+    else:
+        def read(row, col):
+            if row > len(rows) or col > len(rows[row - 1]):
+                return None
+            return rows[row - 1][col - 1]
+
+        formulas = [(row, col) for row, values in enumerate(rows, 1)
+                    for col, value in enumerate(values, 1) if is_formula(value)]
+    return read, formulas
+
+
+def evaluate_formulas(wb):
+    """
+    Value of every formula cell of an openpyxl Workbook.
+    Returns ({(sheet title, coordinate): value or FormulaError}, unsupported formulas)
+    """
+    functions = make_functions()
+    readers = {ws.title: sheet_reader(ws) for ws in wb.worksheets}
+    values = {}
+    parsed = {}
+    in_progress = set()
+    unsupported = {}
+
+    def cell_value(sheet, row, col):
+        key = (sheet, row, col)
+        if key in values:
+            return values[key]
+        if sheet not in readers:
+            raise FormulaError('#REF!')
+        raw = readers[sheet][0](row, col)
+        if not is_formula(raw):
+            return excel_value(raw)
+        if key in in_progress:
+            raise FormulaError('#REF!')
+        in_progress.add(key)
+        try:
+            if key not in parsed:
+                parsed[key] = parse_formula(raw, sheet)
+            try:
+                result = to_scalar(evaluate(parsed[key]))
+                if isinstance(result, (float, np.floating)) and not math.isfinite(result):
+                    result = FormulaError('#NUM!')
+                elif isinstance(result, (np.floating, np.bool_)):
+                    result = result.item()
+            except FormulaError as error:
+                result = error
+        finally:
+            in_progress.discard(key)
+        values[key] = result
+        return result
+
+    def evaluate(node):
+        kind = node[0]
+        if kind == 'value':
+            return node[1]
+        if kind == 'cell':
+            value = cell_value(*node[1:])
+            if isinstance(value, FormulaError):
+                raise value
+            return value
+        if kind == 'range':
+            sheet, r1, c1, r2, c2 = node[1:]
+            cells = np.empty((r2 - r1 + 1, c2 - c1 + 1), dtype=object)
+            for r in range(r1, r2 + 1):
+                for c in range(c1, c2 + 1):
+                    cells[r - r1, c - c1] = cell_value(sheet, r, c)
+            return cells
+        if kind == 'neg':
+            return -to_array(evaluate(node[1]))
+        if kind == 'percent':
+            return to_array(evaluate(node[1])) / 100
+        if kind == 'op':
+            return apply_operator(node[1], evaluate(node[2]), evaluate(node[3]))
+        # Function call; IF evaluates only the branch it takes
+        name, args = node[1], node[2]
+        if name == 'IF':
+            condition = to_scalar(evaluate(args[0]))
+            if isinstance(condition, str):
+                raise FormulaError('#VALUE!')
+            if condition:
+                return evaluate(args[1]) if len(args) > 1 else True
+            return evaluate(args[2]) if len(args) > 2 else False
+        if name not in functions:
+            raise ValueError(f"Unsupported function {name}")
+        return functions[name](*(evaluate(arg) for arg in args))
+
+    for sheet, (_, formulas) in readers.items():
+        for row, col in formulas:
+            try:
+                cell_value(sheet, row, col)
+            except (ValueError, TypeError, RecursionError) as e:
+                unsupported[(sheet, f"{get_column_letter(col)}{row}")] = str(e)
+
+    results = {}
+    for (sheet, row, col), value in values.items():
+        coordinate = f"{get_column_letter(col)}{row}"
+        if is_formula(readers[sheet][0](row, col)) and (sheet, coordinate) not in unsupported:
+            results[(sheet, coordinate)] = value
+    return results, unsupported
+
+
+# ============================================================================
+# SAVING
+# ============================================================================
+
+def cached_value_xml(value):
+    """(type attribute, <v> text) of a cached formula result"""
+    if isinstance(value, FormulaError):
+        return ' t="e"', escape(str(value))
+    if isinstance(value, (bool, np.bool_)):
+        return ' t="b"', '1' if value else '0'
+    if isinstance(value, str):
+        return ' t="str"', escape(value)
+    if value is None:
+        return '', '0'
+    return '', repr(float(value))
+
+
+def sheet_parts(archive):
+    """Sheet title -> worksheet XML path inside a saved xlsx"""
+    workbook_xml = archive.read('xl/workbook.xml').decode('utf-8')
+    rels_xml = archive.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+    targets = {}
+    for rel in re.findall(r'<Relationship\b[^>]*/>', rels_xml):
+        rel_id = re.search(r'\bId="([^"]+)"', rel).group(1)
+        target = re.search(r'\bTarget="([^"]+)"', rel).group(1)
+        targets[rel_id] = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+    parts = {}
+    for sheet in re.findall(r'<sheet\b[^>]*/>', workbook_xml):
+        name = re.search(r'\bname="([^"]*)"', sheet).group(1)
+        rel_id = re.search(r'\br:id="([^"]+)"', sheet).group(1)
+        name = name.replace('&lt;', '<').replace('&gt;', '>').replace('&quot;', '"').replace('&apos;', "'").replace('&amp;', '&')
+        parts[name] = targets[rel_id]
+    return parts
+
+
+def write_cached_values(path, results):
+    """Fill the empty <v/> of every evaluated formula cell in a saved xlsx"""
+    by_sheet = {}
+    for (sheet, coordinate), value in results.items():
+        by_sheet.setdefault(sheet, {})[coordinate] = value
+
+    with zipfile.ZipFile(path) as archive:
+        parts = {part: by_sheet[sheet] for sheet, part in sheet_parts(archive).items() if sheet in by_sheet}
+        handle, temp_path = tempfile.mkstemp(suffix='.xlsx', dir=os.path.dirname(os.path.abspath(path)))
+        os.close(handle)
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as output:
+            for item in archive.infolist():
+                data = archive.read(item.filename)
+                if item.filename in parts:
+                    sheet_values = parts[item.filename]
+
+                    def fill(match):
+                        if match.group(1) not in sheet_values:
+                            return match.group(0)
+                        attributes = re.sub(r'\s+t="[^"]*"', '', match.group(2))
+                        type_attribute, text = cached_value_xml(sheet_values[match.group(1)])
+                        return (f'<c r="{match.group(1)}"{attributes}{type_attribute}>'
+                                f'<f>{match.group(3)}</f><v>{text}</v></c>')
+
+                    data = FORMULA_CELL_PATTERN.sub(fill, data.decode('utf-8')).encode('utf-8')
+                output.writestr(item, data)
+    shutil.move(temp_path, path)
+
+
+def save_workbook(wb, path):
+    """
+    Save an openpyxl Workbook with the cached value of every formula it can
+    evaluate. Excel is only asked to recalculate on load if some formula was
+    outside the supported subset. Returns (formulas cached, formulas left empty).
+    """
+    results, unsupported = evaluate_formulas(wb)
+    wb.calculation.fullCalcOnLoad = bool(unsupported)
+    wb.save(path)
+    if results:
+        write_cached_values(path, results)
+    return len(results), len(unsupported)
@@ -1,15 +1,113 @@
 """
 Portfolio Allocation Simulator - Dynamic Excel Version
 Generates an Excel sheet with formulas that automatically recalculate
-when starting balance is changed.
+when starting balance is changed, plus a historical replay of every pair's
+closed trades at the chosen allocation.
+
+USAGE:
+    python portfolio_allocation_simulator.py            (prompts for the balance)
+    python portfolio_allocation_simulator.py --balances 10000:100000:10000 [--methods equal,sharpe]
+        [--output grid.parquet] [--summary summary.xlsx]
+
+--balances runs without a prompt: every balance × allocation method scenario
+goes to one CSV/Parquet table plus a one-sheet summary workbook.
+
+Inputs come from the typed tables portfolio_analyzer.py writes to
+Portfolio_Analysis_Artifact/ (--artifact DIR to read another folder). That
+folder is generated and not tracked, so run portfolio_analyzer.py first
+(e.g. after a fresh clone). The tables can also be handed over in-process:
+    import portfolio_analyzer, portfolio_allocation_simulator as simulator
+    tables = portfolio_analyzer.main()
+    simulator.run_batch([10000, 50000], analysis=tables)
 """
 
 import pandas as pd
 import numpy as np
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, Protection
+import argparse
+from openpyxl.styles import Font, Alignment
 from openpyxl.utils import get_column_letter
 
+from analysis_artifact import load_artifact, conform_tables, ARTIFACT_DIR
+from formula_cache import save_workbook
+from sheet_render import new_workbook, new_sheet, write_row
+from portfolio_analyzer import stats_pair_trades, load_manifest, SCALING_FACTORS
+
+# Starting balances replayed side by side (multiples of the entered balance)
+REPLAY_BALANCE_MULTIPLES = [0.25, 0.5, 1, 2, 5, 10]
+
+# Broker volume limits of the replay: position sizes are rounded down to a
+# whole number of lot steps and trades under the minimum lot are not taken
+LOT_STEP = 0.01
+MIN_LOT = 0.01
+
+# Replay: scenarios sized per pass (trades x scenarios lot matrix)
+REPLAY_CHUNK_SCENARIOS = 256
+
+# Pair allocation methods shown as sheets (simulator keys -> sheet names)
+ALLOCATION_METHOD_NAMES = {
+    'equal': 'Equal Weight',
+    'inv_vol': 'Inv Volatility',
+    'sharpe': 'Sharpe Weighted',
+    'risk_parity': 'Risk Parity',
+    'max_sharpe': 'Max Sharpe'
+}
+
+# Batch mode: scenario rows listed on the summary sheet (the table file has all)
+SCENARIO_SHEET_MAX_ROWS = 1000
+
+# Named cell styles of the simulator workbooks (registered once per workbook)
+SHEET_STYLES = {
+    # Portfolio Allocation sheet
+    'Main Title': {'font': Font(bold=True, size=18, color="2F5496")},
+    'Main Section': {'font': Font(bold=True, size=14, color="FFFFFF"), 'fill': "2F5496"},
+    'Main Label': {'font': Font(bold=True, size=11)},
+    'Main Column Header': {'font': Font(bold=True, size=11), 'fill': "BDD7EE", 'border': 'thin',
+                           'alignment': Alignment(horizontal='center')},
+    'Main Column Header Wrap': {'font': Font(bold=True, size=11), 'fill': "BDD7EE", 'border': 'thin',
+                                'alignment': Alignment(horizontal='center', wrap_text=True)},
+    'Balance Label': {'font': Font(bold=True, size=14)},
+    'Balance Input': {'font': Font(bold=True, size=14, color="008000"), 'fill': "FFFF00",
+                      'border': 'medium', 'number_format': '$#,##0.00'},
+    'Bold': {'font': Font(bold=True)},
+    'Summary $': {'font': Font(bold=True), 'fill': "E2EFDA", 'number_format': '$#,##0.00'},
+    'Summary %': {'font': Font(bold=True), 'fill': "E2EFDA", 'number_format': '0.00%'},
+    # Method, replay and scenario sheets
+    'Title': {'font': Font(bold=True, size=16, color="2F5496")},
+    'Section': {'font': Font(bold=True, size=12, color="FFFFFF"), 'fill': "2F5496"},
+    'Label': {'font': Font(bold=True, size=10)},
+    'Column Header': {'font': Font(bold=True, size=10), 'fill': "BDD7EE", 'border': 'thin',
+                      'alignment': Alignment(horizontal='center')},
+    'Column Header Wrap': {'font': Font(bold=True, size=10), 'fill': "BDD7EE", 'border': 'thin',
+                           'alignment': Alignment(horizontal='center', wrap_text=True)},
+    'Linked Balance Label': {'font': Font(bold=True, size=12)},
+    'Linked Balance': {'font': Font(bold=True, size=12, color="008000"), 'fill': "E2EFDA",
+                       'number_format': '$#,##0.00'},
+    'Result $': {'font': Font(bold=True), 'fill': "C6EFCE", 'number_format': '$#,##0.00'},
+    'Result %': {'font': Font(bold=True), 'fill': "C6EFCE", 'number_format': '0.00%'},
+    'Grey Note': {'font': Font(italic=True, color="666666")},
+    'Red Note': {'font': Font(italic=True, color="FF0000")},
+    # Table cells
+    'Cell': {'border': 'thin'},
+    'Cell Center': {'border': 'thin', 'alignment': Alignment(horizontal='center')},
+    'Cell %': {'border': 'thin', 'number_format': '0.00%'},
+    'Cell % Center': {'border': 'thin', 'number_format': '0.00%', 'alignment': Alignment(horizontal='center')},
+    'Cell $': {'border': 'thin', 'number_format': '$#,##0.00'},
+    'Cell 0.00': {'border': 'thin', 'number_format': '0.00'},
+    'Cell Date': {'border': 'thin', 'number_format': 'yyyy-mm-dd'},
+    'Cell Date Center': {'border': 'thin', 'number_format': 'yyyy-mm-dd',
+                         'alignment': Alignment(horizontal='center')},
+    'Current Balance': {'font': Font(bold=True), 'fill': "FFFF00", 'border': 'thin',
+                        'number_format': '$#,##0.00'},
+    'Formula $': {'fill': "E2EFDA", 'border': 'thin', 'number_format': '$#,##0.00'},
+    'Formula %': {'fill': "E2EFDA", 'border': 'thin', 'number_format': '0.00%'},
+    'Total': {'font': Font(bold=True), 'fill': "C6EFCE", 'border': 'thin'},
+    'Total $': {'font': Font(bold=True), 'fill': "C6EFCE", 'border': 'thin', 'number_format': '$#,##0.00'},
+    'Total %': {'font': Font(bold=True), 'fill': "C6EFCE", 'border': 'thin', 'number_format': '0.00%'},
+    'Total Blank': {'fill': "C6EFCE", 'border': 'thin'},
+    'Date': {'number_format': 'yyyy-mm-dd'},
+    'Money': {'number_format': '$#,##0.00'},
+}
+
 # Strategy display names mapping (internal name -> display name)
 STRATEGY_DISPLAY_NAMES = {
     'AURUM': 'Black Dragon',
@@ -26,135 +124,60 @@ def get_strategy_display_name(internal_name):
     """Get display name for a strategy, fallback to internal name if not found."""
     return STRATEGY_DISPLAY_NAMES.get(internal_name, internal_name)
 
-def get_strategy_internal_name(display_name):
-    """Get internal name from display name, fallback to display name if not found."""
-    reverse_map = {v: k for k, v in STRATEGY_DISPLAY_NAMES.items()}
-    return reverse_map.get(display_name, display_name)
-
-
-def parse_strategy_statistics(xl):
-    """Parse the Strategy_Statistics sheet to extract pair-level data."""
-    df = pd.read_excel(xl, sheet_name='Strategy_Statistics', header=None)
-    
-    strategies = {}
-    current_strategy = None
-    
-    for idx, row in df.iterrows():
-        first_cell = str(row.iloc[0]) if pd.notna(row.iloc[0]) else ''
-        
-        if first_cell.startswith('Strategy:'):
-            display_name = first_cell.replace('Strategy:', '').strip()
-            # Convert display name back to internal name for lookups
-            current_strategy = get_strategy_internal_name(display_name)
-            strategies[current_strategy] = []
-        
-        elif current_strategy and pd.notna(row.iloc[1]) and row.iloc[1] != 'Sharpe_Ratio':
-            try:
-                sharpe = float(row.iloc[1]) if pd.notna(row.iloc[1]) else 0
-                total_trades = int(row.iloc[2]) if pd.notna(row.iloc[2]) else 0
-                total_profit = float(row.iloc[4]) if pd.notna(row.iloc[4]) else 0
-                max_dd = float(row.iloc[5]) if pd.notna(row.iloc[5]) else 0
-                profit_factor = float(row.iloc[10]) if pd.notna(row.iloc[10]) else 0
-                trading_days = int(row.iloc[11]) if pd.notna(row.iloc[11]) else 0
-                trading_years = trading_days / 365 if trading_days > 0 else 5
-                
-                if first_cell and first_cell != 'STRATEGY TOTAL':
-                    strategies[current_strategy].append({
-                        'pair': first_cell,
-                        'sharpe': sharpe,
-                        'total_trades': total_trades,
-                        'total_profit': total_profit,
-                        'max_dd': max_dd,
-                        'profit_factor': profit_factor,
-                        'trading_years': trading_years,
-                        'initial_capital': max_dd * 2
-                    })
-            except (ValueError, TypeError):
-                continue
-    
-    return strategies
-
-
-def parse_pair_allocation(xl):
-    """Parse the Pair_Capital_Distribution sheet to get allocation percentages."""
-    df = pd.read_excel(xl, sheet_name='Pair_Capital_Distribution', header=None)
-    
-    allocations = {}
-    current_strategy = None
-    
-    for idx, row in df.iterrows():
-        first_cell = str(row.iloc[0]) if pd.notna(row.iloc[0]) else ''
-        
-        if first_cell.startswith('STRATEGY:'):
-            display_name = first_cell.replace('STRATEGY:', '').strip()
-            display_name = display_name.split('(')[0].strip()
-            # Convert display name back to internal name for lookups
-            current_strategy = get_strategy_internal_name(display_name)
-            allocations[current_strategy] = {}
-        
-        elif current_strategy and pd.notna(row.iloc[0]) and row.iloc[0] not in ['Currency_Pair', 'TOTAL', '']:
-            try:
-                pair = str(row.iloc[0])
-                if pair and pair != 'nan':
-                    allocations[current_strategy][pair] = {
-                        'equal': float(row.iloc[1]) if pd.notna(row.iloc[1]) else 0,
-                        'inv_vol': float(row.iloc[2]) if pd.notna(row.iloc[2]) else 0,
-                        'sharpe': float(row.iloc[3]) if pd.notna(row.iloc[3]) else 0,
-                        'risk_parity': float(row.iloc[4]) if pd.notna(row.iloc[4]) else 0,
-                        'max_sharpe': float(row.iloc[5]) if pd.notna(row.iloc[5]) else 0,
-                    }
-            except (ValueError, TypeError):
-                continue
-    
-    return allocations
+# Analyzer allocation method -> simulator pair allocation key
+PAIR_METHOD_KEYS = {
+    'Equal_Weight': 'equal',
+    'Inverse_Volatility': 'inv_vol',
+    'Sharpe_Weighted': 'sharpe',
+    'Risk_Parity': 'risk_parity',
+    'Max_Sharpe': 'max_sharpe',
+    'Max_Sharpe_MV': 'max_sharpe_mv',
+    'Risk_Parity_ERC': 'risk_parity_erc',
+    'HRP': 'hrp'
+}
 
 
-def parse_strategy_allocation(xl):
-    """Parse the Strategy_Capital_Distribution sheet."""
-    df = pd.read_excel(xl, sheet_name='Strategy_Capital_Distribution', header=None)
-    
-    allocations = {}
-    
-    for idx, row in df.iterrows():
-        first_cell = str(row.iloc[0]) if pd.notna(row.iloc[0]) else ''
-        
-        if first_cell and first_cell not in ['Strategy', 'TOTAL', 'nan', '', 'NaN']:
-            if first_cell.startswith('STRATEGY') or first_cell.startswith('FINAL') or first_cell.startswith('Use'):
-                continue
-            try:
-                pairs = int(row.iloc[1]) if pd.notna(row.iloc[1]) else 0
-                sharpe = float(row.iloc[2]) if pd.notna(row.iloc[2]) else 0
-                capital_req = float(row.iloc[5]) if pd.notna(row.iloc[5]) else 0
-                profit = float(row.iloc[11]) if pd.notna(row.iloc[11]) else 0
-                
-                if pairs > 0:
-                    # Convert display name back to internal name for lookups
-                    internal_name = get_strategy_internal_name(first_cell)
-                    allocations[internal_name] = {
-                        'pairs': pairs,
-                        'sharpe': sharpe,
-                        'capital_req': capital_req,
-                        'profit': profit,
-                    }
-            except (ValueError, TypeError):
-                continue
+def analysis_from_tables(tables):
+    """
+    Simulator inputs from the analyzer tables (see analysis_artifact.py):
+    strategy_stats  {strategy: [pair dicts]}
+    pair_alloc      {strategy: {pair: {method key: weight %}}}
+    strategy_alloc  {strategy: {pairs, sharpe, capital_req, profit, pair_method}}
+    """
+    tables = conform_tables(tables)
+    
+    strategy_stats = {}
+    for row in tables['pair_stats'].itertuples(index=False):
+        strategy_stats.setdefault(row.strategy, []).append({
+            'pair': row.pair,
+            'sharpe': row.sharpe,
+            'total_trades': row.total_trades,
+            'total_profit': row.total_profit,
+            'max_dd': row.max_drawdown,
+            'profit_factor': row.profit_factor,
+            'trading_years': row.trading_days / 365 if row.trading_days > 0 else 5,
+            'initial_capital': row.required_capital
+        })
+    
+    pair_alloc = {}
+    weights = tables['pair_weights']
+    for i, (strategy, pair) in enumerate(zip(weights['strategy'], weights['pair'])):
+        pair_alloc.setdefault(strategy, {})[pair] = {
+            key: float(weights[method].iat[i]) for method, key in PAIR_METHOD_KEYS.items()
+        }
+    
+    strategy_alloc = {}
+    for row in tables['strategy_allocation'].itertuples(index=False):
+        if row.pairs > 0:
+            strategy_alloc[row.strategy] = {
+                'pairs': row.pairs,
+                'sharpe': row.sharpe,
+                'capital_req': row.required_capital,
+                'profit': row.total_profit,
+                'pair_method': PAIR_METHOD_KEYS.get(row.pair_method, 'equal'),
+            }
     
-    return allocations
-
-
-def get_pair_allocation_method(strategy_name):
-    """Return the pair-level allocation method for each strategy."""
-    methods = {
-        '7th_Strategy': 'sharpe',
-        'Falcon': 'risk_parity',
-        'Gold_Dip': 'risk_parity',
-        'RSI_Correlation': 'inv_vol',
-        'RSI_6_Trades': 'risk_parity',
-        'AURUM': 'risk_parity',
-        'PairTradingEA': 'max_sharpe',
-        'Reversal_Strategy': 'risk_parity'
-    }
-    return methods.get(strategy_name, 'equal')
+    return strategy_stats, pair_alloc, strategy_alloc
 
 
 def prepare_data(strategy_stats, pair_alloc, strategy_alloc):
@@ -167,7 +190,7 @@ def prepare_data(strategy_stats, pair_alloc, strategy_alloc):
     for strategy_name in strategy_alloc.keys():
         pairs_data = strategy_stats.get(strategy_name, [])
         pair_allocations = pair_alloc.get(strategy_name, {})
-        alloc_method = get_pair_allocation_method(strategy_name)
+        alloc_method = strategy_alloc[strategy_name]['pair_method']
         
         for pair_info in pairs_data:
             pair_name = pair_info['pair']
@@ -203,26 +226,259 @@ def prepare_data(strategy_stats, pair_alloc, strategy_alloc):
     return results, num_strategies
 
 
+def load_replay_trades(data):
+    """
+    Closed trades of every pair in data from the raw reports, P&L in the
+    scaled units of the stats sheets (SCALING_FACTORS applied).
+    Returns (dates, trades, pairs without a report) or None: dates is the
+    daily timeline from first to last trade, trades a DataFrame sorted by day
+    with the day (row of dates), pair (index into data), profit and lots.
+    """
+    frames = []
+    missing = []
+    for col, item in enumerate(data):
+        closed = stats_pair_trades(item['strategy'], item['pair'])
+        if closed is None or len(closed) == 0:
+            missing.append((item['strategy'], item['pair']))
+            continue
+        frames.append(pd.DataFrame({
+            'time': closed.index,
+            'pair': col,
+            'profit': closed['profit'].to_numpy(dtype=float) / SCALING_FACTORS.get(item['strategy'], 1),
+            'lots': closed['size'].to_numpy(dtype=float),
+        }))
+    
+    if not frames:
+        return None
+    trades = pd.concat(frames, ignore_index=True)
+    first = trades['time'].min().normalize()
+    dates = pd.date_range(first, trades['time'].max().normalize(), freq='D')
+    trades['day'] = np.asarray((pd.DatetimeIndex(trades['time']).normalize() - first).days)
+    trades = trades.sort_values(['day', 'time'], kind='stable', ignore_index=True)
+    return dates, trades[['day', 'pair', 'profit', 'lots']], missing
+
+
+def method_pair_weights(data, pair_alloc, methods):
+    """Pair weight % of every pair in data under each method (pairs x methods, equal weight if missing)."""
+    pair_counts = {}
+    for item in data:
+        pair_counts[item['strategy']] = pair_counts.get(item['strategy'], 0) + 1
+    
+    weights = np.zeros((len(data), len(methods)))
+    for i, item in enumerate(data):
+        pair_pct_data = pair_alloc.get(item['strategy'], {}).get(item['pair'], {})
+        for j, method in enumerate(methods):
+            weights[i, j] = pair_pct_data.get(method, 0) or 100 / pair_counts[item['strategy']]
+    return weights
+
+
+def allocation_units(data, pair_weights=None):
+    """
+    Position size per $1 of starting balance: strategy weight × pair weight /
+    required capital (pairs x K for a pairs x K matrix of pair weight %,
+    default the pair weights in data).
+    """
+    if pair_weights is None:
+        pair_weights = np.array([[item['pair_weight']] for item in data], dtype=float)
+    strategy_weights = np.array([item['strategy_weight'] for item in data], dtype=float)
+    required = np.array([item['required_capital'] for item in data], dtype=float)
+    weights = strategy_weights[:, None] * pair_weights / 10000
+    return np.divide(weights, required[:, None], out=np.zeros_like(weights), where=required[:, None] > 0)
+
+
+def replay_portfolio(data, balances, replay_trades=None, units=None, paths=None, daily=True):
+    """
+    Replay every pair's closed trades for several starting balances at once.
+    Each trade is re-sized to its historical lots × combined weight × balance
+    / required capital, rounded down to LOT_STEP; trades under MIN_LOT are
+    skipped and the account stops trading if its equity reaches zero. Lot
+    rounding makes every balance its own path: small accounts drop trades a
+    linear scale-down would keep. units: sizing per $1 (pairs x K, default
+    the current allocation); paths: units column of each balance (default 0).
+    Returns a dict:
+        dates              daily timeline (first to last trade)
+        balances           starting balances (B)
+        equity             B x days portfolio equity (only if daily)
+        years              calendar years of the timeline
+        yearly_returns     B x years realized return (year-end equity / previous year-end - 1)
+        yearly_profit      B x years realized profit ($)
+        final_equity, max_drawdown, max_drawdown_pct   per balance
+        peak_dates, trough_dates                       worst drawdown (peak NaT = the starting balance)
+        trades_taken, trades_skipped                   per balance (skipped: sized under MIN_LOT)
+        missing            (strategy, pair) without a report
+    """
+    if replay_trades is None:
+        replay_trades = load_replay_trades(data)
+    if replay_trades is None:
+        return None
+    dates, trades, missing = replay_trades
+    balances = np.atleast_1d(np.asarray(balances, dtype=float))
+    if units is None:
+        units = allocation_units(data)
+    paths = np.zeros(len(balances), dtype=int) if paths is None else np.asarray(paths, dtype=int)
+    
+    pair = trades['pair'].to_numpy()
+    lots = np.nan_to_num(trades['lots'].to_numpy())  # No volume: cannot be sized, skipped
+    profit_per_lot = np.divide(trades['profit'].to_numpy(), lots, out=np.zeros(len(lots)), where=lots > 0)
+    day_starts = np.flatnonzero(np.r_[True, np.diff(trades['day'].to_numpy()) != 0])
+    trade_days = trades['day'].to_numpy()[day_starts]
+    years = np.unique(dates.year)
+    year_end = np.searchsorted(dates.year, years, side='right') - 1
+    
+    equity_rows = []
+    closing = np.zeros((len(balances), len(years)))
+    final_equity = np.zeros(len(balances))
+    max_drawdown = np.zeros(len(balances))
+    max_drawdown_pct = np.zeros(len(balances))
+    peak_index = np.zeros(len(balances), dtype=int)
+    trough = np.zeros(len(balances), dtype=int)
+    trades_taken = np.zeros(len(balances), dtype=int)
+    for start in range(0, len(balances), REPLAY_CHUNK_SCENARIOS):
+        chunk = slice(start, start + REPLAY_CHUNK_SCENARIOS)
+        # Lots of every trade in every scenario: trades x scenarios
+        scale = units[:, paths[chunk]] * balances[chunk]
+        sized = np.floor(lots[:, None] * scale[pair] / LOT_STEP + 1e-9) * LOT_STEP
+        sized[sized < MIN_LOT - 1e-9] = 0
+        trades_taken[chunk] = np.count_nonzero(sized, axis=0)
+        
+        pnl = np.zeros((len(dates), sized.shape[1]))
+        pnl[trade_days] = np.add.reduceat(sized * profit_per_lot[:, None], day_starts, axis=0)
+        equity = (balances[chunk] + np.cumsum(pnl, axis=0)).T
+        equity = np.where(np.minimum.accumulate(equity > 0, axis=1), equity, 0)
+        
+        # Worst drawdown per scenario (the starting balance counts as the first peak)
+        peaks = np.maximum(np.maximum.accumulate(equity, axis=1), balances[chunk, None])
+        drawdowns = peaks - equity
+        rows = np.arange(len(equity))
+        trough[chunk] = drawdowns.argmax(axis=1)
+        steps = np.arange(equity.shape[1])
+        peak_index[chunk] = np.maximum.accumulate(np.where(equity >= peaks, steps, -1), axis=1)[rows, trough[chunk]]
+        max_drawdown[chunk] = drawdowns[rows, trough[chunk]]
+        max_drawdown_pct[chunk] = max_drawdown[chunk] / peaks[rows, trough[chunk]]
+        closing[chunk] = equity[:, year_end]
+        final_equity[chunk] = equity[:, -1]
+        if daily:
+            equity_rows.append(equity)
+    
+    has_drawdown = max_drawdown > 0
+    trough_dates = pd.DatetimeIndex(np.where(has_drawdown, dates.values[trough], np.datetime64('NaT')))
+    peak_dates = pd.DatetimeIndex(np.where(has_drawdown & (peak_index >= 0),
+                                           dates.values[np.maximum(peak_index, 0)], np.datetime64('NaT')))
+    
+    # Realized yearly returns from the equity at each year end
+    opening = np.concatenate([balances[:, None], closing[:, :-1]], axis=1)
+    yearly_returns = np.divide(closing - opening, opening, out=np.full_like(closing, np.nan), where=opening > 0)
+    
+    return {
+        'dates': dates,
+        'balances': balances,
+        'equity': np.vstack(equity_rows) if daily else None,
+        'years': years,
+        'yearly_returns': yearly_returns,
+        'yearly_profit': closing - opening,
+        'final_equity': final_equity,
+        'max_drawdown': max_drawdown,
+        'max_drawdown_pct': max_drawdown_pct,
+        'peak_dates': peak_dates,
+        'trough_dates': trough_dates,
+        'trades_taken': trades_taken,
+        'trades_skipped': len(lots) - trades_taken,
+        'missing': missing,
+    }
+
+
+def parse_balances(text):
+    """
+    Starting balances from a comma-separated list; an item start:stop:step
+    expands to an inclusive range (e.g. "5000,10000:100000:10000").
+    """
+    balances = []
+    for part in str(text).split(','):
+        part = part.strip().replace('$', '').replace('_', '')
+        if not part:
+            continue
+        if ':' in part:
+            start, stop, step = (float(value) for value in part.split(':'))
+            if step <= 0:
+                raise ValueError(f"Balance range step must be positive: {part}")
+            balances.extend(np.arange(start, stop + step / 2, step).tolist())
+        else:
+            balances.append(float(part))
+    if not balances or min(balances) <= 0:
+        raise ValueError(f"Balances must be positive: {text}")
+    return sorted(set(balances))
+
+
+def run_scenario_grid(data, pair_alloc, balances, methods=None, replay_trades=None):
+    """
+    Every starting balance × pair allocation method in one pass.
+    Expected figures follow the formula view (allocated capital × historical
+    annual return); replay figures come from replay_portfolio, every scenario
+    sized in whole lots from its own balance and method.
+    Returns a DataFrame with one row per scenario.
+    """
+    methods = list(methods or ALLOCATION_METHOD_NAMES)
+    balances = np.asarray(balances, dtype=float)
+    pair_weights = method_pair_weights(data, pair_alloc, methods)
+    
+    # Scenario s = balance s // M with method s % M
+    scenario_balances = np.repeat(balances, len(methods))
+    scenario_methods = np.tile(np.arange(len(methods)), len(balances))
+    
+    strategy_weights = np.array([item['strategy_weight'] for item in data], dtype=float)
+    annual_returns = np.array([item['annual_return'] for item in data], dtype=float)
+    expected_return = (strategy_weights[:, None] * pair_weights * annual_returns[:, None]).sum(axis=0) / 1e6
+    
+    table = pd.DataFrame({
+        'Balance': scenario_balances,
+        'Method': [methods[j] for j in scenario_methods],
+        'Method_Name': [ALLOCATION_METHOD_NAMES.get(methods[j], methods[j]) for j in scenario_methods],
+        'Expected_Annual_Profit': scenario_balances * expected_return[scenario_methods],
+        'Expected_Annual_Return': expected_return[scenario_methods],
+    })
+    
+    replay = replay_portfolio(data, scenario_balances, replay_trades=replay_trades,
+                              units=allocation_units(data, pair_weights), paths=scenario_methods, daily=False)
+    if replay is None:
+        return table
+    
+    table['Final_Equity'] = replay['final_equity']
+    table['Total_Profit'] = replay['final_equity'] - scenario_balances
+    table['Total_Return'] = table['Total_Profit'] / scenario_balances
+    table['Max_Drawdown'] = replay['max_drawdown']
+    table['Max_Drawdown_Pct'] = replay['max_drawdown_pct']
+    table['Peak_Date'] = replay['peak_dates']
+    table['Trough_Date'] = replay['trough_dates']
+    table['Trades_Taken'] = replay['trades_taken']
+    table['Trades_Skipped'] = replay['trades_skipped']
+    for col, year in enumerate(replay['years']):
+        table[f'Return_{year}'] = replay['yearly_returns'][:, col]
+    return table
+
+
+def write_scenario_table(table, output_file):
+    """Write the scenario table as Parquet (.parquet) or CSV."""
+    if output_file.lower().endswith('.parquet'):
+        table.to_parquet(output_file, index=False)
+    else:
+        table.to_csv(output_file, index=False)
+
+
+def grouped_rows(items, first_row):
+    """Sheet row of every item (sorted by strategy), with a blank row between strategies."""
+    rows = []
+    row = first_row
+    for i, item in enumerate(items):
+        if i > 0 and item['strategy'] != items[i - 1]['strategy']:
+            row += 1  # Blank row between strategies
+        rows.append(row)
+        row += 1
+    return rows
+
+
 def create_allocation_method_sheet(wb, sheet_name, data, strategy_stats, pair_alloc, 
                                     allocation_method, balance_cell_ref):
     """Create a sheet for a specific allocation method showing profit simulation."""
-    ws = wb.create_sheet(title=sheet_name)
-    
-    # Styles
-    title_font = Font(bold=True, size=16, color="2F5496")
-    header_font = Font(bold=True, size=12, color="FFFFFF")
-    header_fill = PatternFill(start_color="2F5496", end_color="2F5496", fill_type="solid")
-    subheader_font = Font(bold=True, size=10)
-    subheader_fill = PatternFill(start_color="BDD7EE", end_color="BDD7EE", fill_type="solid")
-    money_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-    formula_fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
     method_display_names = {
         'equal': 'Equal Weight',
         'inv_vol': 'Inverse Volatility',
@@ -231,66 +487,6 @@ def create_allocation_method_sheet(wb, sheet_name, data, strategy_stats, pair_al
         'max_sharpe': 'Max Sharpe Optimization'
     }
     
-    # ========== ROW 1: Title ==========
-    row = 1
-    ws.cell(row=row, column=1, value=f"PROFIT SIMULATION - {method_display_names.get(allocation_method, allocation_method).upper()}")
-    ws.cell(row=row, column=1).font = title_font
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=10)
-    
-    # ========== ROW 3: Reference to Starting Balance ==========
-    row = 3
-    ws.cell(row=row, column=1, value="Starting Balance (from main sheet):")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=12)
-    ws.cell(row=row, column=2, value=f"='Portfolio Allocation'!{balance_cell_ref}")
-    ws.cell(row=row, column=2).font = Font(bold=True, size=12, color="008000")
-    ws.cell(row=row, column=2).number_format = '$#,##0.00'
-    ws.cell(row=row, column=2).fill = formula_fill
-    LOCAL_BALANCE = "B3"
-    
-    # ========== PORTFOLIO SUMMARY ==========
-    row = 5
-    ws.cell(row=row, column=1, value="PORTFOLIO SUMMARY")
-    ws.cell(row=row, column=1).font = header_font
-    ws.cell(row=row, column=1).fill = header_fill
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=4)
-    
-    row += 1
-    TOTAL_PROFIT_ROW = row
-    ws.cell(row=row, column=1, value="Total Expected Annual Profit:")
-    ws.cell(row=row, column=1).font = subheader_font
-    # Will be set later
-    ws.cell(row=row, column=2).font = Font(bold=True)
-    ws.cell(row=row, column=2).fill = money_fill
-    ws.cell(row=row, column=2).number_format = '$#,##0.00'
-    
-    row += 1
-    TOTAL_RETURN_ROW = row
-    ws.cell(row=row, column=1, value="Portfolio Annual Return:")
-    ws.cell(row=row, column=1).font = subheader_font
-    ws.cell(row=row, column=2).font = Font(bold=True)
-    ws.cell(row=row, column=2).fill = money_fill
-    ws.cell(row=row, column=2).number_format = '0.00%'
-    
-    # ========== STRATEGY LEVEL ALLOCATION ==========
-    row = 10
-    ws.cell(row=row, column=1, value="STRATEGY LEVEL ALLOCATION")
-    ws.cell(row=row, column=1).font = header_font
-    ws.cell(row=row, column=1).fill = header_fill
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
-    
-    row += 1
-    strat_headers = ['Strategy', 'Pairs', 'Strategy Weight %', 'Allocated Capital', 
-                     'Expected Annual Profit', 'Return %']
-    for col, header in enumerate(strat_headers, start=1):
-        cell = ws.cell(row=row, column=col, value=header)
-        cell.font = subheader_font
-        cell.fill = subheader_fill
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center')
-    
-    row += 1
-    STRAT_DATA_START = row
-    
     # Group data by strategy and calculate weights using this method
     strategy_data = {}
     for item in data:
@@ -306,110 +502,82 @@ def create_allocation_method_sheet(wb, sheet_name, data, strategy_stats, pair_al
     num_strategies = len(strategy_data)
     strategy_weight = 1 / num_strategies if num_strategies > 0 else 0
     
-    strategy_rows = {}
-    for strat_name, strat_info in strategy_data.items():
-        strategy_rows[strat_name] = row
-        display_name = get_strategy_display_name(strat_name)
-        
-        ws.cell(row=row, column=1, value=display_name)
-        ws.cell(row=row, column=1).border = border
-        
-        ws.cell(row=row, column=2, value=strat_info['pairs'])
-        ws.cell(row=row, column=2).border = border
-        ws.cell(row=row, column=2).alignment = Alignment(horizontal='center')
-        
-        ws.cell(row=row, column=3, value=strategy_weight)
-        ws.cell(row=row, column=3).border = border
-        ws.cell(row=row, column=3).number_format = '0.00%'
-        
-        # Allocated Capital formula
-        ws.cell(row=row, column=4, value=f"={LOCAL_BALANCE}*C{row}")
-        ws.cell(row=row, column=4).border = border
-        ws.cell(row=row, column=4).fill = formula_fill
-        ws.cell(row=row, column=4).number_format = '$#,##0.00'
-        
-        # Expected Profit - will be set later via SUMIF
-        ws.cell(row=row, column=5).border = border
-        ws.cell(row=row, column=5).fill = formula_fill
-        ws.cell(row=row, column=5).number_format = '$#,##0.00'
-        
-        # Return %
-        ws.cell(row=row, column=6, value=f"=IF(D{row}>0,E{row}/D{row},0)")
-        ws.cell(row=row, column=6).border = border
-        ws.cell(row=row, column=6).fill = formula_fill
-        ws.cell(row=row, column=6).number_format = '0.00%'
-        
-        row += 1
+    # Sort data by strategy then pair
+    sorted_data = sorted(data, key=lambda x: (x['strategy'], x['pair']))
+    
+    # ========== ROW LAYOUT ==========
+    # Rows are streamed top to bottom, so the rows the summary formulas point
+    # to are laid out before anything is written
+    LOCAL_BALANCE = "B3"
+    TOTAL_PROFIT_ROW = 6
+    TOTAL_RETURN_ROW = 7
+    STRAT_DATA_START = 12
+    STRAT_DATA_END = STRAT_DATA_START + num_strategies - 1
+    STRAT_TOTAL_ROW = STRAT_DATA_END + 1
+    PAIR_DATA_START = STRAT_TOTAL_ROW + 5
+    pair_rows = grouped_rows(sorted_data, PAIR_DATA_START)
+    PAIR_DATA_END = pair_rows[-1] if pair_rows else PAIR_DATA_START - 1
+    PAIR_TOTAL_ROW = PAIR_DATA_END + 2
+    
+    ws = new_sheet(wb, sheet_name, widths={
+        'A': 18, 'B': 14, 'C': 14, 'D': 12, 'E': 14,
+        'F': 16, 'G': 14, 'H': 16, 'I': 10, 'J': 12})
+    
+    # ========== ROW 1: Title ==========
+    write_row(ws, 1, [f"PROFIT SIMULATION - {method_display_names.get(allocation_method, allocation_method).upper()}"],
+              'Title', merge_to=10)
+    
+    # ========== ROW 3: Reference to Starting Balance ==========
+    write_row(ws, 3, ["Starting Balance (from main sheet):", f"='Portfolio Allocation'!{balance_cell_ref}"],
+              ['Linked Balance Label', 'Linked Balance'])
     
-    STRAT_DATA_END = row - 1
+    # ========== PORTFOLIO SUMMARY ==========
+    write_row(ws, 5, ["PORTFOLIO SUMMARY"], 'Section', merge_to=4)
+    write_row(ws, TOTAL_PROFIT_ROW, ["Total Expected Annual Profit:", f"=E{STRAT_TOTAL_ROW}"],
+              ['Label', 'Result $'])
+    write_row(ws, TOTAL_RETURN_ROW, ["Portfolio Annual Return:",
+                                     f"=IF({LOCAL_BALANCE}>0,B{TOTAL_PROFIT_ROW}/{LOCAL_BALANCE},0)"],
+              ['Label', 'Result %'])
+    
+    # ========== STRATEGY LEVEL ALLOCATION ==========
+    write_row(ws, 10, ["STRATEGY LEVEL ALLOCATION"], 'Section', merge_to=6)
+    strat_headers = ['Strategy', 'Pairs', 'Strategy Weight %', 'Allocated Capital', 
+                     'Expected Annual Profit', 'Return %']
+    write_row(ws, 11, strat_headers, 'Column Header')
+    
+    for row, (strat_name, strat_info) in enumerate(strategy_data.items(), start=STRAT_DATA_START):
+        write_row(ws, row, [
+            get_strategy_display_name(strat_name),
+            strat_info['pairs'],
+            strategy_weight,
+            # Allocated Capital
+            f"={LOCAL_BALANCE}*C{row}",
+            # Expected Profit = this strategy's profits in the pair table
+            f'=SUMIF(A{PAIR_DATA_START}:A{PAIR_DATA_END},A{row},H{PAIR_DATA_START}:H{PAIR_DATA_END})',
+            # Return %
+            f"=IF(D{row}>0,E{row}/D{row},0)",
+        ], ['Cell', 'Cell Center', 'Cell %', 'Formula $', 'Formula $', 'Formula %'])
     
     # Strategy Total Row
-    STRAT_TOTAL_ROW = row
-    ws.cell(row=row, column=1, value="TOTAL")
-    ws.cell(row=row, column=1).font = Font(bold=True)
-    ws.cell(row=row, column=1).border = border
-    ws.cell(row=row, column=1).fill = money_fill
-    
-    ws.cell(row=row, column=2, value=f"=SUM(B{STRAT_DATA_START}:B{STRAT_DATA_END})")
-    ws.cell(row=row, column=2).font = Font(bold=True)
-    ws.cell(row=row, column=2).border = border
-    ws.cell(row=row, column=2).fill = money_fill
-    
-    ws.cell(row=row, column=3, value=f"=SUM(C{STRAT_DATA_START}:C{STRAT_DATA_END})")
-    ws.cell(row=row, column=3).font = Font(bold=True)
-    ws.cell(row=row, column=3).border = border
-    ws.cell(row=row, column=3).fill = money_fill
-    ws.cell(row=row, column=3).number_format = '0.00%'
-    
-    ws.cell(row=row, column=4, value=f"=SUM(D{STRAT_DATA_START}:D{STRAT_DATA_END})")
-    ws.cell(row=row, column=4).font = Font(bold=True)
-    ws.cell(row=row, column=4).border = border
-    ws.cell(row=row, column=4).fill = money_fill
-    ws.cell(row=row, column=4).number_format = '$#,##0.00'
-    
-    ws.cell(row=row, column=5, value=f"=SUM(E{STRAT_DATA_START}:E{STRAT_DATA_END})")
-    ws.cell(row=row, column=5).font = Font(bold=True)
-    ws.cell(row=row, column=5).border = border
-    ws.cell(row=row, column=5).fill = money_fill
-    ws.cell(row=row, column=5).number_format = '$#,##0.00'
-    
-    ws.cell(row=row, column=6, value=f"=IF(D{row}>0,E{row}/D{row},0)")
-    ws.cell(row=row, column=6).font = Font(bold=True)
-    ws.cell(row=row, column=6).border = border
-    ws.cell(row=row, column=6).fill = money_fill
-    ws.cell(row=row, column=6).number_format = '0.00%'
+    write_row(ws, STRAT_TOTAL_ROW, [
+        "TOTAL",
+        f"=SUM(B{STRAT_DATA_START}:B{STRAT_DATA_END})",
+        f"=SUM(C{STRAT_DATA_START}:C{STRAT_DATA_END})",
+        f"=SUM(D{STRAT_DATA_START}:D{STRAT_DATA_END})",
+        f"=SUM(E{STRAT_DATA_START}:E{STRAT_DATA_END})",
+        f"=IF(D{STRAT_TOTAL_ROW}>0,E{STRAT_TOTAL_ROW}/D{STRAT_TOTAL_ROW},0)",
+    ], ['Total', 'Total', 'Total %', 'Total $', 'Total $', 'Total %'])
     
     # ========== PAIR LEVEL ALLOCATION ==========
-    row += 3
-    ws.cell(row=row, column=1, value="PAIR LEVEL ALLOCATION")
-    ws.cell(row=row, column=1).font = header_font
-    ws.cell(row=row, column=1).fill = header_fill
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=10)
-    
-    row += 1
+    write_row(ws, PAIR_DATA_START - 2, ["PAIR LEVEL ALLOCATION"], 'Section', merge_to=10)
     pair_headers = ['Strategy', 'Pair', 'Strategy Wt %', 'Pair Wt %', 'Combined Wt %',
                     'Allocated Capital', 'Annual Return %', 'Expected Profit', 
                     'Sharpe', 'Max DD']
-    for col, header in enumerate(pair_headers, start=1):
-        cell = ws.cell(row=row, column=col, value=header)
-        cell.font = subheader_font
-        cell.fill = subheader_fill
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', wrap_text=True)
-    
-    row += 1
-    PAIR_DATA_START = row
+    write_row(ws, PAIR_DATA_START - 1, pair_headers, 'Column Header Wrap')
     
-    # Sort data by strategy then pair
-    sorted_data = sorted(data, key=lambda x: (x['strategy'], x['pair']))
-    
-    current_strategy = None
-    for item in sorted_data:
-        if current_strategy != item['strategy']:
-            if current_strategy is not None:
-                row += 1  # Blank row between strategies
-            current_strategy = item['strategy']
-        
+    pair_styles = ['Cell', 'Cell', 'Cell %', 'Cell %', 'Formula %',
+                   'Formula $', 'Cell %', 'Formula $', 'Cell 0.00', 'Cell $']
+    for row, item in zip(pair_rows, sorted_data):
         # Get pair weight for this allocation method
         strat_pair_alloc = pair_alloc.get(item['strategy'], {})
         pair_pct_data = strat_pair_alloc.get(item['pair'], {})
@@ -420,243 +588,194 @@ def create_allocation_method_sheet(wb, sheet_name, data, strategy_stats, pair_al
             num_pairs = strategy_data[item['strategy']]['pairs']
             pair_weight = 100 / num_pairs if num_pairs > 0 else 100
         
-        pair_weight_decimal = pair_weight / 100
-        
-        # Col A: Strategy
-        display_name = get_strategy_display_name(item['strategy'])
-        ws.cell(row=row, column=1, value=display_name)
-        ws.cell(row=row, column=1).border = border
-        
-        # Col B: Pair
-        ws.cell(row=row, column=2, value=item['pair'])
-        ws.cell(row=row, column=2).border = border
-        
-        # Col C: Strategy Weight %
-        ws.cell(row=row, column=3, value=strategy_weight)
-        ws.cell(row=row, column=3).border = border
-        ws.cell(row=row, column=3).number_format = '0.00%'
-        
-        # Col D: Pair Weight %
-        ws.cell(row=row, column=4, value=pair_weight_decimal)
-        ws.cell(row=row, column=4).border = border
-        ws.cell(row=row, column=4).number_format = '0.00%'
-        
-        # Col E: Combined Weight % (formula)
-        ws.cell(row=row, column=5, value=f"=C{row}*D{row}")
-        ws.cell(row=row, column=5).border = border
-        ws.cell(row=row, column=5).fill = formula_fill
-        ws.cell(row=row, column=5).number_format = '0.00%'
-        
-        # Col F: Allocated Capital (formula)
-        ws.cell(row=row, column=6, value=f"={LOCAL_BALANCE}*E{row}")
-        ws.cell(row=row, column=6).border = border
-        ws.cell(row=row, column=6).fill = formula_fill
-        ws.cell(row=row, column=6).number_format = '$#,##0.00'
-        
-        # Col G: Annual Return % (static from historical)
-        ws.cell(row=row, column=7, value=item['annual_return'] / 100)
-        ws.cell(row=row, column=7).border = border
-        ws.cell(row=row, column=7).number_format = '0.00%'
-        
-        # Col H: Expected Profit (formula)
-        ws.cell(row=row, column=8, value=f"=F{row}*G{row}")
-        ws.cell(row=row, column=8).border = border
-        ws.cell(row=row, column=8).fill = formula_fill
-        ws.cell(row=row, column=8).number_format = '$#,##0.00'
-        
-        # Col I: Sharpe
-        ws.cell(row=row, column=9, value=item['sharpe'])
-        ws.cell(row=row, column=9).border = border
-        ws.cell(row=row, column=9).number_format = '0.00'
-        
-        # Col J: Max DD
-        ws.cell(row=row, column=10, value=item['max_dd'])
-        ws.cell(row=row, column=10).border = border
-        ws.cell(row=row, column=10).number_format = '$#,##0.00'
-        
-        row += 1
-    
-    PAIR_DATA_END = row - 1
-    
-    # Pair Total Row
-    row += 1
-    PAIR_TOTAL_ROW = row
-    ws.cell(row=row, column=1, value="TOTAL")
-    ws.cell(row=row, column=1).font = Font(bold=True)
-    ws.cell(row=row, column=1).border = border
-    ws.cell(row=row, column=1).fill = money_fill
-    
-    for col in range(2, 5):
-        ws.cell(row=row, column=col).border = border
-        ws.cell(row=row, column=col).fill = money_fill
-    
-    # Sum Combined Weight
-    ws.cell(row=row, column=5, value=f"=SUMIF(A{PAIR_DATA_START}:A{PAIR_DATA_END},\"<>\",E{PAIR_DATA_START}:E{PAIR_DATA_END})")
-    ws.cell(row=row, column=5).font = Font(bold=True)
-    ws.cell(row=row, column=5).border = border
-    ws.cell(row=row, column=5).fill = money_fill
-    ws.cell(row=row, column=5).number_format = '0.00%'
-    
-    # Sum Allocated Capital
-    ws.cell(row=row, column=6, value=f"=SUMIF(A{PAIR_DATA_START}:A{PAIR_DATA_END},\"<>\",F{PAIR_DATA_START}:F{PAIR_DATA_END})")
-    ws.cell(row=row, column=6).font = Font(bold=True)
-    ws.cell(row=row, column=6).border = border
-    ws.cell(row=row, column=6).fill = money_fill
-    ws.cell(row=row, column=6).number_format = '$#,##0.00'
-    
-    ws.cell(row=row, column=7).border = border
-    ws.cell(row=row, column=7).fill = money_fill
-    
-    # Sum Expected Profit
-    ws.cell(row=row, column=8, value=f"=SUMIF(A{PAIR_DATA_START}:A{PAIR_DATA_END},\"<>\",H{PAIR_DATA_START}:H{PAIR_DATA_END})")S
-    ws.cell(row=row, column=8).font = Font(bold=True)
-    ws.cell(row=row, column=8).border = border
-    ws.cell(row=row, column=8).fill = money_fill
-    ws.cell(row=row, column=8).number_format = '$#,##0.00'
-    
-    for col in range(9, 11):
-        ws.cell(row=row, column=col).border = border
-        ws.cell(row=row, column=col).fill = money_fill
-    
-    # Now set strategy profit formulas using SUMIF
-    for strat_name, strat_row in strategy_rows.items():
-        formula = f'=SUMIF(A{PAIR_DATA_START}:A{PAIR_DATA_END},A{strat_row},H{PAIR_DATA_START}:H{PAIR_DATA_END})'
-        ws.cell(row=strat_row, column=5, value=formula)
-    
-    # Set portfolio summary formulas
-    ws.cell(row=TOTAL_PROFIT_ROW, column=2, value=f"=E{STRAT_TOTAL_ROW}")
-    ws.cell(row=TOTAL_RETURN_ROW, column=2, value=f"=IF({LOCAL_BALANCE}>0,B{TOTAL_PROFIT_ROW}/{LOCAL_BALANCE},0)")
-    
-    # Column widths
-    column_widths = {'A': 18, 'B': 14, 'C': 14, 'D': 12, 'E': 14, 
-                     'F': 16, 'G': 14, 'H': 16, 'I': 10, 'J': 12}
-    for col, width in column_widths.items():
-        ws.column_dimensions[col].width = width
+        write_row(ws, row, [
+            get_strategy_display_name(item['strategy']),
+            item['pair'],
+            strategy_weight,
+            pair_weight / 100,
+            # Combined Weight %
+            f"=C{row}*D{row}",
+            # Allocated Capital
+            f"={LOCAL_BALANCE}*E{row}",
+            # Annual Return % (static from historical)
+            item['annual_return'] / 100,
+            # Expected Profit
+            f"=F{row}*G{row}",
+            item['sharpe'],
+            item['max_dd'],
+        ], pair_styles)
+    
+    # Pair Total Row (SUMIF skips the blank rows between strategies)
+    pair_range = f"A{PAIR_DATA_START}:A{PAIR_DATA_END},\"<>\""
+    write_row(ws, PAIR_TOTAL_ROW, [
+        "TOTAL", None, None, None,
+        f"=SUMIF({pair_range},E{PAIR_DATA_START}:E{PAIR_DATA_END})",
+        f"=SUMIF({pair_range},F{PAIR_DATA_START}:F{PAIR_DATA_END})",
+        None,
+        f"=SUMIF({pair_range},H{PAIR_DATA_START}:H{PAIR_DATA_END})",
+    ], ['Total', 'Total Blank', 'Total Blank', 'Total Blank', 'Total %',
+        'Total $', 'Total Blank', 'Total $', 'Total Blank', 'Total Blank'])
     
     return ws
 
 
-def create_dynamic_excel(data, num_strategies, starting_balance, output_file, 
-                         strategy_stats=None, pair_alloc=None):
-    """Create Excel with dynamic formulas."""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Portfolio Allocation"
-    
-    # Styles
-    title_font = Font(bold=True, size=18, color="2F5496")
-    header_font = Font(bold=True, size=14, color="FFFFFF")
-    header_fill = PatternFill(start_color="2F5496", end_color="2F5496", fill_type="solid")
-    subheader_font = Font(bold=True, size=11)
-    subheader_fill = PatternFill(start_color="BDD7EE", end_color="BDD7EE", fill_type="solid")
-    input_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-    money_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-    formula_fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    thick_border = Border(
-        left=Side(style='medium'),
-        right=Side(style='medium'),
-        top=Side(style='medium'),
-        bottom=Side(style='medium')
-    )
+def create_historical_replay_sheet(wb, replay, starting_balance):
+    """Create the historical replay sheet (values, one column per starting balance)."""
+    balances = replay['balances']
+    last_col = max(len(replay['years']), len(balances), 8) + 1
+    
+    # Row layout: the daily table's header row is needed up front to freeze it
+    row = 3 if replay['missing'] else 2
+    summary_row = row + 2
+    yearly_row = summary_row + len(balances) + 4
+    daily_row = yearly_row + len(balances) + 4
+    
+    widths = {'A': 18}
+    for col in range(2, last_col + 1):
+        widths[get_column_letter(col)] = 16
+    # No formulas here, so the (daily) rows are streamed without being kept
+    ws = new_sheet(wb, "Historical Replay", widths=widths, freeze=f"B{daily_row + 2}",
+                   index=wb.sheetnames.index("Portfolio Allocation") + 1, keep_values=False)
+    
+    def balance_style(balance):
+        return 'Current Balance' if balance == starting_balance else 'Cell $'
     
     # ========== ROW 1: Title ==========
-    row = 1
-    ws.cell(row=row, column=1, value="PORTFOLIO ALLOCATION SIMULATOR")
-    ws.cell(row=row, column=1).font = title_font
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=8)
-    
-    # ========== ROW 3: Starting Balance Input ==========
-    row = 3
-    BALANCE_CELL = "B3"  # This is the key cell that user can change
-    
-    ws.cell(row=row, column=1, value="STARTING BALANCE:")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=14)
-    ws.cell(row=row, column=2, value=starting_balance)
-    ws.cell(row=row, column=2).font = Font(bold=True, size=14, color="008000")
-    ws.cell(row=row, column=2).fill = input_fill
-    ws.cell(row=row, column=2).border = thick_border
-    ws.cell(row=row, column=2).number_format = '$#,##0.00'
-    ws.cell(row=row, column=3, value="← CHANGE THIS VALUE")
-    ws.cell(row=row, column=3).font = Font(italic=True, color="FF0000")
-    
-    # ========== ROW 5-10: Portfolio Summary ==========
-    row = 5
-    ws.cell(row=row, column=1, value="PORTFOLIO SUMMARY")
-    ws.cell(row=row, column=1).font = header_font
-    ws.cell(row=row, column=1).fill = header_fill
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=4)
-    
-    row += 1
-    num_pairs = len(data)
-    
-    # Total Strategies (static)
-    ws.cell(row=row, column=1, value="Total Strategies:")
-    ws.cell(row=row, column=1).font = subheader_font
-    ws.cell(row=row, column=2, value=num_strategies)
-    ws.cell(row=row, column=2).font = Font(bold=True)
-    
-    row += 1
-    # Total Trading Pairs (static)
-    ws.cell(row=row, column=1, value="Total Trading Pairs:")
-    ws.cell(row=row, column=1).font = subheader_font
-    ws.cell(row=row, column=2, value=num_pairs)
-    ws.cell(row=row, column=2).font = Font(bold=True)
-    
+    write_row(ws, 1, ["HISTORICAL REPLAY - CLOSED TRADES AT THE CURRENT ALLOCATION"], 'Title', merge_to=last_col)
+    write_row(ws, 2, [(
+        f"{replay['dates'][0]:%Y-%m-%d} to {replay['dates'][-1]:%Y-%m-%d}. Each closed trade re-sized to its lots × "
+        f"strategy weight × pair weight × starting balance / required capital, rounded down to {LOT_STEP:g} lots; "
+        f"trades under {MIN_LOT:g} lots are skipped (static values, not linked to the balance cell)")], 'Grey Note')
+    if replay['missing']:
+        write_row(ws, 3, ["No report (not replayed): " + ", ".join(
+            f"{get_strategy_display_name(strategy)} {pair}" for strategy, pair in replay['missing'])], 'Red Note')
+    
+    # ========== REPLAY SUMMARY ==========
+    row = summary_row
+    write_row(ws, row, ["REPLAY SUMMARY BY STARTING BALANCE"], 'Section', merge_to=9)
     row += 1
-    # Total Allocated Capital (formula)
-    TOTAL_CAPITAL_ROW = row
-    ws.cell(row=row, column=1, value="Total Allocated Capital:")
-    ws.cell(row=row, column=1).font = subheader_font
-    ws.cell(row=row, column=2, value=f"={BALANCE_CELL}")
-    ws.cell(row=row, column=2).font = Font(bold=True)
-    ws.cell(row=row, column=2).fill = formula_fill
-    ws.cell(row=row, column=2).number_format = '$#,##0.00'
-    
+    write_row(ws, row, ['Starting Balance', 'Final Equity', 'Total Profit', 'Total Return %',
+                        'Worst Drawdown', 'Worst Drawdown %', 'Peak Date', 'Trough Date',
+                        'Trades Skipped (under min lot)'], 'Column Header Wrap')
+    for i, balance in enumerate(balances):
+        row += 1
+        dates = []
+        for col, date in ((7, replay['peak_dates'][i]), (8, replay['trough_dates'][i])):
+            if pd.notna(date):
+                dates.append(date.to_pydatetime())
+            else:
+                dates.append("Start" if col == 7 and replay['max_drawdown'][i] > 0 else "-")
+        write_row(ws, row, [
+            float(balance),
+            float(replay['final_equity'][i]),
+            float(replay['final_equity'][i] - balance),
+            float((replay['final_equity'][i] - balance) / balance if balance > 0 else 0),
+            float(replay['max_drawdown'][i]),
+            float(replay['max_drawdown_pct'][i]),
+        ] + dates + [int(replay['trades_skipped'][i])],
+            [balance_style(balance), 'Cell $', 'Cell $', 'Cell %', 'Cell $', 'Cell %',
+             'Cell Date Center', 'Cell Date Center', 'Cell Center'])
+    
+    # ========== REALIZED YEARLY RETURNS ==========
+    row = yearly_row
+    write_row(ws, row, ["REALIZED YEARLY RETURNS (year-end equity vs previous year-end)"], 'Section',
+              merge_to=len(replay['years']) + 1)
     row += 1
-    # Expected Annual Profit (formula - will be updated after detail table)
-    PROFIT_SUMMARY_ROW = row
-    ws.cell(row=row, column=1, value="Expected Annual Profit:")
-    ws.cell(row=row, column=1).font = subheader_font
-    # Formula will be set after detail table is created
-    ws.cell(row=row, column=2).font = Font(bold=True)
-    ws.cell(row=row, column=2).fill = formula_fill
-    ws.cell(row=row, column=2).number_format = '$#,##0.00'
+    write_row(ws, row, ['Starting Balance'] + [str(year) for year in replay['years']], 'Column Header Wrap')
+    for i, balance in enumerate(balances):
+        row += 1
+        returns = [float(value) if np.isfinite(value) else None for value in replay['yearly_returns'][i]]
+        write_row(ws, row, [float(balance)] + returns, [balance_style(balance)] + ['Cell %'] * len(returns))
     
+    # ========== DAILY PORTFOLIO EQUITY ==========
+    row = daily_row
+    write_row(ws, row, ["DAILY PORTFOLIO EQUITY"], 'Section', merge_to=len(balances) + 1)
     row += 1
-    # Expected Annual Return (formula)
-    RETURN_SUMMARY_ROW = row
-    ws.cell(row=row, column=1, value="Expected Annual Return:")
-    ws.cell(row=row, column=1).font = subheader_font
-    # Formula will be set after detail table
-    ws.cell(row=row, column=2).font = Font(bold=True)
-    ws.cell(row=row, column=2).fill = formula_fill
-    ws.cell(row=row, column=2).number_format = '0.00%'
+    write_row(ws, row, ['Date'] + [f"${balance:,.0f}" for balance in balances], 'Column Header Wrap')
+    equity = replay['equity']
+    equity_styles = ['Date'] + ['Money'] * len(balances)
+    for date, values in zip(replay['dates'].to_pydatetime(), equity.T.tolist()):
+        row += 1
+        write_row(ws, row, [date] + values, equity_styles)
     
-    # ========== ROW 13+: Strategy Summary Table ==========
-    row = 13
-    ws.cell(row=row, column=1, value="STRATEGY ALLOCATION SUMMARY")
-    ws.cell(row=row, column=1).font = header_font
-    ws.cell(row=row, column=1).fill = header_fill
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
+    return ws
+
+
+def scenario_cell_style(column):
+    """Named cell style (number format) of a scenario table column."""
+    if column.endswith('_Date'):
+        return 'Cell Date'
+    if 'Return' in column or column.endswith('_Pct'):
+        return 'Cell %'
+    if column in ('Balance', 'Expected_Annual_Profit', 'Final_Equity', 'Total_Profit', 'Max_Drawdown'):
+        return 'Cell $'
+    return 'Cell'
+
+
+def create_scenario_summary_excel(table, output_file, table_file):
+    """Create the one-sheet batch summary: method comparison plus the scenario rows."""
+    # Lot rounding makes returns depend on the balance: compare at both ends of the range
+    per_dollar = [column for column in table.columns
+                  if column in ('Balance', 'Method_Name', 'Trades_Skipped') or column.endswith('_Date') or
+                  scenario_cell_style(column) == 'Cell %']
+    methods = table[table['Balance'].isin([table['Balance'].min(), table['Balance'].max()])][per_dollar]
+    shown = table.head(SCENARIO_SHEET_MAX_ROWS)
+    columns = [column for column in table.columns if column != 'Method']
+    
+    # Row layout: the scenario header row is needed up front to freeze it
+    SCENARIO_HEADER_ROW = 5 + len(methods) + 4
+    
+    wb = new_workbook(SHEET_STYLES)
+    ws = new_sheet(wb, "Scenario Summary",
+                   widths={get_column_letter(col): 16 for col in range(1, len(table.columns) + 1)},
+                   freeze=f"C{SCENARIO_HEADER_ROW + 1}", keep_values=False)
+    
+    def write_rows(row, frame):
+        styles = [scenario_cell_style(column) for column in frame.columns]
+        for values in frame.itertuples(index=False):
+            row += 1
+            cells = []
+            for value in values:
+                if isinstance(value, pd.Timestamp):
+                    value = value.to_pydatetime()
+                elif pd.isna(value):
+                    value = None
+                elif isinstance(value, np.generic):
+                    value = value.item()
+                cells.append(value)
+            write_row(ws, row, cells, styles)
+        return row
+    
+    num_balances = table['Balance'].nunique()
+    num_methods = table['Method'].nunique()
     
-    row += 1
-    strategy_headers = ['Strategy', 'Pairs', 'Weight %', 'Allocated Capital', 'Expected Profit', 'Return %']
-    for col, header in enumerate(strategy_headers, start=1):
-        cell = ws.cell(row=row, column=col, value=header)
-        cell.font = subheader_font
-        cell.fill = subheader_fill
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center')
-    
-    STRATEGY_HEADER_ROW = row
-    row += 1
-    STRATEGY_DATA_START = row
+    # ========== ROW 1: Title ==========
+    write_row(ws, 1, ["SCENARIO GRID - STARTING BALANCE × ALLOCATION METHOD"], 'Title', merge_to=8)
+    write_row(ws, 2, [(
+        f"{len(table):,} scenarios ({num_balances:,} balances × {num_methods} methods), "
+        f"balances ${table['Balance'].min():,.0f} to ${table['Balance'].max():,.0f}. Full table: {table_file}")],
+        'Grey Note')
+    
+    # ========== METHOD COMPARISON ==========
+    write_row(ws, 4, ["METHOD COMPARISON AT THE SMALLEST AND LARGEST STARTING BALANCE"],
+              'Section', merge_to=8)
+    write_row(ws, 5, [column.replace('_', ' ') for column in per_dollar], 'Column Header Wrap')
+    write_rows(5, methods)
+    
+    # ========== SCENARIOS ==========
+    title = "ALL SCENARIOS" if len(shown) == len(table) else \
+        f"SCENARIOS (first {len(shown):,} of {len(table):,} - see {table_file})"
+    write_row(ws, SCENARIO_HEADER_ROW - 1, [title], 'Section', merge_to=8)
+    write_row(ws, SCENARIO_HEADER_ROW, [column.replace('_', ' ') for column in columns], 'Column Header Wrap')
+    write_rows(SCENARIO_HEADER_ROW, shown[columns])
+    
+    save_workbook(wb, output_file)
+
+
+def create_dynamic_excel(data, num_strategies, starting_balance, output_file, 
+                         strategy_stats=None, pair_alloc=None, replay=None):
+    """Create Excel with dynamic formulas."""
+    num_pairs = len(data)
     
     # Group data by strategy
     strategy_data = {}
@@ -671,252 +790,127 @@ def create_dynamic_excel(data, num_strategies, starting_balance, output_file,
         strategy_data[strat]['pairs'] += 1
         strategy_data[strat]['pair_items'].append(item)
     
-    strategy_rows = {}
-    for strat_name, strat_info in strategy_data.items():
-        strategy_rows[strat_name] = row
-        display_name = get_strategy_display_name(strat_name)
-        
-        # Strategy name
-        ws.cell(row=row, column=1, value=display_name)
-        ws.cell(row=row, column=1).border = border
-        
-        # Pairs count
-        ws.cell(row=row, column=2, value=strat_info['pairs'])
-        ws.cell(row=row, column=2).border = border
-        ws.cell(row=row, column=2).alignment = Alignment(horizontal='center')
-        
-        # Weight % (static - equal weight)
-        weight_pct = strat_info['weight'] / 100
-        ws.cell(row=row, column=3, value=weight_pct)
-        ws.cell(row=row, column=3).border = border
-        ws.cell(row=row, column=3).number_format = '0.00%'
-        ws.cell(row=row, column=3).alignment = Alignment(horizontal='center')
-        
-        # Allocated Capital (formula)
-        ws.cell(row=row, column=4, value=f"={BALANCE_CELL}*C{row}")
-        ws.cell(row=row, column=4).border = border
-        ws.cell(row=row, column=4).fill = formula_fill
-        ws.cell(row=row, column=4).number_format = '$#,##0.00'
-        
-        # Expected Profit (will be SUMIF from detail table - placeholder for now)
-        ws.cell(row=row, column=5).border = border
-        ws.cell(row=row, column=5).fill = formula_fill
-        ws.cell(row=row, column=5).number_format = '$#,##0.00'
-        
-        # Return % (formula)
-        ws.cell(row=row, column=6, value=f"=IF(D{row}>0,E{row}/D{row},0)")
-        ws.cell(row=row, column=6).border = border
-        ws.cell(row=row, column=6).fill = formula_fill
-        ws.cell(row=row, column=6).number_format = '0.00%'
-        
-        row += 1
+    # Sort data by strategy then by pair weight descending
+    sorted_data = sorted(data, key=lambda x: (x['strategy'], -x['pair_weight']))
     
-    STRATEGY_DATA_END = row - 1
+    # ========== ROW LAYOUT ==========
+    # Rows are streamed top to bottom, so the rows the summary formulas point
+    # to are laid out before anything is written
+    BALANCE_CELL = "B3"  # This is the key cell that user can change
+    TOTAL_CAPITAL_ROW = 8
+    PROFIT_SUMMARY_ROW = 9
+    RETURN_SUMMARY_ROW = 10
+    STRATEGY_DATA_START = 15
+    STRATEGY_DATA_END = STRATEGY_DATA_START + len(strategy_data) - 1
+    STRATEGY_TOTAL_ROW = STRATEGY_DATA_END + 1
+    DETAIL_DATA_START = STRATEGY_TOTAL_ROW + 5
+    detail_rows = grouped_rows(sorted_data, DETAIL_DATA_START)
+    DETAIL_DATA_END = detail_rows[-1] if detail_rows else DETAIL_DATA_START - 1
+    DETAIL_TOTAL_ROW = DETAIL_DATA_END + 2
+    
+    wb = new_workbook(SHEET_STYLES)
+    ws = new_sheet(wb, "Portfolio Allocation", widths={
+        'A': 22, 'B': 28, 'C': 16, 'D': 14, 'E': 18,
+        'F': 18, 'G': 16, 'H': 18, 'I': 12, 'J': 14, 'K': 16
+    })
+    
+    # ========== ROW 1: Title ==========
+    write_row(ws, 1, ["PORTFOLIO ALLOCATION SIMULATOR"], 'Main Title', merge_to=8)
+    
+    # ========== ROW 3: Starting Balance Input ==========
+    write_row(ws, 3, ["STARTING BALANCE:", starting_balance, "← CHANGE THIS VALUE"],
+              ['Balance Label', 'Balance Input', 'Red Note'])
+    
+    # ========== ROW 5-10: Portfolio Summary ==========
+    write_row(ws, 5, ["PORTFOLIO SUMMARY"], 'Main Section', merge_to=4)
+    write_row(ws, 6, ["Total Strategies:", num_strategies], ['Main Label', 'Bold'])
+    write_row(ws, 7, ["Total Trading Pairs:", num_pairs], ['Main Label', 'Bold'])
+    write_row(ws, TOTAL_CAPITAL_ROW, ["Total Allocated Capital:", f"={BALANCE_CELL}"],
+              ['Main Label', 'Summary $'])
+    write_row(ws, PROFIT_SUMMARY_ROW, ["Expected Annual Profit:", f"=E{STRATEGY_TOTAL_ROW}"],
+              ['Main Label', 'Summary $'])
+    write_row(ws, RETURN_SUMMARY_ROW, [
+        "Expected Annual Return:",
+        f"=IF(B{TOTAL_CAPITAL_ROW}>0,B{PROFIT_SUMMARY_ROW}/B{TOTAL_CAPITAL_ROW},0)"
+    ], ['Main Label', 'Summary %'])
+    
+    # ========== ROW 13+: Strategy Summary Table ==========
+    write_row(ws, 13, ["STRATEGY ALLOCATION SUMMARY"], 'Main Section', merge_to=6)
+    strategy_headers = ['Strategy', 'Pairs', 'Weight %', 'Allocated Capital', 'Expected Profit', 'Return %']
+    write_row(ws, 14, strategy_headers, 'Main Column Header')
+    
+    for row, (strat_name, strat_info) in enumerate(strategy_data.items(), start=STRATEGY_DATA_START):
+        write_row(ws, row, [
+            get_strategy_display_name(strat_name),
+            strat_info['pairs'],
+            # Weight % (static - equal weight)
+            strat_info['weight'] / 100,
+            # Allocated Capital
+            f"={BALANCE_CELL}*C{row}",
+            # Expected Profit = Sum of all profits for this strategy in detail table
+            f'=SUMIF(A{DETAIL_DATA_START}:A{DETAIL_DATA_END},A{row},H{DETAIL_DATA_START}:H{DETAIL_DATA_END})',
+            # Return %
+            f"=IF(D{row}>0,E{row}/D{row},0)",
+        ], ['Cell', 'Cell Center', 'Cell % Center', 'Formula $', 'Formula $', 'Formula %'])
     
     # Total row for strategy summary
-    STRATEGY_TOTAL_ROW = row
-    ws.cell(row=row, column=1, value="TOTAL")
-    ws.cell(row=row, column=1).font = Font(bold=True)
-    ws.cell(row=row, column=1).border = border
-    ws.cell(row=row, column=1).fill = money_fill
-    
-    ws.cell(row=row, column=2, value=f"=SUM(B{STRATEGY_DATA_START}:B{STRATEGY_DATA_END})")
-    ws.cell(row=row, column=2).font = Font(bold=True)
-    ws.cell(row=row, column=2).border = border
-    ws.cell(row=row, column=2).fill = money_fill
-    
-    ws.cell(row=row, column=3, value=f"=SUM(C{STRATEGY_DATA_START}:C{STRATEGY_DATA_END})")
-    ws.cell(row=row, column=3).font = Font(bold=True)
-    ws.cell(row=row, column=3).border = border
-    ws.cell(row=row, column=3).fill = money_fill
-    ws.cell(row=row, column=3).number_format = '0.00%'
-    
-    ws.cell(row=row, column=4, value=f"=SUM(D{STRATEGY_DATA_START}:D{STRATEGY_DATA_END})")
-    ws.cell(row=row, column=4).font = Font(bold=True)
-    ws.cell(row=row, column=4).border = border
-    ws.cell(row=row, column=4).fill = money_fill
-    ws.cell(row=row, column=4).number_format = '$#,##0.00'
-    
-    ws.cell(row=row, column=5, value=f"=SUM(E{STRATEGY_DATA_START}:E{STRATEGY_DATA_END})")
-    ws.cell(row=row, column=5).font = Font(bold=True)
-    ws.cell(row=row, column=5).border = border
-    ws.cell(row=row, column=5).fill = money_fill
-    ws.cell(row=row, column=5).number_format = '$#,##0.00'
-    
-    ws.cell(row=row, column=6, value=f"=IF(D{row}>0,E{row}/D{row},0)")
-    ws.cell(row=row, column=6).font = Font(bold=True)
-    ws.cell(row=row, column=6).border = border
-    ws.cell(row=row, column=6).fill = money_fill
-    ws.cell(row=row, column=6).number_format = '0.00%'
+    write_row(ws, STRATEGY_TOTAL_ROW, [
+        "TOTAL",
+        f"=SUM(B{STRATEGY_DATA_START}:B{STRATEGY_DATA_END})",
+        f"=SUM(C{STRATEGY_DATA_START}:C{STRATEGY_DATA_END})",
+        f"=SUM(D{STRATEGY_DATA_START}:D{STRATEGY_DATA_END})",
+        f"=SUM(E{STRATEGY_DATA_START}:E{STRATEGY_DATA_END})",
+        f"=IF(D{STRATEGY_TOTAL_ROW}>0,E{STRATEGY_TOTAL_ROW}/D{STRATEGY_TOTAL_ROW},0)",
+    ], ['Total', 'Total', 'Total %', 'Total $', 'Total $', 'Total %'])
     
     # ========== DETAILED PAIR ALLOCATION ==========
-    row += 3
-    DETAIL_HEADER_ROW = row
-    ws.cell(row=row, column=1, value="DETAILED PAIR ALLOCATION")
-    ws.cell(row=row, column=1).font = header_font
-    ws.cell(row=row, column=1).fill = header_fill
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=11)
-    
-    row += 1
+    write_row(ws, DETAIL_DATA_START - 2, ["DETAILED PAIR ALLOCATION"], 'Main Section', merge_to=11)
     detail_headers = [
         'Strategy', 'Pair', 'Strategy Weight %', 'Pair Weight %', 'Allocation Method',
         'Allocated Capital', 'Annual Return %', 'Expected Profit', 
         'Sharpe Ratio', 'Max Drawdown', 'Min Required Capital'
     ]
-    
-    for col, header in enumerate(detail_headers, start=1):
-        cell = ws.cell(row=row, column=col, value=header)
-        cell.font = subheader_font
-        cell.fill = subheader_fill
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', wrap_text=True)
-    
-    DETAIL_COL_HEADERS_ROW = row
-    row += 1
-    DETAIL_DATA_START = row
-    
-    # Sort data by strategy then by pair weight descending
-    sorted_data = sorted(data, key=lambda x: (x['strategy'], -x['pair_weight']))
-    
-    current_strategy = None
-    pair_rows_by_strategy = {}
-    
-    for item in sorted_data:
-        # Add blank row between strategies
-        if current_strategy != item['strategy']:
-            if current_strategy is not None:
-                row += 1
-            current_strategy = item['strategy']
-            if current_strategy not in pair_rows_by_strategy:
-                pair_rows_by_strategy[current_strategy] = []
-        
-        pair_rows_by_strategy[current_strategy].append(row)
-        
-        # Col A: Strategy
-        display_name = get_strategy_display_name(item['strategy'])
-        ws.cell(row=row, column=1, value=display_name)
-        ws.cell(row=row, column=1).border = border
-        
-        # Col B: Pair
-        ws.cell(row=row, column=2, value=item['pair'])
-        ws.cell(row=row, column=2).border = border
-        
-        # Col C: Strategy Weight % (static)
-        ws.cell(row=row, column=3, value=item['strategy_weight'] / 100)
-        ws.cell(row=row, column=3).border = border
-        ws.cell(row=row, column=3).number_format = '0.00%'
-        
-        # Col D: Pair Weight % (static)
-        ws.cell(row=row, column=4, value=item['pair_weight'] / 100)
-        ws.cell(row=row, column=4).border = border
-        ws.cell(row=row, column=4).number_format = '0.00%'
-        
-        # Col E: Allocation Method
-        ws.cell(row=row, column=5, value=item['alloc_method'])
-        ws.cell(row=row, column=5).border = border
-        
-        # Col F: Allocated Capital (FORMULA)
-        # = Starting Balance * Strategy Weight * Pair Weight
-        formula = f"={BALANCE_CELL}*C{row}*D{row}"
-        ws.cell(row=row, column=6, value=formula)
-        ws.cell(row=row, column=6).border = border
-        ws.cell(row=row, column=6).fill = formula_fill
-        ws.cell(row=row, column=6).number_format = '$#,##0.00'
-        
-        # Col G: Annual Return % (static - based on historical data)
-        ws.cell(row=row, column=7, value=item['annual_return'] / 100)
-        ws.cell(row=row, column=7).border = border
-        ws.cell(row=row, column=7).number_format = '0.00%'
-        
-        # Col H: Expected Profit (FORMULA)
-        # = Allocated Capital * Annual Return %
-        ws.cell(row=row, column=8, value=f"=F{row}*G{row}")
-        ws.cell(row=row, column=8).border = border
-        ws.cell(row=row, column=8).fill = formula_fill
-        ws.cell(row=row, column=8).number_format = '$#,##0.00'
-        
-        # Col I: Sharpe Ratio (static)
-        ws.cell(row=row, column=9, value=item['sharpe'])
-        ws.cell(row=row, column=9).border = border
-        ws.cell(row=row, column=9).number_format = '0.00'
-        
-        # Col J: Max Drawdown (static)
-        ws.cell(row=row, column=10, value=item['max_dd'])
-        ws.cell(row=row, column=10).border = border
-        ws.cell(row=row, column=10).number_format = '$#,##0.00'
-        
-        # Col K: Required Capital (static)
-        ws.cell(row=row, column=11, value=item['required_capital'])
-        ws.cell(row=row, column=11).border = border
-        ws.cell(row=row, column=11).number_format = '$#,##0.00'
-        
-        row += 1
-    
-    DETAIL_DATA_END = row - 1
-    
-    # Add TOTAL row for detail section
-    row += 1
-    DETAIL_TOTAL_ROW = row
-    ws.cell(row=row, column=1, value="TOTAL")
-    ws.cell(row=row, column=1).font = Font(bold=True)
-    ws.cell(row=row, column=1).border = border
-    ws.cell(row=row, column=1).fill = money_fill
-    
-    for col in range(2, 6):
-        ws.cell(row=row, column=col).border = border
-        ws.cell(row=row, column=col).fill = money_fill
-    
-    # Sum of Allocated Capital
-    ws.cell(row=row, column=6, value=f"=SUMIF(A{DETAIL_DATA_START}:A{DETAIL_DATA_END},\"<>\",F{DETAIL_DATA_START}:F{DETAIL_DATA_END})")
-    ws.cell(row=row, column=6).font = Font(bold=True)
-    ws.cell(row=row, column=6).border = border
-    ws.cell(row=row, column=6).fill = money_fill
-    ws.cell(row=row, column=6).number_format = '$#,##0.00'
-    
-    ws.cell(row=row, column=7).border = border
-    ws.cell(row=row, column=7).fill = money_fill
-    
-    # Sum of Expected Profit
-    ws.cell(row=row, column=8, value=f"=SUMIF(A{DETAIL_DATA_START}:A{DETAIL_DATA_END},\"<>\",H{DETAIL_DATA_START}:H{DETAIL_DATA_END})")
-    ws.cell(row=row, column=8).font = Font(bold=True)
-    ws.cell(row=row, column=8).border = border
-    ws.cell(row=row, column=8).fill = money_fill
-    ws.cell(row=row, column=8).number_format = '$#,##0.00'
-    
-    for col in range(9, 12):
-        ws.cell(row=row, column=col).border = border
-        ws.cell(row=row, column=col).fill = money_fill
-    
-    # Now go back and set the strategy expected profit formulas using SUMIF
-    for strat_name, strat_row in strategy_rows.items():
-        # Expected Profit = Sum of all profits for this strategy in detail table
-        formula = f'=SUMIF(A{DETAIL_DATA_START}:A{DETAIL_DATA_END},A{strat_row},H{DETAIL_DATA_START}:H{DETAIL_DATA_END})'
-        ws.cell(row=strat_row, column=5, value=formula)
-    
-    # Set summary formulas
-    ws.cell(row=PROFIT_SUMMARY_ROW, column=2, value=f"=E{STRATEGY_TOTAL_ROW}")
-    ws.cell(row=RETURN_SUMMARY_ROW, column=2, value=f"=IF(B{TOTAL_CAPITAL_ROW}>0,B{PROFIT_SUMMARY_ROW}/B{TOTAL_CAPITAL_ROW},0)")
-    
-    # ========== Column Widths ==========
-    column_widths = {
-        'A': 22, 'B': 28, 'C': 16, 'D': 14, 'E': 18,
-        'F': 18, 'G': 16, 'H': 18, 'I': 12, 'J': 14, 'K': 16
-    }
-    for col, width in column_widths.items():
-        ws.column_dimensions[col].width = width
+    write_row(ws, DETAIL_DATA_START - 1, detail_headers, 'Main Column Header Wrap')
+    
+    detail_styles = ['Cell', 'Cell', 'Cell %', 'Cell %', 'Cell', 'Formula $',
+                     'Cell %', 'Formula $', 'Cell 0.00', 'Cell $', 'Cell $']
+    for row, item in zip(detail_rows, sorted_data):
+        write_row(ws, row, [
+            get_strategy_display_name(item['strategy']),
+            item['pair'],
+            # Strategy Weight % and Pair Weight % (static)
+            item['strategy_weight'] / 100,
+            item['pair_weight'] / 100,
+            item['alloc_method'],
+            # Allocated Capital = Starting Balance * Strategy Weight * Pair Weight
+            f"={BALANCE_CELL}*C{row}*D{row}",
+            # Annual Return % (static - based on historical data)
+            item['annual_return'] / 100,
+            # Expected Profit = Allocated Capital * Annual Return %
+            f"=F{row}*G{row}",
+            item['sharpe'],
+            item['max_dd'],
+            item['required_capital'],
+        ], detail_styles)
+    
+    # TOTAL row for detail section (SUMIF skips the blank rows between strategies)
+    detail_range = f"A{DETAIL_DATA_START}:A{DETAIL_DATA_END},\"<>\""
+    write_row(ws, DETAIL_TOTAL_ROW, [
+        "TOTAL", None, None, None, None,
+        f"=SUMIF({detail_range},F{DETAIL_DATA_START}:F{DETAIL_DATA_END})",
+        None,
+        f"=SUMIF({detail_range},H{DETAIL_DATA_START}:H{DETAIL_DATA_END})",
+    ], ['Total'] + ['Total Blank'] * 4 + ['Total $', 'Total Blank', 'Total $'] + ['Total Blank'] * 3)
+    
+    # ========== HISTORICAL REPLAY (next to the formula view) ==========
+    if replay is not None:
+        create_historical_replay_sheet(wb, replay, starting_balance)
+        print(f"\n📈 Created sheet: Historical Replay ({len(replay['balances'])} starting balances)")
     
     # ========== CREATE 5 ALLOCATION METHOD SHEETS ==========
-    allocation_methods = [
-        ('equal', 'Equal Weight'),
-        ('inv_vol', 'Inv Volatility'),
-        ('sharpe', 'Sharpe Weighted'),
-        ('risk_parity', 'Risk Parity'),
-        ('max_sharpe', 'Max Sharpe')
-    ]
-    
     if strategy_stats and pair_alloc:
         print("\n📊 Creating allocation method simulation sheets...")
-        for method_key, sheet_name in allocation_methods:
+        for method_key, sheet_name in ALLOCATION_METHOD_NAMES.items():
             create_allocation_method_sheet(
                 wb=wb,
                 sheet_name=sheet_name,
@@ -928,9 +922,11 @@ def create_dynamic_excel(data, num_strategies, starting_balance, output_file,
             )
             print(f"   ✓ Created sheet: {sheet_name}")
     
-    # Save
-    wb.save(output_file)
-    print(f"\n✅ Dynamic Excel file saved: {output_file}")
+    # Save (formulas carry cached values for readers other than Excel)
+    cached, uncached = save_workbook(wb, output_file)
+    print(f"\n✅ Dynamic Excel file saved: {output_file} ({cached} formula values cached)")
+    if uncached:
+        print(f"   ⚠️  {uncached} formulas left for Excel to calculate")
     print(f"   → Change cell B3 to update all allocations automatically!")
     print(f"   → 5 allocation method sheets show profit simulations for each method!")
 
@@ -948,30 +944,82 @@ def get_starting_balance():
             print("Invalid input. Please enter a numeric value.")
 
 
-def main():
+def load_analysis_data(analysis=ARTIFACT_DIR):
+    """
+    Simulator inputs (strategy_stats, pair_alloc, strategy_alloc) from the
+    analyzer: its artifact folder, or the tables portfolio_analyzer.main()
+    returns when handed over in-process. None if unavailable.
+    """
+    if isinstance(analysis, dict):
+        print("\n📊 Using analysis tables handed over in-process")
+        tables = analysis
+    else:
+        print(f"\n📊 Loading analysis artifact: {analysis}")
+        try:
+            tables = load_artifact(analysis)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"❌ Error: {e}")
+            return None
+    
+    strategy_stats, pair_alloc, strategy_alloc = analysis_from_tables(tables)
+    print(f"\n✅ Loaded {len(strategy_alloc)} strategies with {sum(len(v) for v in strategy_stats.values())} pairs")
+    return strategy_stats, pair_alloc, strategy_alloc
+
+
+def run_batch(balances, methods=None, analysis=ARTIFACT_DIR,
+              table_file='Portfolio_Scenario_Grid.csv', summary_file='Portfolio_Scenario_Summary.xlsx'):
+    """Non-interactive run: every balance × method scenario to a table file and one summary sheet."""
     print("=" * 60)
-    print("   PORTFOLIO ALLOCATION SIMULATOR (Dynamic Formulas)")
+    print("   PORTFOLIO ALLOCATION SIMULATOR (Batch Scenarios)")
     print("=" * 60)
     
-    excel_file = 'Portfolio_Analysis_Sheets.xlsx'
-    print(f"\n📊 Loading data from: {excel_file}")
+    methods = list(methods or ALLOCATION_METHOD_NAMES)
+    unknown = [method for method in methods if method not in ALLOCATION_METHOD_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown allocation method(s): {', '.join(unknown)} "
+                         f"(choose from {', '.join(ALLOCATION_METHOD_NAMES)})")
     
-    try:
-        xl = pd.ExcelFile(excel_file)
-    except FileNotFoundError:
-        print(f"❌ Error: Could not find {excel_file}")
-        return
+    loaded = load_analysis_data(analysis)
+    if loaded is None:
+        return None
+    strategy_stats, pair_alloc, strategy_alloc = loaded
+    data, num_strategies = prepare_data(strategy_stats, pair_alloc, strategy_alloc)
     
-    print("📈 Parsing strategy statistics...")
-    strategy_stats = parse_strategy_statistics(xl)
+    print(f"\n🔢 Running {len(balances) * len(methods):,} scenarios "
+          f"({len(balances):,} balances × {len(methods)} methods)...")
+    load_manifest()
+    table = run_scenario_grid(data, pair_alloc, balances, methods)
+    if 'Final_Equity' not in table:
+        print("⚠️  No trade reports found - replay columns omitted")
     
-    print("📊 Parsing pair allocations...")
-    pair_alloc = parse_pair_allocation(xl)
+    write_scenario_table(table, table_file)
+    create_scenario_summary_excel(table, summary_file, table_file)
+    print(f"\n✅ Scenario table saved: {table_file}")
+    print(f"✅ Summary sheet saved: {summary_file}")
     
-    print("💼 Parsing strategy allocations...")
-    strategy_alloc = parse_strategy_allocation(xl)
+    print("\n" + "=" * 60)
+    print("   METHOD COMPARISON (smallest and largest balance)")
+    print("=" * 60)
+    for _, scenario in table[table['Balance'].isin([table['Balance'].min(), table['Balance'].max()])].iterrows():
+        line = (f"   ${scenario['Balance']:>12,.0f} {scenario['Method_Name']:<16} "
+                f"expected {scenario['Expected_Annual_Return']:7.2%}/yr")
+        if 'Total_Return' in scenario:
+            line += (f"   replay {scenario['Total_Return']:8.2%}"
+                     f"   worst DD {scenario['Max_Drawdown_Pct']:6.2%}")
+        print(line)
+    print("=" * 60)
+    return table
+
+
+def main(analysis=ARTIFACT_DIR):
+    print("=" * 60)
+    print("   PORTFOLIO ALLOCATION SIMULATOR (Dynamic Formulas)")
+    print("=" * 60)
     
-    print(f"\n✅ Loaded {len(strategy_alloc)} strategies with {sum(len(v) for v in strategy_stats.values())} pairs")
+    loaded = load_analysis_data(analysis)
+    if loaded is None:
+        return
+    strategy_stats, pair_alloc, strategy_alloc = loaded
     
     # Get starting balance
     starting_balance = get_starting_balance()
@@ -980,10 +1028,18 @@ def main():
     print("\n🔢 Preparing allocation data...")
     data, num_strategies = prepare_data(strategy_stats, pair_alloc, strategy_alloc)
     
+    # Replay the raw reports at this allocation for several starting balances
+    print("⏪ Replaying closed trades from the raw reports...")
+    load_manifest()
+    balances = sorted({starting_balance * multiple for multiple in REPLAY_BALANCE_MULTIPLES})
+    replay = replay_portfolio(data, balances)
+    if replay is None:
+        print("⚠️  No trade reports found - skipping the historical replay")
+    
     # Create dynamic Excel
     output_file = 'Portfolio_Allocation_Dynamic.xlsx'
     create_dynamic_excel(data, num_strategies, starting_balance, output_file,
-                         strategy_stats=strategy_stats, pair_alloc=pair_alloc)
+                         strategy_stats=strategy_stats, pair_alloc=pair_alloc, replay=replay)
     
     # Display summary
     total_pairs = len(data)
@@ -995,17 +1051,42 @@ def main():
     print(f"💰 Starting Balance: ${starting_balance:,.2f}")
     print(f"📊 Strategies: {num_strategies}")
     print(f"🔗 Trading Pairs: {total_pairs}")
+    if replay is not None:
+        i = list(replay['balances']).index(starting_balance)
+        print(f"\n⏪ Historical replay ({replay['dates'][0]:%Y-%m-%d} to {replay['dates'][-1]:%Y-%m-%d}):")
+        print(f"   Final Equity: ${replay['final_equity'][i]:,.2f}")
+        print(f"   Worst Drawdown: ${replay['max_drawdown'][i]:,.2f} ({replay['max_drawdown_pct'][i]:.2%})")
+        for year, value in zip(replay['years'], replay['yearly_returns'][i]):
+            print(f"   {year}: {value:.2%}")
     print(f"\n📝 The Excel file contains dynamic formulas.")
     print(f"   Just change cell B3 to recalculate everything!")
     print(f"\n📊 Sheets Created:")
     print(f"   1. Portfolio Allocation - Main allocation view")
-    print(f"   2. Equal Weight - Equal weight simulation")
-    print(f"   3. Inv Volatility - Inverse volatility simulation")
-    print(f"   4. Sharpe Weighted - Sharpe ratio weighted simulation")
-    print(f"   5. Risk Parity - Risk parity simulation")
-    print(f"   6. Max Sharpe - Max Sharpe optimization simulation")
+    print(f"   2. Historical Replay - Daily equity, yearly returns and drawdown from the reports")
+    print(f"   3. Equal Weight - Equal weight simulation")
+    print(f"   4. Inv Volatility - Inverse volatility simulation")
+    print(f"   5. Sharpe Weighted - Sharpe ratio weighted simulation")
+    print(f"   6. Risk Parity - Risk parity simulation")
+    print(f"   7. Max Sharpe - Max Sharpe optimization simulation")
     print("=" * 60)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Portfolio allocation simulator")
+    parser.add_argument('--artifact', default=ARTIFACT_DIR,
+                        help=f"analysis artifact folder written by portfolio_analyzer.py (default {ARTIFACT_DIR})")
+    parser.add_argument('--balances',
+                        help="batch mode: starting balances, comma-separated, start:stop:step "
+                             "ranges allowed (e.g. 10000,25000:100000:25000); no prompt")
+    parser.add_argument('--methods', default=','.join(ALLOCATION_METHOD_NAMES),
+                        help=f"batch mode: pair allocation methods (default {','.join(ALLOCATION_METHOD_NAMES)})")
+    parser.add_argument('--output', default='Portfolio_Scenario_Grid.csv',
+                        help="batch mode: scenario table, .csv or .parquet (default Portfolio_Scenario_Grid.csv)")
+    parser.add_argument('--summary', default='Portfolio_Scenario_Summary.xlsx',
+                        help="batch mode: summary workbook (default Portfolio_Scenario_Summary.xlsx)")
+    args = parser.parse_args()
+    if args.balances:
+        run_batch(parse_balances(args.balances), [m.strip() for m in args.methods.split(',') if m.strip()],
+                  analysis=args.artifact, table_file=args.output, summary_file=args.summary)
+    else:
+        main(analysis=args.artifact)
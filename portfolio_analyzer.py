@@ -7,14 +7,32 @@ A unified program that performs complete portfolio analysis:
 1. Strategy Statistics with MT5 Sharpe Ratios
 2. Pair and Strategy Capital Distribution
 3. Final Portfolio Allocation (with user-selected methods)
-4. Correlation Analysis (within and between strategies)
+4. Monte Carlo drawdown distributions (bootstrapped trade sequences)
+5. Walk-forward backtest of the allocation methods (rolling re-estimation)
+   and the efficient frontier of strategy weights
+6. Correlation Analysis (within and between strategies, pair clusters,
+   rolling windows)
 
 OUTPUTS:
-- Portfolio_Analysis_Sheets.xlsx (4 sheets with all allocations)
-- Portfolio_Correlation_Analysis.xlsx (3 sheets with correlation analysis)
+- Portfolio_Analysis_Sheets.xlsx (7 sheets with all allocations)
+- Portfolio_Correlation_Analysis.xlsx (5 sheets with correlation analysis)
+- Portfolio_Analysis_Artifact/ (typed tables for portfolio_allocation_simulator.py,
+  see analysis_artifact.py; main() also returns them for in-process use)
 
 USAGE:
-    python portfolio_analyzer.py
+    python portfolio_analyzer.py [--jobs N] [--mc-paths N] [--no-walk-forward]
+
+--jobs N parses the MT4/MT5 reports across N worker processes (default 1).
+--mc-paths N caps the Monte Carlo paths per pair/strategy (default 100,000;
+sampling stops earlier once the error bounds are met; 0 skips the sheet).
+--no-walk-forward skips the walk-forward backtest sheet.
+
+Parsed MT4/MT5 reports are cached in .report_cache/ (see trade_store.py),
+together with a run manifest of per-pair results (Sharpe, equity curves,
+daily returns) and of the aggregates built from them (Monte Carlo rows,
+walk-forward, frontier, rolling correlations), so a re-run only recomputes
+what a changed report or an edit of this script feeds; delete that folder
+to force a full re-parse.
 
 TO ADD A NEW STRATEGY:
 1. Add the strategy file path in STRATEGY_FILES config
@@ -27,15 +45,24 @@ TO ADD A NEW STRATEGY:
 
 import pandas as pd
 import numpy as np
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.styles import Font, Alignment
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.utils import get_column_letter
 from openpyxl.formatting.rule import ColorScaleRule
+import argparse
+import hashlib
+import itertools
+import math
 import os
-import re
+import pickle
 from datetime import datetime
 
+from trade_store import (load_trades, load_report_summary, file_fingerprint, prefetch_reports,
+                         record_reads, note_reads, CACHE_DIR, STORE_VERSION)
+from analysis_artifact import write_artifact, ALLOCATION_METHODS, ARTIFACT_DIR
+from formula_cache import save_workbook
+from sheet_render import add_styles, new_workbook, new_sheet, write_row, solid_fill
+
 # ============================================================================
 # CONFIGURATION - EDIT THIS SECTION TO ADD NEW STRATEGIES
 # ============================================================================
@@ -66,6 +93,8 @@ SHARPE_CAPS = {
 }
 
 # User's selected pair allocation methods for each strategy
+# (Equal_Weight, Inverse_Volatility, Sharpe_Weighted, Risk_Parity, Max_Sharpe,
+#  Max_Sharpe_MV, Risk_Parity_ERC, HRP)
 STRATEGY_PAIR_METHODS = {
     '7th_Strategy': 'Sharpe_Weighted',
     'Falcon': 'Risk_Parity',
@@ -83,8 +112,52 @@ STRATEGY_ALLOCATION_METHOD = 'Equal_Weight'
 # Risk-free rate for Sharpe calculation
 RISK_FREE_RATE = 0.0
 
-# Assumed correlation between strategies (typical for forex)
-STRATEGY_CORRELATION = 0.3
+# Daily returns are calendar-daily (weekends included)
+RETURN_PERIODS_PER_YEAR = 365
+
+# Show correlation matrices in hierarchical cluster order (see cluster_order)
+CORRELATION_CLUSTER_ORDER = True
+
+# Rolling correlation windows (daily rows) and stress periods to report on
+ROLLING_CORRELATION_WINDOWS = [60, 120, 250]
+# Series with fewer non-zero days than this in a window get no correlation
+ROLLING_CORRELATION_MIN_ACTIVE_DAYS = 3
+CORRELATION_STRESS_PERIODS = {
+    'COVID crash (Feb-Apr 2020)': ('2020-02-19', '2020-04-30'),
+    'Rate shock (Sep-Oct 2022)': ('2022-09-01', '2022-10-31'),
+}
+
+# Optional per-asset weight cap (fraction) for the Max_Sharpe_MV optimizer
+MV_MAX_WEIGHT = None
+
+# Monte Carlo trade bootstrap: paths, block length in trades (None/1 = iid),
+# drawdown confidence for the capital column, loss fraction counted as ruin,
+# memory bound per chunk of paths and RNG seed (reproducible sheets).
+# Paths are drawn in batches of MONTE_CARLO_BATCH_PATHS until the 95% CI of
+# the P99 drawdown is within MONTE_CARLO_DD_TOLERANCE of it and that of the
+# ruin probability within MONTE_CARLO_RUIN_TOLERANCE, or MONTE_CARLO_PATHS
+# paths are reached
+MONTE_CARLO_PATHS = 100_000
+MONTE_CARLO_BATCH_PATHS = 10_000
+MONTE_CARLO_DD_TOLERANCE = 0.02
+MONTE_CARLO_RUIN_TOLERANCE = 0.005
+MONTE_CARLO_BLOCK_SIZE = 10
+MONTE_CARLO_CONFIDENCE = 0.95
+MONTE_CARLO_RUIN_FRACTION = 0.5
+MONTE_CARLO_CHUNK_BYTES = 64 * 1024 * 1024
+MONTE_CARLO_SEED = 42
+
+# Walk-forward backtest: training window and re-fit step, in daily rows
+WALK_FORWARD_TRAIN_DAYS = 365
+WALK_FORWARD_STEP_DAYS = 30
+
+# Efficient frontier: upper bound on the strategy-weight grid size (the finest
+# grid that fits is used), portfolios per evaluation chunk, memory budget for
+# one block of daily equity and rows reported per frontier
+FRONTIER_MAX_POINTS = 200_000
+FRONTIER_CHUNK_POINTS = 50_000
+FRONTIER_CHUNK_BYTES = 16 * 1024 * 1024
+FRONTIER_REPORT_POINTS = 40
 
 # Equity curve file paths for correlation analysis
 STRATEGY_EQUITY_PATHS = {
@@ -198,45 +271,33 @@ def get_strategy_display_name(internal_name):
 # UTILITY FUNCTIONS - FILE LOADING
 # ============================================================================
 
-def read_html_file(filepath):
-    """Read HTML file with various encodings"""
-    try:
-        with open(filepath, 'rb') as f:
-            content = f.read()
-        for enc in ['utf-16', 'utf-16-le', 'utf-16-be', 'utf-8', 'latin-1']:
-            try:
-                decoded = content.decode(enc)
-                if '<' in decoded:
-                    return decoded
-            except:
-                continue
-    except:
-        pass
-    return None
+# Per-run memo of multi-symbol reports: (path, fingerprint) -> {symbol: equity_df}
+_MULTI_SYMBOL_CURVES = {}
+
+# Per-run memo of multi-symbol Sharpe: (path, fingerprint) -> ({symbol: sharpe}, overall)
+_SYMBOL_SHARPE_CACHE = {}
 
+# Per-run memo of daily P&L: (path, fingerprint) -> {None or symbol: Series}
+_REPORT_PNL = {}
 
-def extract_mt5_sharpe(content):
-    """Extract Sharpe Ratio directly from MT5 HTML report"""
-    match = re.search(r'Sharpe\s*Ratio.*?<b>([+-]?\d+\.?\d*)</b>', content, re.IGNORECASE | re.DOTALL)
-    return float(match.group(1)) if match else None
+# Per-run memo of closed trades: (path, fingerprint) -> {None or symbol: DataFrame}
+_REPORT_TRADE_PNL = {}
+
+
+def extract_report_sharpe(filepath):
+    """Sharpe Ratio from the summary block of an MT5 HTML report"""
+    try:
+        return load_report_summary(filepath).get('sharpe_ratio')
+    except Exception:
+        return None
 
 
 def extract_trades_from_excel(filepath):
     """Extract individual trade profits from Excel file"""
     try:
-        df = pd.read_excel(filepath, skiprows=2)
-        if 'Profit' in df.columns:
-            profits = []
-            for val in df['Profit'].dropna():
-                try:
-                    if isinstance(val, str):
-                        val = float(val.replace(' ', '').replace(',', ''))
-                    if val != 0:
-                        profits.append(val)
-                except:
-                    pass
-            return profits
-    except:
+        profits = load_trades(filepath)['profit'].dropna()
+        return profits[profits != 0].tolist()
+    except Exception:
         pass
     return []
 
@@ -244,65 +305,45 @@ def extract_trades_from_excel(filepath):
 def extract_trades_from_csv(filepath):
     """Extract individual trade profits from CSV file"""
     try:
-        df = pd.read_csv(filepath, skiprows=2, header=None)
-        profits = []
-        for col in df.columns:
-            try:
-                vals = df[col].dropna()
-                numeric_vals = pd.to_numeric(vals, errors='coerce').dropna()
-                if len(numeric_vals) > 10:
-                    if numeric_vals.min() < 0 and numeric_vals.max() > 0:
-                        profits = numeric_vals.tolist()
-                        break
-            except:
-                pass
-        return profits
-    except:
+        return load_trades(filepath)['profit'].dropna().tolist()
+    except Exception:
         pass
     return []
 
 
-def extract_trades_from_reversal_excel(filepath):
-    """Extract individual trade profits from Reversal Strategy Excel file"""
+def extract_symbol_trades_from_reversal_excel(filepath):
+    """Extract (symbols, profits) arrays of closed trades from Reversal Strategy Excel file"""
     try:
-        df = pd.read_excel(filepath, skiprows=2)
-        if 'Profit' in df.columns and 'Symbol' in df.columns:
-            profits = []
-            for idx, row in df.iterrows():
-                if pd.isna(row['Symbol']):
-                    continue
-                val = row['Profit']
-                if pd.isna(val):
-                    continue
-                try:
-                    if isinstance(val, str):
-                        val = float(val.replace(' ', '').replace(',', ''))
-                    if val != 0 and abs(val) < 10000:
-                        profits.append(val)
-                except:
-                    pass
-            if profits:
-                return profits
+        trades = load_trades(filepath)
+        trades = trades[trades['symbol'].notna() & trades['profit'].notna()]
+        trades = trades[(trades['profit'] != 0) & (trades['profit'].abs() < 10000)]
+        return trades['symbol'].to_numpy(dtype=object), trades['profit'].to_numpy(dtype=float)
     except Exception as e:
         print(f"Error extracting Reversal Strategy trades: {e}")
-    return []
+    return np.array([], dtype=object), np.array([], dtype=float)
+
+
+def extract_trades_from_reversal_excel(filepath):
+    """Extract individual trade profits from Reversal Strategy Excel file"""
+    _, profits = extract_symbol_trades_from_reversal_excel(filepath)
+    return profits.tolist()
+
+
+def trades_to_equity_curve(trades, pair_name):
+    """Turn (time, balance) trade rows into a sorted single-column equity frame"""
+    df = trades[['time', 'balance']].dropna()
+    df = df.set_index('time').sort_index()
+    df.index.name = 'Time'
+    df.columns = [pair_name]
+    return df
 
 
 def load_csv_equity_curve(file_path, pair_name):
     """Load equity curve from CSV file"""
     try:
-        df = pd.read_csv(file_path, skiprows=2)
-        df.columns = df.columns.str.strip()
-        df = df[df['Type'].str.contains('close', case=False, na=False)]
-        df = df[['Time', 'Balance']].copy()
-        df['Balance'] = df['Balance'].astype(str).str.replace(',', '').str.replace('"', '')
-        df['Balance'] = pd.to_numeric(df['Balance'], errors='coerce')
-        df['Time'] = pd.to_datetime(df['Time'], errors='coerce')
-        df = df.dropna()
-        df = df.set_index('Time')
-        df = df.sort_index()
-        df.columns = [pair_name]
-        return df
+        trades = load_trades(file_path)
+        trades = trades[trades['type'].str.contains('close', na=False)]
+        return trades_to_equity_curve(trades, pair_name)
     except Exception as e:
         return None
 
@@ -310,17 +351,9 @@ def load_csv_equity_curve(file_path, pair_name):
 def load_excel_equity_curve(file_path, pair_name):
     """Load equity curve from Excel file"""
     try:
-        df = pd.read_excel(file_path, skiprows=2)
-        df.columns = df.columns.str.strip()
-        df = df[df['Type'].str.contains('close', case=False, na=False)]
-        df = df[['Time', 'Balance']].copy()
-        df['Balance'] = pd.to_numeric(df['Balance'], errors='coerce')
-        df['Time'] = pd.to_datetime(df['Time'], errors='coerce')
-        df = df.dropna()
-        df = df.set_index('Time')
-        df = df.sort_index()
-        df.columns = [pair_name]
-        return df
+        trades = load_trades(file_path)
+        trades = trades[trades['type'].str.contains('close', na=False)]
+        return trades_to_equity_curve(trades, pair_name)
     except Exception as e:
         return None
 
@@ -328,42 +361,88 @@ def load_excel_equity_curve(file_path, pair_name):
 def load_pairtrading_equity_curve(file_path, pair_name):
     """Load equity curve from Pair Trading EA Excel file"""
     try:
-        df = pd.read_excel(file_path, skiprows=2)
-        df.columns = df.columns.str.strip()
-        df = df[df['Balance'].notna()]
-        df = df[['Time', 'Balance']].copy()
-        df['Balance'] = df['Balance'].astype(str).str.replace(' ', '').str.replace(',', '')
-        df['Balance'] = pd.to_numeric(df['Balance'], errors='coerce')
-        df['Time'] = df['Time'].astype(str).str.strip()
-        df['Time'] = pd.to_datetime(df['Time'], format='%Y.%m.%d %H:%M:%S', errors='coerce')
-        df = df.dropna()
-        df = df[~df.duplicated(subset=['Time'], keep='last')]
-        df = df.set_index('Time')
-        df = df.sort_index()
-        df.columns = [pair_name]
-        return df
+        trades = load_trades(file_path)
+        trades = trades[trades['balance'].notna()]
+        trades = trades[~trades.duplicated(subset=['time'], keep='last')]
+        return trades_to_equity_curve(trades, pair_name)
     except Exception as e:
         return None
 
 
+def load_multi_symbol_equity_curves(file_path):
+    """
+    Load one equity curve per Symbol from a multi-symbol MT5 report.
+    The report is parsed once and split with a single groupby; the result is
+    memoized per file so every pair of the strategy shares the same parse.
+    """
+    key = (os.path.abspath(file_path), file_fingerprint(file_path))
+    if key in _MULTI_SYMBOL_CURVES:
+        note_reads([file_path])
+        return _MULTI_SYMBOL_CURVES[key]
+    
+    trades = load_trades(file_path)
+    trades = trades[trades['symbol'].notna() & trades['balance'].notna()]
+    curves = {}
+    for symbol, group in trades.groupby('symbol', sort=False):
+        group = group[~group.duplicated(subset=['time'], keep='last')]
+        curves[symbol] = trades_to_equity_curve(group, symbol)
+    
+    _MULTI_SYMBOL_CURVES[key] = curves
+    return curves
+
+
+def load_report_daily_pnl(file_path):
+    """
+    Realized P&L per day from a report's Profit column (deposits excluded):
+    {None: whole report, symbol: per Symbol}. Memoized per file for the run.
+    Balances of multi-symbol reports are account-wide, hence Profit, not Balance.
+    """
+    key = (os.path.abspath(file_path), file_fingerprint(file_path))
+    if key in _REPORT_PNL:
+        note_reads([file_path])
+        return _REPORT_PNL[key]
+    
+    trades = load_trades(file_path)
+    trades = trades[trades['profit'].notna() & (trades['type'] != 'balance')]
+    days = trades['time'].dt.normalize()
+    pnl = {None: trades['profit'].groupby(days).sum()}
+    with_symbol = trades['symbol'].notna()
+    for symbol, profits in trades.loc[with_symbol, 'profit'].groupby(trades.loc[with_symbol, 'symbol']):
+        pnl[symbol] = profits.groupby(days[profits.index]).sum()
+    
+    _REPORT_PNL[key] = pnl
+    return pnl
+
+
+def load_report_trade_pnl(file_path):
+    """
+    Realized P&L ('profit') and volume in lots ('size') of every closed trade
+    in time order (deposits and zero-profit entry deals excluded):
+    {None: whole report, symbol: per Symbol}. Memoized per file for the run.
+    """
+    key = (os.path.abspath(file_path), file_fingerprint(file_path))
+    if key in _REPORT_TRADE_PNL:
+        note_reads([file_path])
+        return _REPORT_TRADE_PNL[key]
+    
+    trades = load_trades(file_path)
+    trades = trades[trades['profit'].notna() & (trades['profit'] != 0) & (trades['type'] != 'balance')]
+    trades = trades.sort_values('time', kind='stable')
+    closed = trades.set_index('time')[['profit', 'size']]
+    pnl = {None: closed}
+    with_symbol = trades['symbol'].notna().to_numpy()
+    for symbol, group in closed[with_symbol].groupby(trades.loc[with_symbol, 'symbol'].to_numpy(), sort=False):
+        pnl[symbol] = group
+    
+    _REPORT_TRADE_PNL[key] = pnl
+    return pnl
+
+
 def load_reversal_strategy_equity_curve(file_path, pair_name):
     """Load equity curve from Reversal Strategy Excel file"""
     try:
-        df = pd.read_excel(file_path, sheet_name='1day time frame 2020-25', skiprows=2)
-        df.columns = df.columns.str.strip()
-        if 'Symbol' in df.columns:
-            df = df[df['Symbol'] == pair_name].copy()
-        df = df[df['Balance'].notna() & df['Time'].notna()]
-        df = df[['Time', 'Balance']].copy()
-        df['Balance'] = df['Balance'].astype(str).str.replace(' ', '').str.replace(',', '')
-        df['Balance'] = pd.to_numeric(df['Balance'], errors='coerce')
-        df['Time'] = pd.to_datetime(df['Time'], errors='coerce')
-        df = df.dropna()
-        df = df[~df.duplicated(subset=['Time'], keep='last')]
-        df = df.set_index('Time')
-        df = df.sort_index()
-        df.columns = [pair_name]
-        return df
+        curve = load_multi_symbol_equity_curves(file_path).get(pair_name)
+        return curve.copy() if curve is not None else None
     except Exception as e:
         return None
 
@@ -389,82 +468,92 @@ def calculate_sharpe_from_trades(profits, trading_days=1825):
     return sharpe
 
 
-def get_mt5_sharpe_for_strategy(strategy_name, pair_name):
-    """Get MT5 Sharpe Ratio for a specific strategy and pair"""
+def calculate_sharpe_by_group(groups, profits, trading_days=1825):
+    """
+    Vectorized calculate_sharpe_from_trades for many groups at once
+    Returns (group_labels, sharpe_array); groups with < 2 trades or zero std get 0
+    """
+    labels, codes = np.unique(np.asarray(groups), return_inverse=True)
+    profits = np.asarray(profits, dtype=float)
+    n_groups = len(labels)
     
-    if strategy_name == 'PairTradingEA':
-        folder_variants = [pair_name.replace('_', '-'), pair_name]
-        for folder in folder_variants:
-            html_path = os.path.join(BASE_PATH, 'Pair Trading EA', folder, f'{folder}.html')
-            if os.path.exists(html_path):
-                content = read_html_file(html_path)
-                if content:
-                    sharpe = extract_mt5_sharpe(content)
-                    if sharpe:
-                        return sharpe
-    
-    elif strategy_name == 'RSI_Correlation':
-        folder_variants = [pair_name.replace('_', '-'), pair_name]
-        for folder in folder_variants:
-            html_path = os.path.join(BASE_PATH, 'RSI corelation', folder, f'{folder}.html')
-            if os.path.exists(html_path):
-                content = read_html_file(html_path)
-                if content:
-                    sharpe = extract_mt5_sharpe(content)
-                    if sharpe:
-                        return sharpe
-    
-    elif strategy_name == 'RSI_6_Trades':
-        xlsx_path = os.path.join(BASE_PATH, 'RSI 6 trades', pair_name, f'{pair_name}.xlsx')
-        if os.path.exists(xlsx_path):
-            profits = extract_trades_from_excel(xlsx_path)
-            if profits:
-                return calculate_sharpe_from_trades(profits)
-    
-    elif strategy_name == 'Gold_Dip':
-        csv_path = os.path.join(BASE_PATH, 'Gold Dip', pair_name, f'{pair_name}.csv')
-        if os.path.exists(csv_path):
-            profits = extract_trades_from_csv(csv_path)
-            if profits:
-                return calculate_sharpe_from_trades(profits)
-    
-    elif strategy_name == 'AURUM':
-        folder_map = {'XAUUSD_Grid': 'Gold ', 'USDJPY_Grid': 'USDJPY'}
-        if pair_name in folder_map:
-            folder = folder_map[pair_name]
-            folder_path = os.path.join(BASE_PATH, 'AURUM', folder)
-            if os.path.exists(folder_path):
-                for file in os.listdir(folder_path):
-                    if file.endswith('.xlsx'):
-                        xlsx_path = os.path.join(folder_path, file)
-                        profits = extract_trades_from_excel(xlsx_path)
-                        if profits:
-                            return calculate_sharpe_from_trades(profits)
-    
-    elif strategy_name == '7th_Strategy':
-        file_map = {'XAUUSD': 'XAUUSD 20-25.csv', 'XAGUSD': 'XAGUSD 20-25.csv'}
-        if pair_name in file_map:
-            csv_path = os.path.join(BASE_PATH, '7th strategy', file_map[pair_name])
-            if os.path.exists(csv_path):
-                profits = extract_trades_from_csv(csv_path)
-                if profits:
-                    return calculate_sharpe_from_trades(profits)
-    
-    elif strategy_name == 'Falcon':
-        file_map = {'V5': 'V5.csv', 'v5-v2 - Tp 60,SL 60 all day': 'v5-v2 - Tp 60,SL 60 all day.csv'}
-        if pair_name in file_map:
-            csv_path = os.path.join(BASE_PATH, 'Falcon', file_map[pair_name])
-            if os.path.exists(csv_path):
-                profits = extract_trades_from_csv(csv_path)
-                if profits:
-                    return calculate_sharpe_from_trades(profits)
-    
-    elif strategy_name == 'Reversal_Strategy':
-        xlsx_path = os.path.join(BASE_PATH, 'Reversal Strategy', 'All Pairs - 1 Day.xlsx')
-        if os.path.exists(xlsx_path):
-            profits = extract_trades_from_reversal_excel(xlsx_path)
-            if profits:
-                return calculate_sharpe_from_trades(profits)
+    counts = np.bincount(codes, minlength=n_groups).astype(float)
+    means = np.bincount(codes, weights=profits, minlength=n_groups) / np.maximum(counts, 1)
+    sq_dev = np.bincount(codes, weights=(profits - means[codes]) ** 2, minlength=n_groups)
+    std = np.sqrt(sq_dev / np.maximum(counts - 1, 1))
+    
+    trades_per_year = counts / (trading_days / 365) if trading_days > 0 else counts
+    valid = (counts >= 2) & (std > 0)
+    sharpe = np.zeros(n_groups)
+    sharpe[valid] = means[valid] / std[valid] * np.sqrt(trades_per_year[valid])
+    return labels, sharpe
+
+
+def get_multi_symbol_sharpe(filepath):
+    """
+    Per-symbol and report-wide Sharpe for a multi-symbol report from one parse
+    Returns ({symbol: sharpe}, overall_sharpe); memoized per file for the run
+    """
+    key = (os.path.abspath(filepath), file_fingerprint(filepath))
+    note_reads([filepath])
+    if key not in _SYMBOL_SHARPE_CACHE:
+        symbols, profits = extract_symbol_trades_from_reversal_excel(filepath)
+        labels, sharpe = calculate_sharpe_by_group(symbols, profits)
+        overall = calculate_sharpe_from_trades(profits) if len(profits) else None
+        _SYMBOL_SHARPE_CACHE[key] = (dict(zip(labels.tolist(), sharpe.tolist())), overall)
+    return _SYMBOL_SHARPE_CACHE[key]
+
+
+def sharpe_input_paths(strategy_name, pair_name):
+    """
+    Every report path get_mt5_sharpe_for_strategy probes for a pair, in probe
+    order and present or not (folder-name variants, the listed AURUM folder),
+    so a report that appears or changes later invalidates a stored Sharpe
+    """
+    if strategy_name in ['PairTradingEA', 'RSI_Correlation']:
+        root = 'Pair Trading EA' if strategy_name == 'PairTradingEA' else 'RSI corelation'
+        return [os.path.join(BASE_PATH, root, folder, f'{folder}.html')
+                for folder in [pair_name.replace('_', '-'), pair_name]]
+    if strategy_name == 'RSI_6_Trades':
+        return [os.path.join(BASE_PATH, 'RSI 6 trades', pair_name, f'{pair_name}.xlsx')]
+    if strategy_name == 'Gold_Dip':
+        return [os.path.join(BASE_PATH, 'Gold Dip', pair_name, f'{pair_name}.csv')]
+    if strategy_name == 'AURUM':
+        folder = {'XAUUSD_Grid': 'Gold ', 'USDJPY_Grid': 'USDJPY'}.get(pair_name)
+        if folder is None:
+            return []
+        folder_path = os.path.join(BASE_PATH, 'AURUM', folder)
+        files = sorted(os.listdir(folder_path)) if os.path.isdir(folder_path) else []
+        return [folder_path] + [os.path.join(folder_path, f) for f in files if f.endswith('.xlsx')]
+    if strategy_name == '7th_Strategy':
+        file_name = {'XAUUSD': 'XAUUSD 20-25.csv', 'XAGUSD': 'XAGUSD 20-25.csv'}.get(pair_name)
+        return [os.path.join(BASE_PATH, '7th strategy', file_name)] if file_name else []
+    if strategy_name == 'Falcon':
+        file_name = {'V5': 'V5.csv',
+                     'v5-v2 - Tp 60,SL 60 all day': 'v5-v2 - Tp 60,SL 60 all day.csv'}.get(pair_name)
+        return [os.path.join(BASE_PATH, 'Falcon', file_name)] if file_name else []
+    if strategy_name == 'Reversal_Strategy':
+        return [os.path.join(BASE_PATH, 'Reversal Strategy', 'All Pairs - 1 Day.xlsx')]
+    return []
+
+
+def get_mt5_sharpe_for_strategy(strategy_name, pair_name):
+    """Get MT5 Sharpe Ratio for a specific strategy and pair from the first report that gives one"""
+    for path in sharpe_input_paths(strategy_name, pair_name):
+        if not os.path.isfile(path):
+            continue
+        if strategy_name == 'Reversal_Strategy':
+            symbol_sharpe, overall_sharpe = get_multi_symbol_sharpe(path)
+            # Individual symbols get their own Sharpe; ALL_PAIRS the report-wide one
+            return symbol_sharpe.get(pair_name, overall_sharpe)
+        if path.endswith('.html'):
+            sharpe = extract_report_sharpe(path)
+            if sharpe:
+                return sharpe
+            continue
+        profits = extract_trades_from_excel(path) if path.endswith('.xlsx') else extract_trades_from_csv(path)
+        if profits:
+            return calculate_sharpe_from_trades(profits)
     
     return None
 
@@ -514,8 +603,193 @@ def calculate_max_sharpe_weight(sharpe_ratios, returns, max_drawdowns):
     return score / score.sum() * 100
 
 
-def get_pair_weights(df, method_name):
-    """Get weights for pairs based on allocation method"""
+def project_to_capped_simplex(v, cap=1.0):
+    """
+    Euclidean projection onto {w : 0 <= w <= cap, sum(w) = 1}
+    w = clip(v - tau, 0, cap), where sum(w) is piecewise linear in tau with
+    breakpoints v and v - cap: evaluate all of them at once, then interpolate
+    """
+    v = np.asarray(v, dtype=float)
+    cap = max(cap, 1.0 / len(v))
+    breaks = np.sort(np.concatenate([v - cap, v]))
+    sums = np.clip(v - breaks[:, None], 0, cap).sum(axis=1)
+    k = max(np.count_nonzero(sums >= 1) - 1, 0)
+    if sums[k] > sums[k + 1]:
+        tau = breaks[k] + (sums[k] - 1) / (sums[k] - sums[k + 1]) * (breaks[k + 1] - breaks[k])
+    else:
+        tau = breaks[k]
+    w = np.clip(v - tau, 0, cap)
+    return w / w.sum()
+
+
+def optimize_max_sharpe(mu, cov, max_weight=None, initial=None, max_iter=5000, tol=1e-10):
+    """
+    Long-only (optionally capped) tangency portfolio by projected gradient ascent
+    on the Sharpe ratio with backtracking steps; initial = warm start weights
+    Returns (weights summing to 1, info dict: sharpe, iterations, converged)
+    """
+    mu = np.asarray(mu, dtype=float)
+    cov = np.asarray(cov, dtype=float)
+    n = len(mu)
+    cap = 1.0 if max_weight is None else max_weight
+    
+    def sharpe_of(w):
+        variance = w @ cov @ w
+        return w @ mu / np.sqrt(variance) if variance > 0 else -np.inf
+    
+    start = np.ones(n) if initial is None or len(initial) != n else np.asarray(initial, dtype=float)
+    w = project_to_capped_simplex(start / max(start.sum(), 1e-12), cap)
+    if n == 1 or not np.any(mu > 0) or not np.isfinite(sharpe_of(w)):
+        return w, {'sharpe': sharpe_of(w), 'iterations': 0, 'converged': n == 1}
+    
+    current = sharpe_of(w)
+    step = 1.0
+    converged = False
+    for iteration in range(1, max_iter + 1):
+        variance = w @ cov @ w
+        vol = np.sqrt(variance)
+        grad = mu / vol - (w @ mu) * (cov @ w) / (variance * vol)
+        
+        # Backtracking: shrink until the projected step improves the Sharpe
+        while True:
+            candidate = project_to_capped_simplex(w + step * grad, cap)
+            value = sharpe_of(candidate)
+            if value >= current + 1e-4 * grad @ (candidate - w) or step < 1e-14:
+                break
+            step *= 0.5
+        
+        change = np.abs(candidate - w).max()
+        if value >= current:
+            w, current = candidate, value
+        if change < tol:
+            converged = True
+            break
+        step *= 2.0
+    
+    return w, {'sharpe': current, 'iterations': iteration, 'converged': converged}
+
+
+def max_sharpe_active_set(mu, cov, support, max_weight=None, max_updates=None):
+    """
+    Long-only tangency weights by an active-set search from a starting
+    support: solve w_S ∝ Σ_SS⁻¹·μ_S, drop assets with non-positive weight,
+    add the asset outside with the largest Sharpe gradient
+    μ_i - (wᵀμ / wᵀΣw)·(Σw)_i while any is positive. Returns the weights once
+    they satisfy the optimality conditions, None if the search fails (singular
+    block, max_weight binding, no positive solution, max_updates reached)
+    """
+    mu = np.asarray(mu, dtype=float)
+    cov = np.asarray(cov, dtype=float)
+    n = len(mu)
+    active = np.asarray(support, dtype=bool).copy()
+    tolerance = 1e-12 * max(np.abs(mu).max(), 1e-300)
+    for _ in range(2 * n if max_updates is None else max_updates):
+        index = np.flatnonzero(active)
+        if len(index) == 0:
+            return None
+        try:
+            z = np.linalg.solve(cov[np.ix_(index, index)], mu[index])
+        except np.linalg.LinAlgError:
+            return None
+        if not np.all(z > 0):
+            if not np.any(z > 0):
+                return None
+            active[index[z <= 0]] = False
+            continue
+        w = np.zeros(n)
+        w[index] = z / z.sum()
+        if max_weight is not None and w.max() > max_weight:
+            return None
+        cov_w = cov @ w
+        expected, variance = w @ mu, w @ cov_w
+        if expected <= 0 or variance <= 0:
+            return None
+        gradient = np.where(active, -np.inf, mu - expected / variance * cov_w)
+        best = np.argmax(gradient)
+        if gradient[best] <= tolerance:
+            return w
+        active[best] = True
+    return None
+
+
+def calculate_max_sharpe_mv_weight(asset_returns, max_weight=MV_MAX_WEIGHT, warm_start_key=None):
+    """
+    Mean-variance max Sharpe allocation from a dates x assets return array
+    Solutions are kept per warm_start_key (e.g. the asset names) for the run
+    and used as the starting point of the next solve for the same assets
+    """
+    mu, cov = estimate_return_moments(asset_returns)
+    initial = _MV_WARM_STARTS.get(warm_start_key)
+    weights, _ = optimize_max_sharpe(mu, cov, max_weight, initial)
+    if warm_start_key is not None:
+        _MV_WARM_STARTS[warm_start_key] = weights
+    return weights * 100
+
+
+def solve_equal_risk_contribution(cov, budgets=None, max_sweeps=10000, tol=1e-10):
+    """
+    Equal-risk-contribution weights by cyclical coordinate descent on
+    ½yᵀΣy - Σ b_i·ln(y_i): each coordinate is the positive root of
+    Σ_ii·y_i² + (Σy - Σ_ii·y_i)·y_i - b_i = 0, with Σy updated in O(n).
+    Assets with zero variance carry no risk and get weight 0.
+    Returns (weights summing to 1, info dict: sweeps, converged,
+    max_rc_error = max |RC_i / total risk - b_i|, excluded)
+    """
+    cov = np.atleast_2d(np.asarray(cov, dtype=float))
+    n = len(cov)
+    weights = np.zeros(n)
+    active = np.flatnonzero(np.diag(cov) > 0)
+    info = {'sweeps': 0, 'converged': True, 'max_rc_error': 0.0, 'excluded': n - len(active)}
+    if len(active) == 0:
+        return np.ones(n) / n, info
+    
+    sub_cov = cov[np.ix_(active, active)]
+    m = len(active)
+    b = np.ones(m) / m if budgets is None else np.asarray(budgets, dtype=float)[active]
+    b = b / b.sum()
+    diag = np.diag(sub_cov)
+    
+    # Start from inverse volatility scaled to unit portfolio risk
+    y = 1 / np.sqrt(diag)
+    y /= np.sqrt(y @ sub_cov @ y)
+    sigma_y = sub_cov @ y
+    
+    converged = False
+    for sweep in range(1, max_sweeps + 1):
+        for i in range(m):
+            c = sigma_y[i] - diag[i] * y[i]
+            new = (-c + np.sqrt(c * c + 4 * diag[i] * b[i])) / (2 * diag[i])
+            sigma_y += sub_cov[:, i] * (new - y[i])
+            y[i] = new
+        contributions = y * sigma_y
+        rc_error = np.abs(contributions / contributions.sum() - b).max()
+        if rc_error < tol:
+            converged = True
+            break
+    
+    weights[active] = y / y.sum()
+    info.update(sweeps=sweep, converged=converged, max_rc_error=float(rc_error))
+    return weights, info
+
+
+def calculate_erc_weight(asset_returns, label=None):
+    """
+    Equal-risk-contribution allocation from a dates x assets return array
+    Solver diagnostics are kept per label for the run summary
+    """
+    _, cov = estimate_return_moments(asset_returns)
+    weights, info = solve_equal_risk_contribution(cov)
+    if label is not None:
+        _ERC_DIAGNOSTICS[label] = info
+    return weights * 100
+
+
+def get_pair_weights(df, method_name, pair_returns=None):
+    """
+    Get weights for pairs based on allocation method
+    pair_returns (dates x pairs) is needed by Max_Sharpe_MV, Risk_Parity_ERC and
+    HRP; without it they fall back to the Max_Sharpe / Risk_Parity scores
+    """
     n_pairs = len(df)
     sharpe_ratios = df['Sharpe_Ratio'].values
     max_drawdowns = df['Max_Drawdown'].values
@@ -527,110 +801,86 @@ def get_pair_weights(df, method_name):
         'Sharpe_Weighted': lambda: calculate_sharpe_weight(sharpe_ratios),
         'Risk_Parity': lambda: calculate_risk_parity_weight(sharpe_ratios, max_drawdowns),
         'Max_Sharpe': lambda: calculate_max_sharpe_weight(sharpe_ratios, returns, max_drawdowns),
+        'Max_Sharpe_MV': lambda: (
+            calculate_max_sharpe_mv_weight(pair_returns, warm_start_key=tuple(df['Currency_Pair']))
+            if pair_returns is not None
+            else calculate_max_sharpe_weight(sharpe_ratios, returns, max_drawdowns)),
+        'Risk_Parity_ERC': lambda: (
+            calculate_erc_weight(pair_returns, label=tuple(df['Currency_Pair']))
+            if pair_returns is not None
+            else calculate_risk_parity_weight(sharpe_ratios, max_drawdowns)),
+        'HRP': lambda: (
+            calculate_hrp_weight(pair_returns) if pair_returns is not None
+            else calculate_risk_parity_weight(sharpe_ratios, max_drawdowns)),
     }
     return methods.get(method_name, methods['Equal_Weight'])()
 
 
-def estimate_correlation_matrix(n, base_correlation=0.3):
-    """Estimate correlation matrix with assumed correlation"""
-    corr = np.full((n, n), base_correlation)
-    np.fill_diagonal(corr, 1.0)
-    return corr
+def pair_allocation_weights(df, pair_returns=None):
+    """Pair weights (%) of every allocation method (Sheet 2 and the simulator hand-off)"""
+    return {method: get_pair_weights(df, method, pair_returns) for method in ALLOCATION_METHODS}
 
 
-def calculate_portfolio_sharpe(weights, sharpe_ratios, volatilities=None, correlation=0.3):
+def calculate_portfolio_sharpe(weights, mu, cov):
     """
     Calculate Portfolio Sharpe Ratio using: S_p = (w^T × μ) / sqrt(w^T × Σ × w)
+    μ, Σ = empirical mean / covariance of daily returns (see estimate_return_moments)
     """
-    weights = np.array(weights) / 100
-    sharpe = np.array(sharpe_ratios)
-    n = len(weights)
-    
-    if volatilities is None or len(volatilities) != n:
-        return np.sum(weights * sharpe)
-    
-    vol = np.array(volatilities)
-    vol = np.where(vol <= 0, 1, vol)
-    mu = sharpe * vol
-    portfolio_return = np.sum(weights * mu)
-    corr_matrix = estimate_correlation_matrix(n, correlation)
-    cov_matrix = np.outer(vol, vol) * corr_matrix
-    portfolio_variance = weights @ cov_matrix @ weights
-    portfolio_std = np.sqrt(portfolio_variance)
-    
-    if portfolio_std > 0:
-        portfolio_sharpe = portfolio_return / portfolio_std
-    else:
-        portfolio_sharpe = 0
-    
-    return portfolio_sharpe
-
-
-def calculate_portfolio_xirr(weights, xirr_values):
-    """Calculate weighted portfolio XIRR"""
-    weights = np.array(weights) / 100
-    xirr = np.array(xirr_values)
-    return np.sum(weights * xirr)
+    return float(evaluate_portfolios(weights, mu, cov)['sharpe'][0])
 
 
 # ============================================================================
 # EXCEL STYLING UTILITIES
 # ============================================================================
 
-def style_header(ws, row, start_col, end_col):
-    """Apply header styling"""
-    header_fill = PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    for col in range(start_col, end_col + 1):
-        cell = ws.cell(row=row, column=col)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-
-
-def style_subheader(ws, row, start_col, end_col):
-    """Apply subheader styling"""
-    subheader_fill = PatternFill(start_color="2E75B6", end_color="2E75B6", fill_type="solid")
-    subheader_font = Font(bold=True, color="FFFFFF", size=10)
-    for col in range(start_col, end_col + 1):
-        cell = ws.cell(row=row, column=col)
-        cell.fill = subheader_fill
-        cell.font = subheader_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-
-
-def style_strategy_header(ws, row, start_col, end_col, color="4472C4"):
-    """Apply strategy section header styling"""
-    strategy_fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
-    strategy_font = Font(bold=True, color="FFFFFF", size=12)
-    for col in range(start_col, end_col + 1):
-        cell = ws.cell(row=row, column=col)
-        cell.fill = strategy_fill
-        cell.font = strategy_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-
-
-def style_result_row(ws, row, start_col, end_col, color="E2EFDA"):
-    """Apply result row styling"""
-    result_fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
-    result_font = Font(bold=True, size=10)
-    for col in range(start_col, end_col + 1):
-        cell = ws.cell(row=row, column=col)
-        cell.fill = result_fill
-        cell.font = result_font
-
-
-def add_border(ws, start_row, end_row, start_col, end_col):
-    """Add border to a range"""
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    for row in range(start_row, end_row + 1):
-        for col in range(start_col, end_col + 1):
-            ws.cell(row=row, column=col).border = thin_border
+# Style objects shared by every styled cell (built once, not per call or cell)
+HEADER_FILL = solid_fill("1F4E79")
+HEADER_FONT = Font(bold=True, color="FFFFFF", size=11)
+SUBHEADER_FILL = solid_fill("2E75B6")
+SUBHEADER_FONT = Font(bold=True, color="FFFFFF", size=10)
+STRATEGY_HEADER_FONT = Font(bold=True, color="FFFFFF", size=12)
+RESULT_FONT = Font(bold=True, size=10)
+CENTERED = Alignment(horizontal='center', vertical='center')
+
+# Named cell styles of the row-written sheets (every sheet of both workbooks)
+TABLE_STYLES = {
+    'Sheet Title': {'font': Font(bold=True, size=16, color="1F4E79"), 'alignment': Alignment(horizontal='center')},
+    'Sheet Note': {'font': Font(italic=True, size=10, color="C00000")},
+    'Grey Note': {'font': Font(italic=True, size=10, color="666666")},
+    'Grey Note Center': {'font': Font(italic=True, size=10, color="666666"),
+                         'alignment': Alignment(horizontal='center')},
+    'Small Note': {'font': Font(italic=True, size=9, color="666666")},
+    'Section Title': {'font': Font(bold=True, size=12, color="1F4E79")},
+    'Table Header': {'font': SUBHEADER_FONT, 'fill': SUBHEADER_FILL, 'border': 'thin', 'alignment': CENTERED},
+    'Matrix Header': {'font': HEADER_FONT, 'fill': HEADER_FILL, 'border': 'thin', 'alignment': CENTERED},
+    'Table Cell': {'border': 'thin'},
+    'Table Cell Bold': {'font': Font(bold=True), 'border': 'thin'},
+    'Matrix Cell': {'border': 'thin', 'alignment': Alignment(horizontal='center')},
+    'Matrix Diagonal': {'fill': "E8E8E8", 'border': 'thin', 'alignment': Alignment(horizontal='center')},
+    'Bold Label': {'font': Font(bold=True)},
+    'Good Label': {'font': Font(bold=True, color="006600")},
+    'Good Value': {'font': Font(bold=True, size=12, color="006600")},
+    'Recommendation': {'font': Font(bold=True, size=12, color="C00000")},
+    # Sheet 4 and the correlation summary
+    'Banner Title': {'font': Font(bold=True, size=18, color="FFFFFF"), 'fill': "1F4E79", 'alignment': CENTERED},
+    'Summary Title': {'font': Font(bold=True, size=18, color="1F4E79"), 'alignment': Alignment(horizontal='center')},
+    'Formula Title': {'font': Font(bold=True, size=10, color="1F4E79")},
+    'Boxed Header 70AD47': {'font': STRATEGY_HEADER_FONT, 'fill': "70AD47", 'border': 'thin', 'alignment': CENTERED},
+    'Boxed Label': {'font': Font(bold=True, size=11), 'border': 'thin'},
+    'Boxed Aside': {'font': Font(size=11, color="666666"), 'border': 'thin'},
+    'Boxed Setting': {'font': Font(size=11, color="0066CC"), 'border': 'thin'},
+    'Boxed Method': {'font': Font(color="0066CC"), 'border': 'thin'},
+    'Boxed Sharpe': {'font': Font(bold=True, size=12, color="006600"), 'border': 'thin'},
+    'Boxed Star': {'font': Font(size=14, color="FFD700"), 'border': 'thin'},
+}
+TABLE_STYLES.update({
+    f'Table Total {color}': {'font': RESULT_FONT, 'fill': color, 'border': 'thin'}
+    for color in ("FFF2CC", "D9E1F2", "E2EFDA")
+})
+TABLE_STYLES.update({
+    f'Strategy Header {color}': {'font': STRATEGY_HEADER_FONT, 'fill': color, 'alignment': CENTERED}
+    for color in STRATEGY_COLORS + ["1F4E79"]
+})
 
 
 def apply_correlation_color_scale(ws, start_row, end_row, start_col, end_col):
@@ -644,6 +894,249 @@ def apply_correlation_color_scale(ws, start_row, end_row, start_col, end_col):
     ws.conditional_formatting.add(range_string, rule)
 
 
+# ============================================================================
+# RUN MANIFEST (INCREMENTAL RE-ANALYSIS)
+# ============================================================================
+# Derived results are saved with the fingerprints of the files they were
+# computed from and a digest of the in-memory data they were given. The next
+# run reuses every result whose inputs are unchanged and recomputes the rest.
+#   - Per-pair results (Sharpe, equity curves, daily returns, trades) depend
+#     on the pair's report files only.
+#   - Aggregates (cash flows, Monte Carlo rows, walk-forward, frontier,
+#     rolling correlations) depend on the data they are built from and on
+#     this script, whose settings they use: editing it recomputes them.
+# Re-exporting one backtest recomputes that pair and the aggregates it feeds.
+
+MANIFEST_PATH = os.path.join(CACHE_DIR, 'analysis_manifest.pkl')
+
+# Bump whenever a derived result changes meaning so old manifests are ignored
+MANIFEST_VERSION = 4
+
+# Code and settings behind every aggregate result
+ANALYZER_SOURCE = os.path.abspath(__file__)
+
+# (kind, key) -> (input fingerprints, data digest, value): previous run / this run
+_PREVIOUS_RESULTS = {}
+_RUN_RESULTS = {}
+
+_MANIFEST_STATS = {'reused': 0, 'computed': 0}
+
+
+def load_manifest(path=None):
+    """Load the previous run's results (missing or outdated manifest -> empty)"""
+    _PREVIOUS_RESULTS.clear()
+    path = path or MANIFEST_PATH
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, 'rb') as f:
+            manifest = pickle.load(f)
+        if manifest.get('version') == (MANIFEST_VERSION, STORE_VERSION):
+            _PREVIOUS_RESULTS.update(manifest['results'])
+    except Exception as e:
+        print(f"  ! Ignoring unreadable manifest {path}: {e}")
+    return len(_PREVIOUS_RESULTS)
+
+
+def save_manifest(path=None):
+    """
+    Persist the results of this run plus every previous result that is still
+    valid but was not looked up (e.g. the equity curve behind a reused daily
+    returns entry); stale entries are dropped
+    """
+    path = path or MANIFEST_PATH
+    results = {key: entry for key, entry in _PREVIOUS_RESULTS.items()
+               if key not in _RUN_RESULTS and entry_is_valid(entry)}
+    results.update(_RUN_RESULTS)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': (MANIFEST_VERSION, STORE_VERSION),
+                         'results': results}, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"  ! Could not save manifest {path}: {e}")
+
+
+def path_fingerprint(path):
+    """File fingerprint, a directory's sorted listing, None if missing"""
+    if os.path.isdir(path):
+        return tuple(sorted(os.listdir(path)))
+    return file_fingerprint(path) if os.path.exists(path) else None
+
+
+def input_fingerprints(paths):
+    """Sorted (path, fingerprint) pairs; missing paths get fingerprint None"""
+    return tuple(sorted((p, path_fingerprint(p)) for p in set(paths)))
+
+
+def entry_is_valid(entry):
+    """
+    True if none of an entry's inputs changed. A None result without inputs
+    is never valid: nothing would tell when its report appears.
+    """
+    inputs, _, value = entry
+    if value is None and not inputs:
+        return False
+    return input_fingerprints(p for p, _ in inputs) == inputs
+
+
+def data_digest(data):
+    """SHA-1 of the pickled data (None -> None); equal digests mean equal content"""
+    if data is None:
+        return None
+    return hashlib.sha1(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+def manifest_result(kind, key, compute, paths=(), data=None):
+    """
+    Return the result for (kind, key), recomputing only if an input changed.
+    Inputs are the reports loaded by compute() plus any extra paths given,
+    and the in-memory data it is computed from (compared by digest).
+    """
+    entry_key = (kind, key)
+    digest = data_digest(data)
+    entry = _RUN_RESULTS.get(entry_key) or _PREVIOUS_RESULTS.get(entry_key)
+    if entry is not None and entry[1] == digest and entry_is_valid(entry):
+        note_reads(p for p, _ in entry[0])
+        if entry_key not in _RUN_RESULTS:
+            _MANIFEST_STATS['reused'] += 1
+        _RUN_RESULTS[entry_key] = entry
+        return entry[2]
+    
+    with record_reads() as reads:
+        value = compute()
+    reads.update(os.path.abspath(p) for p in paths)
+    _RUN_RESULTS[entry_key] = (input_fingerprints(reads), digest, value)
+    _MANIFEST_STATS['computed'] += 1
+    return value
+
+
+def aggregate_result(kind, key, compute, data):
+    """manifest_result of an aggregate: its data, the reports it reads and this script are its inputs"""
+    return manifest_result(kind, key, compute, paths=[ANALYZER_SOURCE], data=data)
+
+
+# ============================================================================
+# XIRR (DATED CASH FLOWS)
+# ============================================================================
+# Each pair is an account holding its required capital: the deposit on the
+# start date, every closed trade's P&L as it is realized (profits paid out,
+# losses topped up, so the capital stays fixed as in the rest of the
+# analysis) and the capital returned on the end date. The XIRR of many such
+# flow sets is solved at once with Newton steps kept inside a per-row
+# bracket, falling back to bisection whenever a step leaves it.
+
+def pair_cash_flows(strategy_name, pair_row):
+    """
+    Dated cash flows (time-indexed Series) of one stats-CSV pair in the scaled
+    units of pair_row; any part of Total_Profit not in the trade history
+    (swaps, commission) is settled with the terminal balance
+    """
+    pair_name = pair_row['Currency_Pair']
+    capital = pair_row['Correct_Initial_Balance']
+    fields = (capital, pair_row['Total_Profit'], pair_row.get('Start_Date'),
+              pair_row.get('End_Date'), pair_row.get('Trading_Period_Days', 0))
+    
+    def compute():
+        scale = SCALING_FACTORS.get(strategy_name, 1)
+        profits = stats_pair_trade_pnl(strategy_name, pair_name)
+        profits = profits / scale if profits is not None else pd.Series(dtype=float)
+        
+        start = pd.to_datetime(pair_row.get('Start_Date'), errors='coerce')
+        if pd.isna(start):
+            start = profits.index.min() if len(profits) else pd.Timestamp('2000-01-01')
+        end = pd.to_datetime(pair_row.get('End_Date'), errors='coerce')
+        if pd.isna(end):
+            end = start + pd.Timedelta(days=float(pair_row.get('Trading_Period_Days', 0)))
+        end = max(end, profits.index.max()) if len(profits) else end
+        
+        terminal = capital + pair_row['Total_Profit'] - profits.sum()
+        return pd.concat([pd.Series([-capital], index=[start]), profits,
+                          pd.Series([terminal], index=[end])])
+    
+    return aggregate_result('cash_flows', (strategy_name, pair_name), compute, fields)
+
+
+def weighted_cash_flows(strategies_data, strategy_weights, pair_weights=None):
+    """
+    Cash flows of several pairs as one Series: each pair's flows scaled to
+    the capital it is allocated (as weighted_trade_events). strategy_weights:
+    {strategy: fraction of its full required capital}; pair_weights:
+    {strategy: weights in %}, default = each pair at its required capital
+    """
+    sequences = []
+    for strategy_name, df in strategies_data.items():
+        strategy_capital = df['Correct_Initial_Balance'].sum() * strategy_weights.get(strategy_name, 0)
+        if pair_weights is not None and strategy_name in pair_weights:
+            weights = np.asarray(pair_weights[strategy_name], dtype=float)
+        else:
+            weights = df['Correct_Initial_Balance'].to_numpy(dtype=float)
+        weights = weights / weights.sum() if weights.sum() > 0 else weights
+        for (_, pair_row), weight in zip(df.iterrows(), weights):
+            capital = pair_row['Correct_Initial_Balance']
+            if capital > 0 and weight > 0:
+                sequences.append(pair_cash_flows(strategy_name, pair_row) * (strategy_capital * weight / capital))
+    if not sequences:
+        return pd.Series(dtype=float)
+    return pd.concat(sequences).sort_index(kind='stable')
+
+
+def solve_xirr(flows, tol=1e-10, max_iter=200):
+    """
+    Annual rate r with Σ a_i·(1 + r)^(-t_i / 365) = 0 for many time-indexed
+    cash-flow Series at once (t = days since each Series' first flow).
+    Rows are zero-padded to a common length and solved together; a row
+    without a sign change of the NPV on (-99.99%, 1e6) gives NaN.
+    """
+    n_rows = len(flows)
+    width = max((len(f) for f in flows), default=0)
+    amounts = np.zeros((n_rows, width))
+    years = np.zeros((n_rows, width))
+    for i, f in enumerate(flows):
+        if len(f) == 0:
+            continue
+        values = f.to_numpy(dtype=float)
+        amounts[i, :len(f)] = values / max(np.abs(values).max(), 1e-300)
+        years[i, :len(f)] = (f.index - f.index.min()) / pd.Timedelta(days=365)
+    
+    def npv(rate):
+        discount = np.exp(-years * np.log1p(rate)[:, None])
+        value = (amounts * discount).sum(axis=1)
+        slope = -(amounts * years * discount).sum(axis=1) / (1 + rate)
+        return value, slope
+    
+    lo = np.full(n_rows, -0.9999)
+    hi = np.ones(n_rows)
+    f_lo, _ = npv(lo)
+    f_hi, _ = npv(hi)
+    for _ in range(6):
+        grow = np.sign(f_hi) == np.sign(f_lo)
+        if not grow.any():
+            break
+        hi[grow] *= 10
+        f_hi = np.where(grow, npv(hi)[0], f_hi)
+    valid = (np.sign(f_lo) != np.sign(f_hi)) & (np.abs(amounts).sum(axis=1) > 0)
+    
+    rate = np.clip(np.full(n_rows, 0.1), lo, hi)
+    for _ in range(max_iter):
+        value, slope = npv(rate)
+        below = np.sign(value) == np.sign(f_lo)
+        lo = np.where(below, rate, lo)
+        f_lo = np.where(below, value, f_lo)
+        hi = np.where(below, hi, rate)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = rate - value / slope
+        inside = np.isfinite(newton) & (newton > lo) & (newton < hi)
+        new_rate = np.where(value == 0, rate, np.where(inside, newton, (lo + hi) / 2))
+        done = np.abs(new_rate - rate) <= tol * (1 + np.abs(rate))
+        rate = new_rate
+        if np.all(done | ~valid):
+            break
+    return np.where(valid, rate, np.nan)
+
+
 # ============================================================================
 # DATA LOADING AND PROCESSING
 # ============================================================================
@@ -664,7 +1157,10 @@ def recalculate_metrics(df, strategy_name=None):
     # Update Sharpe Ratio to MT5 standard for each pair
     for idx, row in df.iterrows():
         pair_name = row['Currency_Pair']
-        mt5_sharpe = get_mt5_sharpe_for_strategy(strategy_name, pair_name)
+        mt5_sharpe = manifest_result(
+            'sharpe', (strategy_name, pair_name),
+            lambda: get_mt5_sharpe_for_strategy(strategy_name, pair_name),
+            paths=sharpe_input_paths(strategy_name, pair_name))
         if mt5_sharpe is not None:
             cap_key = (strategy_name, pair_name)
             if cap_key in SHARPE_CAPS:
@@ -675,74 +1171,1256 @@ def recalculate_metrics(df, strategy_name=None):
     df['Correct_Final_Balance'] = df['Correct_Initial_Balance'] + df['Total_Profit']
     df['Correct_Return_Percent'] = (df['Total_Profit'] / df['Correct_Initial_Balance']) * 100
     df['Trading_Years'] = df['Trading_Period_Days'] / 365
-    df['Correct_XIRR'] = df.apply(
-        lambda row: ((row['Correct_Final_Balance'] / row['Correct_Initial_Balance']) ** 
-                    (1 / max(row['Trading_Years'], 0.1)) - 1) * 100 
-        if row['Correct_Initial_Balance'] > 0 else 0, 
-        axis=1
-    )
+    xirr = solve_xirr([pair_cash_flows(strategy_name, pair_row) for _, pair_row in df.iterrows()])
+    df['Correct_XIRR'] = np.where((df['Correct_Initial_Balance'] > 0) & np.isfinite(xirr), xirr * 100, 0.0)
     df['Scale_Factor'] = scale
     return df
 
 
-def load_all_strategies():
-    """Load all strategy data from CSV files"""
-    strategies_data = {}
-    
-    print("=" * 80)
-    print("LOADING STRATEGY DATA")
-    print("=" * 80)
-    
-    for strategy_name, file_path in STRATEGY_FILES.items():
-        full_path = os.path.join(BASE_PATH, file_path)
-        if os.path.exists(full_path):
-            df = pd.read_csv(full_path)
-            df = recalculate_metrics(df, strategy_name)
-            strategies_data[strategy_name] = df
-            print(f"  ✓ {strategy_name}: Loaded {len(df)} pairs")
-        else:
-            print(f"  ✗ {strategy_name}: File not found - {file_path}")
-    
-    return strategies_data
+def load_all_strategies():
+    """Load all strategy data from CSV files"""
+    strategies_data = {}
+    
+    print("=" * 80)
+    print("LOADING STRATEGY DATA")
+    print("=" * 80)
+    
+    for strategy_name, file_path in STRATEGY_FILES.items():
+        full_path = os.path.join(BASE_PATH, file_path)
+        if os.path.exists(full_path):
+            df = pd.read_csv(full_path)
+            df = recalculate_metrics(df, strategy_name)
+            strategies_data[strategy_name] = df
+            print(f"  ✓ {strategy_name}: Loaded {len(df)} pairs")
+        else:
+            print(f"  ✗ {strategy_name}: File not found - {file_path}")
+    
+    return strategies_data
+
+
+# ============================================================================
+# EQUITY REPOSITORY (RUN-SCOPED)
+# ============================================================================
+# Equity curves and aligned daily returns are loaded once per run and shared
+# by every sheet. Returned frames are shared objects - treat them as read-only.
+
+# (strategy, rel_path, pair) -> equity DataFrame (or None if unavailable)
+_EQUITY_CURVES = {}
+
+# (strategy, tuple(paths)) -> (daily returns DataFrame, pair names)
+_STRATEGY_RETURNS = {}
+
+
+def reset_equity_repository():
+    """Drop all memoized equity data (start of a new run)"""
+    _EQUITY_CURVES.clear()
+    _STRATEGY_RETURNS.clear()
+    _MULTI_SYMBOL_CURVES.clear()
+    _SYMBOL_SHARPE_CACHE.clear()
+    _REPORT_PNL.clear()
+    _REPORT_TRADE_PNL.clear()
+    _RUN_RESULTS.clear()
+    _MANIFEST_STATS.update(reused=0, computed=0)
+    _RETURNS_MATRIX.clear()
+    _CAPITAL_RETURNS.clear()
+    _MV_WARM_STARTS.clear()
+    _ERC_DIAGNOSTICS.clear()
+
+
+def collect_report_paths():
+    """Every MT4/MT5 report read in a run (equity curves and MT5 summaries)"""
+    paths = [os.path.join(BASE_PATH, rel_path)
+             for pairs in STRATEGY_EQUITY_PATHS.values() for rel_path, _ in pairs]
+    for folder in ['Pair Trading EA', 'RSI corelation']:
+        folder_path = os.path.join(BASE_PATH, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        for pair_folder in sorted(os.listdir(folder_path)):
+            html_path = os.path.join(folder_path, pair_folder, f'{pair_folder}.html')
+            if os.path.exists(html_path):
+                paths.append(html_path)
+    return paths
+
+
+def read_pair_equity_curve(strategy_name, file_path, pair_name):
+    """Build the equity curve of one pair from its report file"""
+    if not os.path.exists(file_path):
+        return None
+    if strategy_name == 'Reversal_Strategy':
+        return load_reversal_strategy_equity_curve(file_path, pair_name)
+    elif strategy_name in ['PairTradingEA', 'RSI_Correlation']:
+        return load_pairtrading_equity_curve(file_path, pair_name)
+    elif file_path.endswith('.xlsx'):
+        return load_excel_equity_curve(file_path, pair_name)
+    return load_csv_equity_curve(file_path, pair_name)
+
+
+def load_pair_equity_curve(strategy_name, rel_path, pair_name):
+    """Load (memoized) equity curve for one (strategy, path, pair)"""
+    key = (strategy_name, rel_path, pair_name)
+    if key in _EQUITY_CURVES:
+        return _EQUITY_CURVES[key]
+    
+    file_path = os.path.join(BASE_PATH, rel_path)
+    equity_df = manifest_result(
+        'equity_curve', key,
+        lambda: read_pair_equity_curve(strategy_name, file_path, pair_name),
+        paths=[file_path])
+    
+    _EQUITY_CURVES[key] = equity_df
+    return equity_df
+
+
+def load_pair_daily_returns(strategy_name, rel_path, pair_name):
+    """Daily returns of one pair's equity curve (None if no curve)"""
+    def compute():
+        equity_df = load_pair_equity_curve(strategy_name, rel_path, pair_name)
+        if equity_df is None or len(equity_df) == 0:
+            return None
+        equity_df = equity_df[~equity_df.index.duplicated(keep='last')]
+        daily_equity = equity_df.resample('D').last().ffill()
+        return daily_equity.pct_change().fillna(0)
+    
+    return manifest_result('daily_returns', (strategy_name, rel_path, pair_name), compute,
+                           paths=[os.path.join(BASE_PATH, rel_path)])
+
+
+def load_pair_daily_pnl(strategy_name, rel_path, pair_name):
+    """Daily realized P&L of one pair in report currency (None if unavailable)"""
+    def compute():
+        file_path = os.path.join(BASE_PATH, rel_path)
+        if not os.path.exists(file_path):
+            return None
+        # Reversal pairs are the symbols of one shared report
+        symbol = pair_name if strategy_name == 'Reversal_Strategy' else None
+        pnl = load_report_daily_pnl(file_path).get(symbol)
+        return pnl.to_frame(pair_name) if pnl is not None and len(pnl) else None
+    
+    return manifest_result('daily_pnl', (strategy_name, rel_path, pair_name), compute,
+                           paths=[os.path.join(BASE_PATH, rel_path)])
+
+
+def load_pair_trade_pnl(strategy_name, rel_path, pair_name):
+    """Closed trades of one pair in time order: P&L in report currency and lots (None if unavailable)"""
+    def compute():
+        file_path = os.path.join(BASE_PATH, rel_path)
+        if not os.path.exists(file_path):
+            return None
+        symbol = pair_name if strategy_name == 'Reversal_Strategy' else None
+        closed = load_report_trade_pnl(file_path).get(symbol)
+        return closed.copy() if closed is not None and len(closed) else None
+    
+    return manifest_result('trade_pnl', (strategy_name, rel_path, pair_name), compute,
+                           paths=[os.path.join(BASE_PATH, rel_path)])
+
+
+def load_strategy_equity_data(strategy_name, paths):
+    """Load aligned daily returns for a strategy (memoized per run)"""
+    key = (strategy_name, tuple(paths))
+    if key in _STRATEGY_RETURNS:
+        return _STRATEGY_RETURNS[key]
+    
+    returns_list = []
+    pair_names = []
+    
+    for rel_path, pair_name in paths:
+        ret = load_pair_daily_returns(strategy_name, rel_path, pair_name)
+        if ret is not None:
+            returns_list.append(ret)
+            pair_names.append(pair_name)
+    
+    if not returns_list:
+        _STRATEGY_RETURNS[key] = (None, None)
+        return None, None
+    
+    returns = pd.concat(returns_list, axis=1, join='outer')
+    returns = returns.fillna(0)
+    
+    _STRATEGY_RETURNS[key] = (returns, pair_names)
+    return returns, pair_names
+
+
+def get_strategy_daily_returns(strategy_name):
+    """Aligned daily returns and pair names for a strategy in STRATEGY_EQUITY_PATHS"""
+    paths = STRATEGY_EQUITY_PATHS.get(strategy_name, [])
+    return load_strategy_equity_data(strategy_name, paths)
+
+
+def get_all_strategy_daily_returns():
+    """{strategy: (daily returns, pair names)} for every strategy with equity data"""
+    all_returns = {}
+    for strategy_name in STRATEGY_EQUITY_PATHS:
+        returns, pair_names = get_strategy_daily_returns(strategy_name)
+        if returns is not None:
+            all_returns[strategy_name] = (returns, pair_names)
+    return all_returns
+
+
+# ============================================================================
+# DENSE RETURNS MATRIX
+# ============================================================================
+# All pairs' daily returns as one contiguous dates x pairs array, built once
+# per run and shared by the correlation, allocation and simulation code.
+
+# dtype name -> matrix dict (see build_returns_matrix)
+_RETURNS_MATRIX = {}
+
+# strategies/pairs key -> capital returns dict (see build_capital_returns)
+_CAPITAL_RETURNS = {}
+
+# asset names -> last Max_Sharpe_MV solution (warm start for the next solve)
+_MV_WARM_STARTS = {}
+
+# solve label -> Risk_Parity_ERC solver diagnostics (see solve_equal_risk_contribution)
+_ERC_DIAGNOSTICS = {}
+
+
+def build_returns_matrix(dtype=np.float64):
+    """
+    Dense daily returns of every pair in STRATEGY_EQUITY_PATHS (memoized per run)
+    Returns a dict:
+        dates            datetime64[ns] array, union of all pairs' dates (rows)
+        values           C-contiguous dates x pairs array of daily returns
+        pnl              same layout: daily realized P&L in report currency
+                         (0 on days without closed trades)
+        strategies       strategy names with equity data, in config order
+        column_strategy  int array: column -> index into strategies
+        column_pair      object array: column -> pair name
+        row_mask         bool array strategies x dates: dates inside each
+                         strategy's own aligned frame
+    Cells where a pair has no data are 0, as in the per-strategy frames.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.name in _RETURNS_MATRIX:
+        return _RETURNS_MATRIX[dtype.name]
+    
+    strategies, columns = [], []
+    for strategy_name, paths in STRATEGY_EQUITY_PATHS.items():
+        pair_columns = []
+        for rel_path, pair_name in paths:
+            ret = load_pair_daily_returns(strategy_name, rel_path, pair_name)
+            if ret is not None:
+                pnl = load_pair_daily_pnl(strategy_name, rel_path, pair_name)
+                if pnl is None:
+                    pnl = ret.iloc[:0]
+                pair_columns.append((pair_name, ret.index.values, ret.iloc[:, 0].to_numpy(),
+                                     pnl.index.values, pnl.iloc[:, 0].to_numpy()))
+        if pair_columns:
+            columns.extend((len(strategies), *column) for column in pair_columns)
+            strategies.append(strategy_name)
+    
+    all_dates = [c[2] for c in columns] + [c[4] for c in columns]
+    dates = np.unique(np.concatenate(all_dates)) if columns else \
+        np.array([], dtype='datetime64[ns]')
+    values = np.zeros((len(dates), len(columns)), dtype=dtype)
+    pnl = np.zeros((len(dates), len(columns)), dtype=dtype)
+    row_mask = np.zeros((len(strategies), len(dates)), dtype=bool)
+    for col, (strategy_idx, _, pair_dates, pair_values, pnl_dates, pair_pnl) in enumerate(columns):
+        rows = np.searchsorted(dates, pair_dates)
+        values[rows, col] = pair_values
+        row_mask[strategy_idx, rows] = True
+        pnl[np.searchsorted(dates, pnl_dates), col] = pair_pnl
+    
+    matrix = {
+        'dates': dates,
+        'values': values,
+        'pnl': pnl,
+        'strategies': strategies,
+        'column_strategy': np.array([c[0] for c in columns], dtype=np.intp),
+        'column_pair': np.array([c[1] for c in columns], dtype=object),
+        'row_mask': row_mask,
+    }
+    _RETURNS_MATRIX[dtype.name] = matrix
+    return matrix
+
+
+def strategy_returns_block(matrix, strategy_name):
+    """(dates x pairs values, pair names) of one strategy, on its own dates"""
+    if strategy_name not in matrix['strategies']:
+        return None, []
+    strategy_idx = matrix['strategies'].index(strategy_name)
+    cols = np.flatnonzero(matrix['column_strategy'] == strategy_idx)
+    rows = matrix['row_mask'][strategy_idx]
+    return matrix['values'][rows][:, cols], matrix['column_pair'][cols].tolist()
+
+
+def correlation_matrix(values):
+    """Pearson correlation of the columns of a dates x series array"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.atleast_2d(np.corrcoef(values, rowvar=False))
+
+
+def masked_correlation_matrix(values, present):
+    """Pairwise-complete correlation: each pair uses the rows both series cover"""
+    n = values.shape[1]
+    corr = np.eye(n)
+    for i in range(n):
+        for j in range(i + 1, n):
+            rows = present[:, i] & present[:, j]
+            corr[i, j] = corr[j, i] = correlation_matrix(values[rows][:, [i, j]])[0, 1]
+    return corr
+
+
+def upper_triangle(corr):
+    """Off-diagonal correlations above the diagonal, NaNs dropped"""
+    values = corr[np.triu_indices(len(corr), k=1)]
+    return values[~np.isnan(values)]
+
+
+# ============================================================================
+# PORTFOLIO RISK ENGINE (EMPIRICAL COVARIANCE)
+# ============================================================================
+# Pair returns are measured on the capital model used throughout the sheets:
+# daily P&L (scaled) / Correct_Initial_Balance (Max_DD × 2). Portfolio return,
+# volatility and Sharpe for any number of weight vectors come from one
+# batched evaluation against the empirical covariance of those returns.
+
+# (strategy, stats-CSV pair) -> equity curve pair where the names differ;
+# '*' means the whole strategy (all its curves summed)
+EQUITY_PAIR_ALIASES = {
+    ('Falcon', 'V5'): 'EURUSD',
+    ('Falcon', 'v5-v2 - Tp 60,SL 60 all day'): 'EURUSD_V2',
+    ('AURUM', 'XAUUSD_Grid'): 'XAUUSD',
+    ('AURUM', 'USDJPY_Grid'): 'USDJPY',
+    ('Reversal_Strategy', 'ALL_PAIRS'): '*',
+}
+
+
+def pair_daily_pnl(matrix, strategy_name, pair_name):
+    """Daily P&L column of a stats-CSV pair on the matrix dates (None if no curve)"""
+    if strategy_name not in matrix['strategies']:
+        return None
+    equity_pair = EQUITY_PAIR_ALIASES.get((strategy_name, pair_name), pair_name)
+    in_strategy = matrix['column_strategy'] == matrix['strategies'].index(strategy_name)
+    if equity_pair != '*':
+        in_strategy &= matrix['column_pair'] == equity_pair
+    cols = np.flatnonzero(in_strategy)
+    if len(cols) == 0:
+        return None
+    return matrix['pnl'][:, cols].sum(axis=1)
+
+
+def build_capital_returns(strategies_data):
+    """
+    Daily returns of every stats-CSV pair on its required capital (memoized per run)
+    Returns a dict:
+        dates            datetime64[ns] rows (as build_returns_matrix)
+        values           dates x pairs returns, pairs in strategies_data row order
+        strategies       strategy names (strategies_data order)
+        column_strategy  int array: column -> index into strategies
+        column_pair      object array: column -> stats-CSV pair name
+        has_data         bool array: column backed by an equity curve
+    Days without trades are 0; pairs without a curve are all 0.
+    """
+    key = tuple((name, tuple(df['Currency_Pair'])) for name, df in strategies_data.items())
+    if key in _CAPITAL_RETURNS:
+        return _CAPITAL_RETURNS[key]
+    
+    matrix = build_returns_matrix()
+    columns = []
+    for strategy_idx, (strategy_name, df) in enumerate(strategies_data.items()):
+        scale = SCALING_FACTORS.get(strategy_name, 1)
+        for pair_name, capital in zip(df['Currency_Pair'], df['Correct_Initial_Balance']):
+            pnl = pair_daily_pnl(matrix, strategy_name, pair_name)
+            columns.append((strategy_idx, pair_name, pnl, scale * capital))
+    
+    values = np.zeros((len(matrix['dates']), len(columns)))
+    for col, (_, _, pnl, scaled_capital) in enumerate(columns):
+        if pnl is not None and scaled_capital > 0:
+            values[:, col] = pnl / scaled_capital
+    
+    capital_returns = {
+        'dates': matrix['dates'],
+        'values': values,
+        'strategies': list(strategies_data),
+        'column_strategy': np.array([c[0] for c in columns], dtype=np.intp),
+        'column_pair': np.array([c[1] for c in columns], dtype=object),
+        'has_data': np.array([c[2] is not None for c in columns], dtype=bool),
+    }
+    _CAPITAL_RETURNS[key] = capital_returns
+    return capital_returns
+
+
+def strategy_capital_returns(capital_returns, strategies_data, pair_weights=None):
+    """
+    Daily returns of each strategy (dates x strategies) from its pairs.
+    pair_weights: {strategy: weights in %}; default = each pair at its full
+    required capital, i.e. sum(P&L) / sum(capital).
+    """
+    values = capital_returns['values']
+    strategy_returns = np.zeros((len(values), len(strategies_data)))
+    for strategy_idx, (strategy_name, df) in enumerate(strategies_data.items()):
+        cols = np.flatnonzero(capital_returns['column_strategy'] == strategy_idx)
+        if pair_weights is not None and strategy_name in pair_weights:
+            weights = np.asarray(pair_weights[strategy_name], dtype=float)
+        else:
+            weights = df['Correct_Initial_Balance'].to_numpy(dtype=float)
+        if len(cols) and weights.sum() > 0:
+            strategy_returns[:, strategy_idx] = values[:, cols] @ (weights / weights.sum())
+    return strategy_returns
+
+
+def strategy_pair_returns(capital_returns, strategy_name):
+    """dates x pairs capital returns of one strategy, in stats-CSV row order"""
+    strategy_idx = capital_returns['strategies'].index(strategy_name)
+    return capital_returns['values'][:, capital_returns['column_strategy'] == strategy_idx]
+
+
+def estimate_return_moments(returns):
+    """Mean vector and sample covariance of a dates x assets return array"""
+    returns = np.asarray(returns, dtype=float)
+    mu = returns.mean(axis=0)
+    cov = np.atleast_2d(np.cov(returns, rowvar=False))
+    return mu, cov
+
+
+def evaluate_portfolios(weights, mu, cov, periods_per_year=RETURN_PERIODS_PER_YEAR):
+    """
+    Annualized return, volatility and Sharpe for k weight vectors at once
+    weights: k x n (or n) array in % or fractions; each row is normalized to 1
+    Returns a dict of length-k arrays: 'return', 'volatility', 'sharpe'
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    totals = weights.sum(axis=1, keepdims=True)
+    weights = np.divide(weights, totals, out=np.zeros_like(weights), where=totals != 0)
+    
+    port_return = weights @ mu * periods_per_year
+    port_variance = np.einsum('kn,nm,km->k', weights, cov, weights)
+    port_vol = np.sqrt(np.maximum(port_variance, 0) * periods_per_year)
+    sharpe = np.divide(port_return - RISK_FREE_RATE, port_vol,
+                       out=np.zeros_like(port_return), where=port_vol > 0)
+    return {'return': port_return, 'volatility': port_vol, 'sharpe': sharpe}
+
+
+# ============================================================================
+# HIERARCHICAL RISK PARITY (PAIR CORRELATION TREE)
+# ============================================================================
+# Pairs are clustered by single linkage on the correlation distance
+# sqrt((1 - ρ) / 2), built from a minimum spanning tree (Prim, O(n²)) whose
+# sorted edges are merged into the dendrogram (O(n log n)). The dendrogram's
+# leaf order quasi-diagonalizes the correlation matrix; recursive bisection
+# along that order splits capital between halves by inverse cluster variance
+# (O(n²) per level, O(n² log n) overall).
+
+def correlation_distance(corr):
+    """Correlation distance sqrt((1 - ρ) / 2); undefined correlations count as 0"""
+    corr = np.nan_to_num(np.asarray(corr, dtype=float), nan=0.0)
+    np.fill_diagonal(corr, 1.0)
+    return np.sqrt(np.clip((1 - corr) / 2, 0, 1))
+
+
+def single_linkage_order(distance):
+    """Leaf order of the single-linkage dendrogram of a distance matrix"""
+    n = len(distance)
+    if n <= 2:
+        return list(range(n))
+    
+    # Prim's minimum spanning tree
+    in_tree = np.zeros(n, dtype=bool)
+    in_tree[0] = True
+    best = distance[0].copy()
+    parent = np.zeros(n, dtype=np.intp)
+    edges = []
+    for _ in range(n - 1):
+        node = int(np.argmin(np.where(in_tree, np.inf, best)))
+        edges.append((best[node], int(parent[node]), node))
+        in_tree[node] = True
+        closer = distance[node] < best
+        best = np.where(closer, distance[node], best)
+        parent = np.where(closer, node, parent)
+    
+    # MST edges by increasing distance = single-linkage merges
+    edges.sort()
+    root = list(range(n))
+    leaves = {i: [i] for i in range(n)}
+    
+    def find(i):
+        while root[i] != i:
+            root[i] = root[root[i]]
+            i = root[i]
+        return i
+    
+    for _, a, b in edges:
+        ra, rb = find(a), find(b)
+        leaves[ra].extend(leaves.pop(rb))
+        root[rb] = ra
+    return leaves[find(0)]
+
+
+def cluster_order(corr):
+    """Quasi-diagonal (cluster) ordering of a correlation matrix's assets"""
+    return single_linkage_order(correlation_distance(corr))
+
+
+def cluster_variance(cov, items):
+    """Variance of a cluster held at inverse-variance weights"""
+    sub_cov = cov[np.ix_(items, items)]
+    ivp = 1 / np.diag(sub_cov)
+    ivp /= ivp.sum()
+    return ivp @ sub_cov @ ivp
+
+
+def hierarchical_risk_parity(cov):
+    """
+    HRP weights (summing to 1) and the cluster order of the assets
+    Assets with zero variance carry no risk and get weight 0; they are
+    placed at the end of the order.
+    """
+    cov = np.atleast_2d(np.asarray(cov, dtype=float))
+    n = len(cov)
+    weights = np.zeros(n)
+    active = np.flatnonzero(np.diag(cov) > 0)
+    if len(active) == 0:
+        return np.ones(n) / n, list(range(n))
+    
+    sub_cov = cov[np.ix_(active, active)]
+    vol = np.sqrt(np.diag(sub_cov))
+    order = single_linkage_order(correlation_distance(sub_cov / np.outer(vol, vol)))
+    
+    sub_weights = np.ones(len(active))
+    clusters = [np.array(order)]
+    while clusters:
+        clusters = [part for items in clusters if len(items) > 1
+                    for part in (items[:len(items) // 2], items[len(items) // 2:])]
+        for left, right in zip(clusters[::2], clusters[1::2]):
+            left_var, right_var = cluster_variance(sub_cov, left), cluster_variance(sub_cov, right)
+            alpha = 1 - left_var / (left_var + right_var)
+            sub_weights[left] *= alpha
+            sub_weights[right] *= 1 - alpha
+    
+    weights[active] = sub_weights
+    inactive = np.setdiff1d(np.arange(n), active)
+    return weights, [int(active[i]) for i in order] + inactive.tolist()
+
+
+def calculate_hrp_weight(asset_returns):
+    """Hierarchical risk parity allocation from a dates x assets return array"""
+    _, cov = estimate_return_moments(asset_returns)
+    weights, _ = hierarchical_risk_parity(cov)
+    return weights * 100
+
+
+def pair_correlation_matrix(matrix):
+    """
+    Correlation of every pair across all strategies: two pairs are compared
+    on the dates both of their strategies' frames cover (one block per
+    strategy pair)
+    """
+    n = matrix['values'].shape[1]
+    corr = np.eye(n)
+    strategy_cols = [np.flatnonzero(matrix['column_strategy'] == i)
+                     for i in range(len(matrix['strategies']))]
+    for a, cols_a in enumerate(strategy_cols):
+        for b in range(a, len(strategy_cols)):
+            cols = cols_a if a == b else np.concatenate([cols_a, strategy_cols[b]])
+            rows = matrix['row_mask'][a] & matrix['row_mask'][b]
+            corr[np.ix_(cols, cols)] = correlation_matrix(matrix['values'][rows][:, cols])
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+
+# ============================================================================
+# ROLLING CORRELATIONS
+# ============================================================================
+# Window correlations from running sums: with x = 0 and m = 0 where a series
+# has no data, the pairwise-complete sums of a window are
+#     N = Σ m·mᵀ,  Sx = Σ x·mᵀ,  Sxx = Σ x²·mᵀ,  Sxy = Σ x·xᵀ
+# so each step adds the entering row and subtracts the leaving one in O(n²).
+# A count of non-zero observations (exact in floating point) drops series
+# that barely trade in the window, and the sums are rebuilt from the window
+# every `window` steps so rounding cannot accumulate.
+
+def window_sums(values, present):
+    """(N, Sx, Sxx, Sxy, non-zero count) of a block of rows, masked as above"""
+    mask = present.astype(float)
+    return (mask.T @ mask, values.T @ mask, (values * values).T @ mask, values.T @ values,
+            (values != 0).astype(float).T @ mask)
+
+
+def correlation_from_sums(n_obs, sum_x, sum_xx, sum_xy, nonzero, min_periods=2, min_active=1):
+    """
+    Pairwise-complete correlation matrix from window sums (NaN below
+    min_periods common rows or min_active non-zero values of either series)
+    """
+    var = n_obs * sum_xx - sum_x * sum_x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = (n_obs * sum_xy - sum_x * sum_x.T) / np.sqrt(var * var.T)
+    flat = (nonzero < max(min_active, 1)) | (nonzero.T < max(min_active, 1)) | ~(var * var.T > 0)
+    corr[(n_obs < max(min_periods, 2)) | flat] = np.nan
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+
+def rolling_correlations(values, present, window, min_periods=None, min_active=None):
+    """
+    Rolling correlation matrices of the columns of a dates x series array
+    present: bool array of the same shape, False where a series has no data
+    Yields (last row of the window, correlation matrix) for every full window
+    """
+    min_active = ROLLING_CORRELATION_MIN_ACTIVE_DAYS if min_active is None else min_active
+    values = np.where(present, values, 0.0)
+    min_periods = window // 2 if min_periods is None else min_periods
+    n_rows = len(values)
+    for end in range(window, n_rows + 1):
+        if (end - window) % window == 0:
+            n_obs, sum_x, sum_xx, sum_xy, nonzero = window_sums(values[end - window:end],
+                                                                present[end - window:end])
+        else:
+            x_in, m_in = values[end - 1], present[end - 1].astype(float)
+            x_out, m_out = values[end - window - 1], present[end - window - 1].astype(float)
+            n_obs += np.outer(m_in, m_in) - np.outer(m_out, m_out)
+            sum_x += np.outer(x_in, m_in) - np.outer(x_out, m_out)
+            sum_xx += np.outer(x_in * x_in, m_in) - np.outer(x_out * x_out, m_out)
+            sum_xy += np.outer(x_in, x_in) - np.outer(x_out, x_out)
+            nonzero += np.outer(x_in != 0, m_in) - np.outer(x_out != 0, m_out)
+        yield end - 1, correlation_from_sums(n_obs, sum_x, sum_xx, sum_xy, nonzero, min_periods, min_active)
+
+
+def run_rolling_correlations(windows=None):
+    """
+    Rolling average correlations of the whole portfolio for each window
+    Within = mean correlation of pairs of the same strategy; Between = mean
+    correlation of equal-weighted strategy returns (as on the
+    Between_Strategy_Correlations sheet)
+    Returns {window: dict}:
+        dates           window end dates
+        within          average within-strategy pair correlation per date
+        between         average between-strategy correlation per date
+        strategy_peaks  {(strategy_a, strategy_b): (peak correlation, date)}
+    """
+    windows = ROLLING_CORRELATION_WINDOWS if windows is None else windows
+    matrix = build_returns_matrix()
+    strategy_names = matrix['strategies']
+    pair_present = matrix['row_mask'][matrix['column_strategy']].T
+    
+    column_counts = np.bincount(matrix['column_strategy'], minlength=len(strategy_names))
+    strategy_returns = np.zeros((len(matrix['dates']), len(strategy_names)))
+    np.add.at(strategy_returns.T, matrix['column_strategy'], matrix['values'].T)
+    strategy_returns /= np.maximum(column_counts, 1)
+    strategy_present = matrix['row_mask'].T
+    
+    upper_i, upper_j = np.triu_indices(matrix['values'].shape[1], k=1)
+    same = matrix['column_strategy'][upper_i] == matrix['column_strategy'][upper_j]
+    within_i, within_j = upper_i[same], upper_j[same]
+    between_i, between_j = np.triu_indices(len(strategy_names), k=1)
+    
+    results = {}
+    for window in windows:
+        if window > len(matrix['dates']):
+            continue
+        rows, within, between = [], [], []
+        peaks = np.full(len(between_i), -np.inf)
+        peak_rows = np.zeros(len(between_i), dtype=np.intp)
+        pair_windows = rolling_correlations(matrix['values'], pair_present, window)
+        strategy_windows = rolling_correlations(strategy_returns, strategy_present, window)
+        for (row, pair_corr), (_, strategy_corr) in zip(pair_windows, strategy_windows):
+            rows.append(row)
+            within_values = pair_corr[within_i, within_j]
+            within.append(np.nanmean(within_values) if np.any(~np.isnan(within_values)) else np.nan)
+            between_values = strategy_corr[between_i, between_j]
+            valid = ~np.isnan(between_values)
+            between.append(between_values[valid].mean() if valid.any() else np.nan)
+            higher = valid & (between_values > peaks)
+            peaks[higher] = between_values[higher]
+            peak_rows[higher] = row
+        
+        results[window] = {
+            'dates': matrix['dates'][rows],
+            'within': np.array(within),
+            'between': np.array(between),
+            'strategy_peaks': {
+                (strategy_names[i], strategy_names[j]): (peaks[k], matrix['dates'][peak_rows[k]])
+                for k, (i, j) in enumerate(zip(between_i, between_j)) if np.isfinite(peaks[k])
+            },
+        }
+    return results
+
+
+# ============================================================================
+# PORTFOLIO EQUITY (MERGED TRADE TIMELINE)
+# ============================================================================
+# Pair drawdowns do not add up: pairs lose at different times. The portfolio
+# curve merges every weighted closed trade on one timeline, and drawdown,
+# time under water and recovery come from a single vectorized pass over it.
+
+def stats_pair_trades(strategy_name, pair_name):
+    """Closed trades ('profit', 'size' in lots) of a stats-CSV pair in time order (None if no report)"""
+    equity_pair = EQUITY_PAIR_ALIASES.get((strategy_name, pair_name), pair_name)
+    sequences = []
+    for rel_path, curve_pair in STRATEGY_EQUITY_PATHS.get(strategy_name, []):
+        if equity_pair in ('*', curve_pair):
+            closed = load_pair_trade_pnl(strategy_name, rel_path, curve_pair)
+            if closed is not None:
+                sequences.append(closed)
+    if not sequences:
+        return None
+    return pd.concat(sequences).sort_index(kind='stable')
+
+
+def stats_pair_trade_pnl(strategy_name, pair_name):
+    """Closed-trade P&L of a stats-CSV pair in time order (None if no report)"""
+    closed = stats_pair_trades(strategy_name, pair_name)
+    return closed['profit'] if closed is not None else None
+
+
+def weighted_trade_events(strategies_data, strategy_weights, pair_weights):
+    """
+    Closed trades of several pairs merged into one time-indexed P&L Series,
+    each scaled to the capital it is allocated: strategy capital × strategy
+    weight × pair weight / pair required capital. Capitals in the scaled
+    units of the stats sheets (SCALING_FACTORS applied).
+    """
+    sequences = []
+    for strategy_name, df in strategies_data.items():
+        scale = SCALING_FACTORS.get(strategy_name, 1)
+        strategy_capital = df['Correct_Initial_Balance'].sum() * strategy_weights.get(strategy_name, 0)
+        weights = np.asarray(pair_weights[strategy_name], dtype=float)
+        weights = weights / weights.sum() if weights.sum() > 0 else weights
+        for pair_name, capital, weight in zip(df['Currency_Pair'], df['Correct_Initial_Balance'], weights):
+            profits = stats_pair_trade_pnl(strategy_name, pair_name)
+            if profits is not None and capital > 0 and weight > 0:
+                sequences.append(profits / scale * (strategy_capital * weight / capital))
+    if not sequences:
+        return pd.Series([], dtype=float, index=pd.DatetimeIndex([]))
+    return pd.concat(sequences).sort_index(kind='stable')
+
+
+def equity_drawdown_stats(events, capital):
+    """
+    Drawdown profile of capital + cumulative P&L events (time-indexed Series)
+    Returns a dict:
+        max_drawdown       largest peak-to-trough drop ($)
+        max_drawdown_pct   that drop as % of the peak equity
+        peak_date, trough_date, recovery_date (NaT if not recovered)
+        recovery_days      trough -> back at the old peak (None if not recovered)
+        max_underwater_days  longest stretch between equity highs (incl. the
+                             current one if still below the last high)
+        underwater_pct     share of the timeline spent below the running high
+    """
+    stats = {'max_drawdown': 0.0, 'max_drawdown_pct': 0.0, 'peak_date': pd.NaT,
+             'trough_date': pd.NaT, 'recovery_date': pd.NaT, 'recovery_days': None,
+             'max_underwater_days': 0.0, 'underwater_pct': 0.0}
+    if len(events) == 0:
+        return stats
+    
+    times = events.index.values
+    equity = capital + np.cumsum(events.to_numpy(dtype=float))
+    peaks = np.maximum(np.maximum.accumulate(equity), capital)
+    drawdown = peaks - equity
+    at_high = drawdown <= 0
+    
+    trough = int(np.argmax(drawdown))
+    highs_before = np.flatnonzero(at_high[:trough + 1])
+    recovered = np.flatnonzero(at_high[trough:])
+    stats['max_drawdown'] = float(drawdown[trough])
+    stats['max_drawdown_pct'] = float(drawdown[trough] / peaks[trough] * 100) if peaks[trough] > 0 else 0.0
+    stats['peak_date'] = pd.Timestamp(times[highs_before[-1]] if len(highs_before) else times[0])
+    stats['trough_date'] = pd.Timestamp(times[trough])
+    if drawdown[trough] > 0 and len(recovered):
+        stats['recovery_date'] = pd.Timestamp(times[trough + recovered[0]])
+        stats['recovery_days'] = (stats['recovery_date'] - stats['trough_date']) / pd.Timedelta(days=1)
+    
+    # Gaps between successive highs (the timeline starts at a high)
+    high_times = np.concatenate([times[:1], times[at_high], times[-1:]])
+    stats['max_underwater_days'] = float(np.diff(high_times).max() / np.timedelta64(1, 'D'))
+    durations = np.diff(times) / np.timedelta64(1, 'D')
+    total = durations.sum()
+    stats['underwater_pct'] = float(durations[~at_high[:-1]].sum() / total * 100) if total > 0 else 0.0
+    return stats
+
+
+# ============================================================================
+# MONTE CARLO TRADE BOOTSTRAP (DRAWDOWN DISTRIBUTIONS)
+# ============================================================================
+# Each trade sequence is resampled into a (paths x trades) array, iid or as
+# circular blocks of consecutive trades (keeps losing streaks together), and
+# turned into equity paths on the pair's required capital in one cumsum.
+# Paths are processed in chunks of at most MONTE_CARLO_CHUNK_BYTES so memory
+# stays bounded for any number of paths, and drawn in batches until the
+# sampling error of the tail figures is within the configured bounds.
+
+def bootstrap_indices(n_trades, n_paths, rng, block_size=None):
+    """(paths x trades) resampled trade indices: iid, or circular blocks of block_size"""
+    if not block_size or block_size <= 1:
+        return rng.integers(0, n_trades, size=(n_paths, n_trades), dtype=np.int32)
+    n_blocks = -(-n_trades // block_size)
+    starts = rng.integers(0, n_trades, size=(n_paths, n_blocks, 1), dtype=np.int32)
+    indices = (starts + np.arange(block_size)) % n_trades
+    return indices.reshape(n_paths, -1)[:, :n_trades]
+
+
+def quantile_ci_half_width(values, q, z=1.96):
+    """
+    Half-width of the distribution-free ~95% confidence interval of the
+    q-quantile: the order statistics n·q ± z·√(n·q·(1-q)) of the sample
+    """
+    n = len(values)
+    spread = z * np.sqrt(n * q * (1 - q))
+    lo = min(max(int(np.floor(n * q - spread)), 0), n - 1)
+    hi = min(max(int(np.ceil(n * q + spread)), 0), n - 1)
+    ordered = np.partition(values, [lo, hi])
+    return float(ordered[hi] - ordered[lo]) / 2
+
+
+def bootstrap_drawdowns(profits, capital, n_paths=None, block_size=None,
+                        ruin_fraction=None, seed=None, chunk_bytes=None, batch_paths=None):
+    """
+    Monte Carlo distribution of one trade sequence on a starting capital
+    Paths are drawn in batches of batch_paths until the P99 drawdown and the
+    ruin probability are within their error bounds, at most n_paths.
+    Returns a dict of arrays, one value per path drawn:
+        max_drawdown     largest peak-to-trough equity drop ($)
+        terminal_equity  capital + sum of the resampled trades ($)
+        ruined           equity fell to capital × (1 - ruin_fraction) or below
+    """
+    n_paths = MONTE_CARLO_PATHS if n_paths is None else n_paths
+    ruin_fraction = MONTE_CARLO_RUIN_FRACTION if ruin_fraction is None else ruin_fraction
+    chunk_bytes = MONTE_CARLO_CHUNK_BYTES if chunk_bytes is None else chunk_bytes
+    batch_paths = MONTE_CARLO_BATCH_PATHS if batch_paths is None else batch_paths
+    profits = np.asarray(profits, dtype=float)
+    n_trades = len(profits)
+    rng = np.random.default_rng(MONTE_CARLO_SEED if seed is None else seed)
+    
+    max_drawdown = np.zeros(n_paths)
+    terminal_equity = np.full(n_paths, float(capital))
+    ruined = np.zeros(n_paths, dtype=bool)
+    if n_trades == 0:
+        return {'max_drawdown': max_drawdown, 'terminal_equity': terminal_equity, 'ruined': ruined}
+    
+    # Equity and running peaks are relative to the starting capital (peak >= 0)
+    ruin_level = -capital * ruin_fraction
+    # int32 indices + float64 equity + float64 peaks per resampled trade
+    chunk = max(1, chunk_bytes // (n_trades * 20))
+    drawn = 0
+    while drawn < n_paths:
+        batch_end = min(drawn + max(batch_paths, 1), n_paths)
+        for start in range(drawn, batch_end, chunk):
+            stop = min(start + chunk, batch_end)
+            equity = profits[bootstrap_indices(n_trades, stop - start, rng, block_size)]
+            np.cumsum(equity, axis=1, out=equity)
+            terminal_equity[start:stop] += equity[:, -1]
+            ruined[start:stop] = equity.min(axis=1) <= ruin_level
+            peaks = np.maximum.accumulate(equity, axis=1)
+            np.maximum(peaks, 0, out=peaks)
+            np.subtract(peaks, equity, out=peaks)
+            max_drawdown[start:stop] = peaks.max(axis=1)
+        drawn = batch_end
+        
+        dd_p99 = np.quantile(max_drawdown[:drawn], 0.99)
+        ruin_prob = ruined[:drawn].mean()
+        if (quantile_ci_half_width(max_drawdown[:drawn], 0.99) <= MONTE_CARLO_DD_TOLERANCE * dd_p99
+                and 1.96 * np.sqrt(ruin_prob * (1 - ruin_prob) / drawn) <= MONTE_CARLO_RUIN_TOLERANCE):
+            break
+    
+    return {'max_drawdown': max_drawdown[:drawn], 'terminal_equity': terminal_equity[:drawn],
+            'ruined': ruined[:drawn]}
+
+
+def historical_drawdown(profits):
+    """Largest peak-to-trough drop of the trade sequence in its actual order"""
+    equity = np.concatenate([[0.0], np.cumsum(np.asarray(profits, dtype=float))])
+    return float((np.maximum.accumulate(equity) - equity).max())
+
+
+def summarize_bootstrap(result, capital, confidence=None):
+    """Percentile drawdowns, terminal equity, ruin probability and confidence capital"""
+    confidence = MONTE_CARLO_CONFIDENCE if confidence is None else confidence
+    dd_p50, dd_p95, dd_p99, dd_conf = np.quantile(result['max_drawdown'], [0.50, 0.95, 0.99, confidence])
+    terminal_p5, terminal_p50 = np.quantile(result['terminal_equity'], [0.05, 0.50])
+    return {
+        'Capital': capital,
+        'Paths': len(result['max_drawdown']),
+        'DD_P50': float(dd_p50),
+        'DD_P95': float(dd_p95),
+        'DD_P99': float(dd_p99),
+        'DD_P99_CI': quantile_ci_half_width(result['max_drawdown'], 0.99),
+        'Terminal_P5': float(terminal_p5),
+        'Terminal_P50': float(terminal_p50),
+        'Ruin_Prob': float(result['ruined'].mean()),
+        'Capital_At_Conf': float(dd_conf) * 2,
+    }
+
+
+def run_monte_carlo(strategies_data, pair_weights, n_paths=None, block_size=None):
+    """
+    Bootstrap every pair (at its own required capital), every strategy (pairs
+    at pair_weights) and the portfolio (every strategy at full capital)
+    Returns a list of row dicts: Level, Strategy, Pair, Trades, Hist_DD + summary
+    """
+    block_size = MONTE_CARLO_BLOCK_SIZE if block_size is None else block_size
+    rows = []
+    
+    def add_row(level, strategy, pair, profits, capital):
+        row = {'Level': level, 'Strategy': strategy, 'Pair': pair, 'Trades': len(profits),
+               'Hist_DD': historical_drawdown(profits) if len(profits) else 0.0}
+        row.update(aggregate_result(
+            'monte_carlo', (level, strategy, pair),
+            lambda: summarize_bootstrap(bootstrap_drawdowns(profits, capital, n_paths, block_size), capital),
+            (profits, capital, n_paths, block_size)))
+        rows.append(row)
+    
+    for strategy_name, df in strategies_data.items():
+        scale = SCALING_FACTORS.get(strategy_name, 1)
+        display_name = get_strategy_display_name(strategy_name)
+        for pair_name, capital in zip(df['Currency_Pair'], df['Correct_Initial_Balance']):
+            profits = stats_pair_trade_pnl(strategy_name, pair_name)
+            profits = np.array([]) if profits is None else profits.to_numpy() / scale
+            add_row('Pair', display_name, pair_name, profits, capital)
+        
+        profits = weighted_trade_events({strategy_name: df}, {strategy_name: 1.0}, pair_weights).to_numpy()
+        add_row('Strategy', display_name, STRATEGY_PAIR_METHODS.get(strategy_name, 'Equal_Weight'),
+                profits, df['Correct_Initial_Balance'].sum())
+    
+    profits = weighted_trade_events(strategies_data, {name: 1.0 for name in strategies_data},
+                                    pair_weights).to_numpy()
+    total_capital = sum(df['Correct_Initial_Balance'].sum() for df in strategies_data.values())
+    add_row('Portfolio', 'ALL STRATEGIES', STRATEGY_ALLOCATION_METHOD, profits, total_capital)
+    return rows
+
+
+# ============================================================================
+# WALK-FORWARD ALLOCATION BACKTEST
+# ============================================================================
+# Every pair allocation method is refitted on a rolling training window of
+# daily capital returns and applied to the following step out-of-sample.
+# Window means and covariances come from running sums of x and x·xᵀ: each
+# step adds the entering rows and subtracts the leaving ones, O(step·n²)
+# instead of O(window·n²).
+
+
+def window_max_sharpe_mv(mu, cov, initial=None):
+    """
+    Max_Sharpe_MV weights (fractions) of one window: the previous window's
+    active set is updated from the previous window's in closed form, and
+    projected gradient ascent from the previous weights is the fallback
+    """
+    if initial is not None and len(initial) == len(mu):
+        weights = max_sharpe_active_set(mu, cov, np.asarray(initial) > 0, MV_MAX_WEIGHT)
+        if weights is not None:
+            return weights
+    return optimize_max_sharpe(mu, cov, MV_MAX_WEIGHT, initial)[0]
+
+
+def window_method_weights(method_name, mu, cov, drawdowns, initial=None):
+    """
+    Weights (%) of one allocation method from window statistics: mean and
+    covariance of daily returns and each asset's max drawdown in the window
+    (score methods use the annualized Sharpe and return in place of the
+    report figures); initial = the method's weights in the previous window
+    """
+    n = len(mu)
+    vol = np.sqrt(np.maximum(np.diag(cov), 0))
+    sharpe = np.divide(mu, vol, out=np.zeros(n), where=vol > 0) * np.sqrt(RETURN_PERIODS_PER_YEAR)
+    returns = mu * RETURN_PERIODS_PER_YEAR * 100
+    methods = {
+        'Equal_Weight': lambda: calculate_equal_weight(n),
+        'Inverse_Volatility': lambda: calculate_inverse_volatility_weight(drawdowns),
+        'Sharpe_Weighted': lambda: calculate_sharpe_weight(sharpe),
+        'Risk_Parity': lambda: calculate_risk_parity_weight(sharpe, drawdowns),
+        'Max_Sharpe': lambda: calculate_max_sharpe_weight(sharpe, returns, drawdowns),
+        'Max_Sharpe_MV': lambda: window_max_sharpe_mv(mu, cov, initial) * 100,
+        'Risk_Parity_ERC': lambda: solve_equal_risk_contribution(cov)[0] * 100,
+        'HRP': lambda: hierarchical_risk_parity(cov)[0] * 100,
+    }
+    return methods[method_name]()
+
+
+def walk_forward_strategy(values, train_days, step_days, methods=None):
+    """
+    Out-of-sample daily returns of each method for one strategy's pairs
+    values: dates x pairs capital returns
+    Returns ({method: OOS returns array}, first OOS row)
+    """
+    methods = ALLOCATION_METHODS if methods is None else methods
+    n_rows, n = values.shape
+    oos = {method: np.zeros(max(n_rows - train_days, 0)) for method in methods}
+    if n_rows <= train_days or n == 0:
+        return oos, train_days
+    
+    sum_x = values[:train_days].sum(axis=0)
+    sum_xx = values[:train_days].T @ values[:train_days]
+    previous = {}
+    for start in range(train_days, n_rows, step_days):
+        if start > train_days:
+            entering = values[start - step_days:start]
+            leaving = values[start - step_days - train_days:start - train_days]
+            sum_x += entering.sum(axis=0) - leaving.sum(axis=0)
+            sum_xx += entering.T @ entering - leaving.T @ leaving
+        mu = sum_x / train_days
+        cov = (sum_xx - np.outer(sum_x, mu)) / (train_days - 1)
+        
+        window = values[start - train_days:start]
+        equity = np.cumsum(window, axis=0)
+        drawdowns = (np.maximum(np.maximum.accumulate(equity, axis=0), 0) - equity).max(axis=0)
+        
+        stop = min(start + step_days, n_rows)
+        for method in methods:
+            weights = window_method_weights(method, mu, cov, drawdowns, previous.get(method))
+            previous[method] = weights / 100
+            oos[method][start - train_days:stop - train_days] = values[start:stop] @ (weights / 100)
+    return oos, train_days
+
+
+def performance_summary(daily_returns):
+    """Total / annualized return, volatility, Sharpe and max drawdown (% of capital) of daily returns"""
+    daily_returns = np.asarray(daily_returns, dtype=float)
+    if len(daily_returns) == 0:
+        return {'total_return': 0.0, 'annual_return': 0.0, 'volatility': 0.0, 'sharpe': 0.0, 'max_drawdown': 0.0}
+    equity = np.cumsum(daily_returns)
+    drawdown = (np.maximum(np.maximum.accumulate(equity), 0) - equity).max()
+    annual_return = daily_returns.mean() * RETURN_PERIODS_PER_YEAR
+    volatility = daily_returns.std(ddof=1) * np.sqrt(RETURN_PERIODS_PER_YEAR) if len(daily_returns) > 1 else 0.0
+    return {
+        'total_return': float(equity[-1] * 100),
+        'annual_return': float(annual_return * 100),
+        'volatility': float(volatility * 100),
+        'sharpe': float((annual_return - RISK_FREE_RATE) / volatility) if volatility > 0 else 0.0,
+        'max_drawdown': float(drawdown * 100),
+    }
+
+
+def run_walk_forward(strategies_data, train_days=None, step_days=None, methods=None):
+    """
+    Walk-forward backtest of every method in every strategy; the portfolio
+    runs each strategy at its full capital with the same method throughout.
+    Returns a dict:
+        dates           OOS dates
+        strategy_oos    {strategy: {method: OOS daily returns}}
+        portfolio_oos   {method: OOS daily portfolio returns}
+        in_sample       {method: portfolio returns over the OOS dates with
+                        weights fitted on the full history}
+    """
+    train_days = WALK_FORWARD_TRAIN_DAYS if train_days is None else train_days
+    step_days = WALK_FORWARD_STEP_DAYS if step_days is None else step_days
+    methods = ALLOCATION_METHODS if methods is None else methods
+    
+    capital_returns = build_capital_returns(strategies_data)
+    n_rows = len(capital_returns['dates'])
+    capitals = np.array([df['Correct_Initial_Balance'].sum() for df in strategies_data.values()])
+    capital_share = capitals / capitals.sum() if capitals.sum() > 0 else capitals
+    
+    strategy_oos = {}
+    portfolio_oos = {method: np.zeros(max(n_rows - train_days, 0)) for method in methods}
+    in_sample = {method: np.zeros(max(n_rows - train_days, 0)) for method in methods}
+    for strategy_idx, strategy_name in enumerate(strategies_data):
+        values = strategy_pair_returns(capital_returns, strategy_name)
+        strategy_oos[strategy_name], _ = walk_forward_strategy(values, train_days, step_days, methods)
+        
+        mu, cov = estimate_return_moments(values)
+        equity = np.cumsum(values, axis=0)
+        drawdowns = (np.maximum(np.maximum.accumulate(equity, axis=0), 0) - equity).max(axis=0)
+        for method in methods:
+            portfolio_oos[method] += capital_share[strategy_idx] * strategy_oos[strategy_name][method]
+            weights = window_method_weights(method, mu, cov, drawdowns)
+            in_sample[method] += capital_share[strategy_idx] * (values[train_days:] @ (weights / 100))
+    
+    return {
+        'dates': capital_returns['dates'][train_days:],
+        'strategy_oos': strategy_oos,
+        'portfolio_oos': portfolio_oos,
+        'in_sample': in_sample,
+    }
+
+
+# ============================================================================
+# EFFICIENT FRONTIER (STRATEGY WEIGHT SIMPLEX)
+# ============================================================================
+# Every strategy weighting on a regular grid of the simplex is evaluated at
+# once: return, volatility and Sharpe from the covariance of daily strategy
+# returns, drawdown from each portfolio's daily equity path. The path is
+# streamed one date at a time over a chunk of portfolios, so memory is
+# O(chunk) rather than O(dates x chunk).
 
+def strategy_allocation_weights(strategies_data, strategy_returns):
+    """
+    Strategy weights (%) of every allocation method (Sheet 3)
+    strategy_returns: dates x strategies daily returns, each strategy at full capital
+    """
+    sharpe_ratios = np.array([df['Sharpe_Ratio'].mean() for df in strategies_data.values()])
+    max_drawdowns = np.array([df['Max_Drawdown'].sum() for df in strategies_data.values()])
+    returns = np.array([df['Total_Profit'].sum() / df['Correct_Initial_Balance'].sum() * 100
+                        for df in strategies_data.values()])
+    return {
+        'Equal_Weight': calculate_equal_weight(len(strategies_data)),
+        'Inverse_Volatility': calculate_inverse_volatility_weight(max_drawdowns),
+        'Sharpe_Weighted': calculate_sharpe_weight(sharpe_ratios),
+        'Risk_Parity': calculate_risk_parity_weight(sharpe_ratios, max_drawdowns),
+        'Max_Sharpe': calculate_max_sharpe_weight(sharpe_ratios, returns, max_drawdowns),
+        'Max_Sharpe_MV': calculate_max_sharpe_mv_weight(
+            strategy_returns, warm_start_key=tuple(strategies_data)),
+        'Risk_Parity_ERC': calculate_erc_weight(strategy_returns, label=tuple(strategies_data)),
+        'HRP': calculate_hrp_weight(strategy_returns)
+    }
 
-def load_strategy_equity_data(strategy_name, paths):
-    """Load equity curve data for a strategy"""
-    equity_curves = []
-    pair_names = []
-    
-    for rel_path, pair_name in paths:
-        file_path = os.path.join(BASE_PATH, rel_path)
-        if not os.path.exists(file_path):
-            continue
+
+def frontier_grid_steps(n_assets, max_points):
+    """Finest grid resolution m with C(m + n - 1, n - 1) points within max_points"""
+    if n_assets <= 1:
+        return 1
+    steps = 1
+    while math.comb(steps + n_assets, n_assets - 1) <= max_points:
+        steps += 1
+    return steps
+
+
+def simplex_grid(n_assets, steps):
+    """All weight vectors with entries in multiples of 1/steps summing to 1 (k x n)"""
+    if n_assets == 1:
+        return np.ones((1, 1))
+    bars = np.fromiter(itertools.chain.from_iterable(
+        itertools.combinations(range(steps + n_assets - 1), n_assets - 1)), dtype=np.intp)
+    bars = bars.reshape(-1, n_assets - 1)
+    edges = np.hstack([np.full((len(bars), 1), -1), bars, np.full((len(bars), 1), steps + n_assets - 1)])
+    return (np.diff(edges, axis=1) - 1) / steps
+
+
+def portfolio_max_drawdowns(returns, weights, chunk_points=None, chunk_bytes=None):
+    """
+    Max drawdown of the summed daily equity path of every weight vector
+    returns: dates x assets; weights: k x assets fractions
+    Equity is linear in the weights, so each block of dates is one product of
+    the per-asset cumulative returns with a chunk of weights; dates are blocked
+    so that product fits chunk_bytes, and the running peak is carried over
+    Returns a length-k array in the units of returns (fraction of capital)
+    """
+    chunk_points = FRONTIER_CHUNK_POINTS if chunk_points is None else chunk_points
+    chunk_bytes = FRONTIER_CHUNK_BYTES if chunk_bytes is None else chunk_bytes
+    returns = np.asarray(returns, dtype=float)
+    equity_paths = np.cumsum(returns[np.any(returns != 0, axis=1)], axis=0)
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    drawdowns = np.zeros(len(weights))
+    for start in range(0, len(weights), chunk_points):
+        chunk_t = weights[start:start + chunk_points].T
+        # Equity block plus its running peaks, both float64
+        block_days = max(1, chunk_bytes // (16 * chunk_t.shape[1]))
+        peak = np.zeros(chunk_t.shape[1])
+        worst = np.zeros(chunk_t.shape[1])
+        for day in range(0, len(equity_paths), block_days):
+            equity = equity_paths[day:day + block_days] @ chunk_t
+            peaks = equity.copy()
+            np.maximum(peaks[0], peak, out=peaks[0])
+            np.maximum.accumulate(peaks, axis=0, out=peaks)
+            peak = peaks[-1].copy()
+            np.subtract(peaks, equity, out=peaks)
+            np.maximum(worst, peaks.max(axis=0), out=worst)
+        drawdowns[start:start + chunk_points] = worst
+    return drawdowns
+
+
+def pareto_frontier(risk, reward):
+    """Indices of the points no other point beats on both risk and reward, by increasing risk"""
+    # Ties are decided on rounded values, not on summation-order noise
+    risk, reward = np.round(risk, 12), np.round(reward, 12)
+    order = np.lexsort((-reward, risk))
+    best_before = np.maximum.accumulate(np.concatenate([[-np.inf], reward[order][:-1]]))
+    return order[reward[order] > best_before]
+
+
+def frontier_reward_at(frontier_risk, frontier_reward, risk):
+    """Highest frontier reward at or below the given risk (NaN below the frontier's least risk)"""
+    k = np.searchsorted(frontier_risk, risk, side='right') - 1
+    return np.where(k >= 0, frontier_reward[np.maximum(k, 0)], np.nan)
+
+
+def run_efficient_frontier(strategies_data, max_points=None):
+    """
+    Sweep the strategy weight simplex and place every allocation method on it
+    Returns a dict:
+        strategies      strategy names
+        steps           grid resolution (weights in multiples of 1/steps)
+        weights         k x strategies fractions: grid points, then the methods
+        methods         {method: row index into weights}
+        return, volatility, sharpe, max_drawdown
+                        length-k arrays (annualized fractions; drawdown of
+                        the daily equity path as a fraction of capital)
+        vol_frontier    indices of the return / volatility Pareto frontier
+        dd_frontier     indices of the return / drawdown Pareto frontier
+    """
+    max_points = FRONTIER_MAX_POINTS if max_points is None else max_points
+    strategy_returns = strategy_capital_returns(build_capital_returns(strategies_data), strategies_data)
+    method_weights = strategy_allocation_weights(strategies_data, strategy_returns)
+    
+    n_strategies = len(strategies_data)
+    steps = frontier_grid_steps(n_strategies, max_points)
+    grid = simplex_grid(n_strategies, steps)
+    weights = np.vstack([grid] + [w / w.sum() for w in method_weights.values()])
+    
+    mu, cov = estimate_return_moments(strategy_returns)
+    scores = evaluate_portfolios(weights, mu, cov)
+    drawdowns = portfolio_max_drawdowns(strategy_returns, weights)
+    
+    return {
+        'strategies': list(strategies_data),
+        'steps': steps,
+        'weights': weights,
+        'methods': {method: len(grid) + i for i, method in enumerate(method_weights)},
+        'return': scores['return'],
+        'volatility': scores['volatility'],
+        'sharpe': scores['sharpe'],
+        'max_drawdown': drawdowns,
+        'vol_frontier': pareto_frontier(scores['volatility'], scores['return']),
+        'dd_frontier': pareto_frontier(drawdowns, scores['return']),
+    }
+
+
+# ============================================================================
+# ANALYSIS ARTIFACT (SIMULATOR HAND-OFF)
+# ============================================================================
+# The figures of Sheets 1-3 that the allocation simulator needs, as typed
+# tables (see analysis_artifact.py) written next to the workbook and returned
+# by main() for in-process use.
+
+def build_analysis_tables(strategies_data):
+    """Tables pair_stats, pair_weights and strategy_allocation (analysis_artifact.TABLE_SCHEMAS)"""
+    capital_returns = build_capital_returns(strategies_data)
+    strategy_returns = strategy_capital_returns(capital_returns, strategies_data)
+    strategy_weights = strategy_allocation_weights(strategies_data, strategy_returns)
+    
+    pair_rows = []
+    weight_rows = []
+    strategy_rows = []
+    for i, (strategy_name, df) in enumerate(strategies_data.items()):
+        display_name = get_strategy_display_name(strategy_name)
+        pair_weights = pair_allocation_weights(df, strategy_pair_returns(capital_returns, strategy_name))
         
-        if strategy_name == 'Reversal_Strategy':
-            equity_df = load_reversal_strategy_equity_curve(file_path, pair_name)
-        elif strategy_name in ['PairTradingEA', 'RSI_Correlation']:
-            equity_df = load_pairtrading_equity_curve(file_path, pair_name)
-        elif file_path.endswith('.xlsx'):
-            equity_df = load_excel_equity_curve(file_path, pair_name)
-        else:
-            equity_df = load_csv_equity_curve(file_path, pair_name)
+        for j, (_, pair_row) in enumerate(df.iterrows()):
+            pair_rows.append({
+                'strategy': strategy_name,
+                'display_name': display_name,
+                'pair': pair_row['Currency_Pair'],
+                'sharpe': pair_row['Sharpe_Ratio'],
+                'total_trades': int(pair_row['Total_Trades']),
+                'winning_trades': int(pair_row['Winning_Trades']),
+                'losing_trades': int(pair_row['Losing_Trades']),
+                'total_profit': pair_row['Total_Profit'],
+                'max_drawdown': pair_row['Max_Drawdown'],
+                'required_capital': pair_row['Correct_Initial_Balance'],
+                'profit_factor': pair_row['Profit_Factor'],
+                'xirr_pct': pair_row['Correct_XIRR'],
+                'trading_days': int(pair_row.get('Trading_Period_Days', 0)),
+                'start_date': pd.to_datetime(pair_row.get('Start_Date'), errors='coerce'),
+                'end_date': pd.to_datetime(pair_row.get('End_Date'), errors='coerce'),
+            })
+            weight_rows.append({'strategy': strategy_name, 'pair': pair_row['Currency_Pair'],
+                                **{method: pair_weights[method][j] for method in ALLOCATION_METHODS}})
         
-        if equity_df is not None and len(equity_df) > 0:
-            equity_curves.append(equity_df)
-            pair_names.append(pair_name)
-    
-    if not equity_curves:
-        return None, None
-    
-    returns_list = []
-    for equity_df in equity_curves:
-        equity_df = equity_df[~equity_df.index.duplicated(keep='last')]
-        daily_equity = equity_df.resample('D').last().ffill()
-        ret = daily_equity.pct_change().fillna(0)
-        returns_list.append(ret)
-    
-    returns = pd.concat(returns_list, axis=1, join='outer')
-    returns = returns.fillna(0)
+        strategy_rows.append({
+            'strategy': strategy_name,
+            'display_name': display_name,
+            'pairs': len(df),
+            'sharpe': df['Sharpe_Ratio'].mean(),
+            'total_profit': df['Total_Profit'].sum(),
+            'required_capital': df['Correct_Initial_Balance'].sum(),
+            'max_drawdown': df['Max_Drawdown'].sum(),
+            'pair_method': STRATEGY_PAIR_METHODS.get(strategy_name, 'Equal_Weight'),
+            **{method: strategy_weights[method][i] for method in ALLOCATION_METHODS},
+        })
     
-    return returns, pair_names
+    return {
+        'pair_stats': pd.DataFrame(pair_rows),
+        'pair_weights': pd.DataFrame(weight_rows),
+        'strategy_allocation': pd.DataFrame(strategy_rows),
+    }
 
 
 # ============================================================================
@@ -751,26 +2429,24 @@ def load_strategy_equity_data(strategy_name, paths):
 
 def create_sheet1_statistics(wb, strategies_data):
     """Create Sheet 1: Strategy Statistics with ALPHA column"""
-    ws = wb.create_sheet("Strategy_Statistics")
+    add_styles(wb, TABLE_STYLES)
+    widths = {get_column_letter(col): 14 for col in range(1, 19)}
+    widths['A'] = 28
+    ws = new_sheet(wb, "Strategy_Statistics", widths=widths)
     row = 1
     
     # Title
-    ws.cell(row=row, column=1, value="COMPREHENSIVE STRATEGY STATISTICS (MT5 Sharpe Ratios)")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=18)
-    ws.cell(row=row, column=1).font = Font(bold=True, size=16, color="1F4E79")
-    ws.cell(row=row, column=1).alignment = Alignment(horizontal='center')
+    write_row(ws, row, ["COMPREHENSIVE STRATEGY STATISTICS (MT5 Sharpe Ratios)"], 'Sheet Title', merge_to=18)
     row += 1
     
-    ws.cell(row=row, column=1, value="Note: Initial Capital = Max Drawdown × 2 | ALPHA = Sharpe × √(Total Trades)")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=18)
-    ws.cell(row=row, column=1).font = Font(italic=True, size=10, color="C00000")
+    write_row(ws, row, ["Note: Initial Capital = Max Drawdown × 2 | ALPHA = Sharpe × √(Total Trades)"],
+              'Sheet Note', merge_to=18)
     row += 2
     
     for idx, (strategy_name, df) in enumerate(strategies_data.items()):
         display_name = get_strategy_display_name(strategy_name)
-        ws.cell(row=row, column=1, value=f"Strategy: {display_name}")
-        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=18)
-        style_strategy_header(ws, row, 1, 18, STRATEGY_COLORS[idx % len(STRATEGY_COLORS)])
+        header_style = f"Strategy Header {STRATEGY_COLORS[idx % len(STRATEGY_COLORS)]}"
+        write_row(ws, row, [f"Strategy: {display_name}"], [header_style] * 18, merge_to=18)
         row += 1
         
         # Added ALPHA column (18th column)
@@ -778,76 +2454,71 @@ def create_sheet1_statistics(wb, strategies_data):
                    'Total_Profit', 'Max_Drawdown', 'Initial_Capital', 'Final_Balance',
                    'Return_%', 'XIRR_%', 'Profit_Factor', 'Trading_Days', 
                    'Trading_Years', 'Start_Date', 'End_Date', 'Winning', 'Losing', 'ALPHA']
-        
-        for col_idx, header in enumerate(headers, 1):
-            ws.cell(row=row, column=col_idx, value=header)
-        style_subheader(ws, row, 1, len(headers))
+        write_row(ws, row, headers, 'Table Header')
         row += 1
         
         start_data_row = row
         
         for _, pair_row in df.iterrows():
-            ws.cell(row=row, column=1, value=pair_row['Currency_Pair'])
-            ws.cell(row=row, column=2, value=round(pair_row['Sharpe_Ratio'], 2))
-            ws.cell(row=row, column=3, value=int(pair_row['Total_Trades']))
-            ws.cell(row=row, column=4, value=f"=ROUND(IF(C{row}>0, (P{row}/C{row})*100, 0), 2)")
-            ws.cell(row=row, column=5, value=round(pair_row['Total_Profit'], 2))
-            ws.cell(row=row, column=6, value=round(pair_row['Max_Drawdown'], 2))
-            ws.cell(row=row, column=7, value=f"=ROUND(F{row}*2, 2)")
-            ws.cell(row=row, column=8, value=f"=ROUND(G{row}+E{row}, 2)")
-            ws.cell(row=row, column=9, value=f"=ROUND(IF(G{row}>0, (E{row}/G{row})*100, 0), 2)")
-            ws.cell(row=row, column=10, value=f"=ROUND(IF(AND(G{row}>0, M{row}>0), ((1+I{row}/100)^(1/M{row})-1)*100, 0), 2)")
-            ws.cell(row=row, column=11, value=round(pair_row['Profit_Factor'], 2))
-            ws.cell(row=row, column=12, value=int(pair_row.get('Trading_Period_Days', 0)))
-            ws.cell(row=row, column=13, value=f"=ROUND(L{row}/365, 2)")
-            ws.cell(row=row, column=14, value=str(pair_row.get('Start_Date', 'N/A')))
-            ws.cell(row=row, column=15, value=str(pair_row.get('End_Date', 'N/A')))
-            ws.cell(row=row, column=16, value=int(pair_row['Winning_Trades']))
-            ws.cell(row=row, column=17, value=int(pair_row['Losing_Trades']))
-            # ALPHA = Sharpe × √(Total Trades)
-            ws.cell(row=row, column=18, value=f"=ROUND(B{row}*SQRT(C{row}), 2)")
+            write_row(ws, row, [
+                pair_row['Currency_Pair'],
+                round(pair_row['Sharpe_Ratio'], 2),
+                int(pair_row['Total_Trades']),
+                f"=ROUND(IF(C{row}>0, (P{row}/C{row})*100, 0), 2)",
+                round(pair_row['Total_Profit'], 2),
+                round(pair_row['Max_Drawdown'], 2),
+                f"=ROUND(F{row}*2, 2)",
+                f"=ROUND(G{row}+E{row}, 2)",
+                f"=ROUND(IF(G{row}>0, (E{row}/G{row})*100, 0), 2)",
+                round(pair_row['Correct_XIRR'], 2),
+                round(pair_row['Profit_Factor'], 2),
+                int(pair_row.get('Trading_Period_Days', 0)),
+                f"=ROUND(L{row}/365, 2)",
+                str(pair_row.get('Start_Date', 'N/A')),
+                str(pair_row.get('End_Date', 'N/A')),
+                int(pair_row['Winning_Trades']),
+                int(pair_row['Losing_Trades']),
+                # ALPHA = Sharpe × √(Total Trades)
+                f"=ROUND(B{row}*SQRT(C{row}), 2)",
+            ], 'Table Cell')
             row += 1
         
         end_data_row = row - 1
         
         # STRATEGY TOTAL row
-        ws.cell(row=row, column=1, value="STRATEGY TOTAL")
-        ws.cell(row=row, column=2, value=f"=ROUND(AVERAGE(B{start_data_row}:B{end_data_row}), 2)")
-        ws.cell(row=row, column=3, value=f"=SUM(C{start_data_row}:C{end_data_row})")
-        ws.cell(row=row, column=4, value=f"=ROUND(IF(C{row}>0, (P{row}/C{row})*100, 0), 2)")
-        ws.cell(row=row, column=5, value=f"=ROUND(SUM(E{start_data_row}:E{end_data_row}), 2)")
-        ws.cell(row=row, column=6, value=f"=ROUND(SUM(F{start_data_row}:F{end_data_row}), 2)")
-        ws.cell(row=row, column=7, value=f"=ROUND(SUM(G{start_data_row}:G{end_data_row}), 2)")
-        ws.cell(row=row, column=8, value=f"=ROUND(SUM(H{start_data_row}:H{end_data_row}), 2)")
-        ws.cell(row=row, column=9, value=f"=ROUND(IF(G{row}>0, (E{row}/G{row})*100, 0), 2)")
-        ws.cell(row=row, column=10, value=f"=ROUND(AVERAGE(J{start_data_row}:J{end_data_row}), 2)")
-        ws.cell(row=row, column=11, value=f"=ROUND(AVERAGE(K{start_data_row}:K{end_data_row}), 2)")
-        ws.cell(row=row, column=16, value=f"=SUM(P{start_data_row}:P{end_data_row})")
-        ws.cell(row=row, column=17, value=f"=SUM(Q{start_data_row}:Q{end_data_row})")
-        # Strategy ALPHA = Avg Sharpe × √(Total Trades)
-        ws.cell(row=row, column=18, value=f"=ROUND(B{row}*SQRT(C{row}), 2)")
-        style_result_row(ws, row, 1, 18, "FFF2CC")
-        
-        add_border(ws, start_data_row - 1, row, 1, 18)
+        write_row(ws, row, [
+            "STRATEGY TOTAL",
+            f"=ROUND(AVERAGE(B{start_data_row}:B{end_data_row}), 2)",
+            f"=SUM(C{start_data_row}:C{end_data_row})",
+            f"=ROUND(IF(C{row}>0, (P{row}/C{row})*100, 0), 2)",
+            f"=ROUND(SUM(E{start_data_row}:E{end_data_row}), 2)",
+            f"=ROUND(SUM(F{start_data_row}:F{end_data_row}), 2)",
+            f"=ROUND(SUM(G{start_data_row}:G{end_data_row}), 2)",
+            f"=ROUND(SUM(H{start_data_row}:H{end_data_row}), 2)",
+            f"=ROUND(IF(G{row}>0, (E{row}/G{row})*100, 0), 2)",
+            f"=ROUND(AVERAGE(J{start_data_row}:J{end_data_row}), 2)",
+            f"=ROUND(AVERAGE(K{start_data_row}:K{end_data_row}), 2)",
+            None, None, None, None,
+            f"=SUM(P{start_data_row}:P{end_data_row})",
+            f"=SUM(Q{start_data_row}:Q{end_data_row})",
+            # Strategy ALPHA = Avg Sharpe × √(Total Trades)
+            f"=ROUND(B{row}*SQRT(C{row}), 2)",
+        ], 'Table Total FFF2CC')
         row += 3
     
-    # Column widths
-    for col in range(1, 19):
-        ws.column_dimensions[get_column_letter(col)].width = 14
-    ws.column_dimensions['A'].width = 28
-    
     return ws
 
 
 def create_sheet2_pair_allocation(wb, strategies_data):
     """Create Sheet 2: Pair Capital Distribution with proper borders and 2 decimals"""
-    ws = wb.create_sheet("Pair_Capital_Distribution")
+    add_styles(wb, TABLE_STYLES)
+    widths = {get_column_letter(col): 14 for col in range(1, 16)}
+    widths['A'] = 28
+    ws = new_sheet(wb, "Pair_Capital_Distribution", widths=widths)
     row = 1
+    capital_returns = build_capital_returns(strategies_data)
     
-    ws.cell(row=row, column=1, value="PAIR CAPITAL DISTRIBUTION WITHIN STRATEGIES")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=12)
-    ws.cell(row=row, column=1).font = Font(bold=True, size=16, color="1F4E79")
-    ws.cell(row=row, column=1).alignment = Alignment(horizontal='center')
+    write_row(ws, row, ["PAIR CAPITAL DISTRIBUTION WITHIN STRATEGIES"], 'Sheet Title', merge_to=15)
     row += 2
     
     for idx, (strategy_name, df) in enumerate(strategies_data.items()):
@@ -855,82 +2526,69 @@ def create_sheet2_pair_allocation(wb, strategies_data):
             continue
         
         display_name = get_strategy_display_name(strategy_name)
-        ws.cell(row=row, column=1, value=f"STRATEGY: {display_name} ({len(df)} pairs)")
-        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=12)
-        style_strategy_header(ws, row, 1, 12, STRATEGY_COLORS[idx % len(STRATEGY_COLORS)])
+        header_style = f"Strategy Header {STRATEGY_COLORS[idx % len(STRATEGY_COLORS)]}"
+        write_row(ws, row, [f"STRATEGY: {display_name} ({len(df)} pairs)"], [header_style] * 15, merge_to=15)
         row += 1
         
         n_pairs = len(df)
-        sharpe_ratios = df['Sharpe_Ratio'].values
-        max_drawdowns = df['Max_Drawdown'].values
-        returns = df['Correct_Return_Percent'].values
-        
-        weights = {
-            'Equal_Weight': calculate_equal_weight(n_pairs),
-            'Inverse_Volatility': calculate_inverse_volatility_weight(max_drawdowns),
-            'Sharpe_Weighted': calculate_sharpe_weight(sharpe_ratios),
-            'Risk_Parity': calculate_risk_parity_weight(sharpe_ratios, max_drawdowns),
-            'Max_Sharpe': calculate_max_sharpe_weight(sharpe_ratios, returns, max_drawdowns)
-        }
+        weights = pair_allocation_weights(df, strategy_pair_returns(capital_returns, strategy_name))
         
         headers = ['Currency_Pair', 'Equal_%', 'Inv_Vol_%', 'Sharpe_%', 
                    'Risk_Parity_%', 'Max_Sharpe_%', 'Sharpe_Ratio', 'Return_%', 'XIRR_%', 
-                   'Max_DD', 'Initial_Cap', 'Profit']
-        
-        for col_idx, header in enumerate(headers, 1):
-            ws.cell(row=row, column=col_idx, value=header)
-        style_subheader(ws, row, 1, len(headers))
+                   'Max_DD', 'Initial_Cap', 'Profit', 'Max_Sharpe_MV_%', 'ERC_%', 'HRP_%']
+        write_row(ws, row, headers, 'Table Header')
         row += 1
         
         start_data_row = row
         
         for i, pair_name in enumerate(df['Currency_Pair'].values):
-            ws.cell(row=row, column=1, value=pair_name)
-            ws.cell(row=row, column=2, value=f"=ROUND(100/{n_pairs}, 2)")
-            ws.cell(row=row, column=3, value=round(weights['Inverse_Volatility'][i], 2))
-            ws.cell(row=row, column=4, value=round(weights['Sharpe_Weighted'][i], 2))
-            ws.cell(row=row, column=5, value=round(weights['Risk_Parity'][i], 2))
-            ws.cell(row=row, column=6, value=round(weights['Max_Sharpe'][i], 2))
-            ws.cell(row=row, column=7, value=round(df.iloc[i]['Sharpe_Ratio'], 2))
-            ws.cell(row=row, column=8, value=f"=ROUND(IF(K{row}>0, (L{row}/K{row})*100, 0), 2)")
-            trading_years = df.iloc[i]['Trading_Years']
-            ws.cell(row=row, column=9, value=f"=ROUND(IF(H{row}>0, ((1+H{row}/100)^(1/{trading_years:.4f})-1)*100, 0), 2)")
-            ws.cell(row=row, column=10, value=round(df.iloc[i]['Max_Drawdown'], 2))
-            ws.cell(row=row, column=11, value=f"=ROUND(J{row}*2, 2)")
-            ws.cell(row=row, column=12, value=round(df.iloc[i]['Total_Profit'], 2))
+            write_row(ws, row, [
+                pair_name,
+                f"=ROUND(100/{n_pairs}, 2)",
+                round(weights['Inverse_Volatility'][i], 2),
+                round(weights['Sharpe_Weighted'][i], 2),
+                round(weights['Risk_Parity'][i], 2),
+                round(weights['Max_Sharpe'][i], 2),
+                round(df.iloc[i]['Sharpe_Ratio'], 2),
+                f"=ROUND(IF(K{row}>0, (L{row}/K{row})*100, 0), 2)",
+                round(df.iloc[i]['Correct_XIRR'], 2),
+                round(df.iloc[i]['Max_Drawdown'], 2),
+                f"=ROUND(J{row}*2, 2)",
+                round(df.iloc[i]['Total_Profit'], 2),
+                round(weights['Max_Sharpe_MV'][i], 2),
+                round(weights['Risk_Parity_ERC'][i], 2),
+                round(weights['HRP'][i], 2),
+            ], 'Table Cell')
             row += 1
         
         end_data_row = row - 1
         
         # TOTAL row
-        ws.cell(row=row, column=1, value="TOTAL")
-        for c in range(2, 7):
-            ws.cell(row=row, column=c, value=f"=ROUND(SUM({get_column_letter(c)}{start_data_row}:{get_column_letter(c)}{end_data_row}), 2)")
-        ws.cell(row=row, column=7, value=f"=ROUND(AVERAGE(G{start_data_row}:G{end_data_row}), 2)")
-        ws.cell(row=row, column=10, value=f"=ROUND(SUM(J{start_data_row}:J{end_data_row}), 2)")
-        ws.cell(row=row, column=11, value=f"=ROUND(SUM(K{start_data_row}:K{end_data_row}), 2)")
-        ws.cell(row=row, column=12, value=f"=ROUND(SUM(L{start_data_row}:L{end_data_row}), 2)")
-        style_result_row(ws, row, 1, 12, "D9E1F2")
+        def column_sum(c):
+            return f"=ROUND(SUM({get_column_letter(c)}{start_data_row}:{get_column_letter(c)}{end_data_row}), 2)"
         
-        add_border(ws, start_data_row - 1, row, 1, 12)
+        write_row(ws, row, ["TOTAL"] + [column_sum(c) for c in range(2, 7)] + [
+            f"=ROUND(AVERAGE(G{start_data_row}:G{end_data_row}), 2)",
+            None, None,
+        ] + [column_sum(c) for c in range(10, 16)], 'Table Total D9E1F2')
         row += 3
     
-    for col in range(1, 13):
-        ws.column_dimensions[get_column_letter(col)].width = 14
-    ws.column_dimensions['A'].width = 28
-    
     return ws
 
 
 def create_sheet3_strategy_allocation(wb, strategies_data):
     """Create Sheet 3: Strategy Capital Distribution with portfolio metrics per allocation method"""
-    ws = wb.create_sheet("Strategy_Capital_Distribution")
+    add_styles(wb, TABLE_STYLES)
+    widths = {get_column_letter(col): 16 for col in range(1, 16)}
+    widths['A'] = 22
+    ws = new_sheet(wb, "Strategy_Capital_Distribution", widths=widths)
     row = 1
     
-    ws.cell(row=row, column=1, value="STRATEGY CAPITAL DISTRIBUTION")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=12)
-    ws.cell(row=row, column=1).font = Font(bold=True, size=16, color="1F4E79")
-    ws.cell(row=row, column=1).alignment = Alignment(horizontal='center')
+    # Daily strategy returns (each strategy at full capital) for the
+    # mean-variance weights and every method's Portfolio_Sharpe
+    strategy_returns = strategy_capital_returns(build_capital_returns(strategies_data), strategies_data)
+    
+    write_row(ws, row, ["STRATEGY CAPITAL DISTRIBUTION"], 'Sheet Title', merge_to=15)
     row += 2
     
     strategies = []
@@ -951,206 +2609,212 @@ def create_sheet3_strategy_allocation(wb, strategies_data):
     strategy_df = pd.DataFrame(strategies)
     n_strategies = len(strategy_df)
     
-    sharpe_ratios = strategy_df['Avg_Sharpe_Ratio'].values
-    max_drawdowns = strategy_df['Max_Drawdown'].values
-    returns = (strategy_df['Total_Profit'] / strategy_df['Total_Initial_Capital'] * 100).values
     xirr_values = strategy_df['Correct_XIRR'].values
     total_capital = strategy_df['Total_Initial_Capital'].sum()
     total_profit = strategy_df['Total_Profit'].sum()
     
-    weights = {
-        'Equal_Weight': calculate_equal_weight(n_strategies),
-        'Inverse_Volatility': calculate_inverse_volatility_weight(max_drawdowns),
-        'Sharpe_Weighted': calculate_sharpe_weight(sharpe_ratios),
-        'Risk_Parity': calculate_risk_parity_weight(sharpe_ratios, max_drawdowns),
-        'Max_Sharpe': calculate_max_sharpe_weight(sharpe_ratios, returns, max_drawdowns)
-    }
+    weights = strategy_allocation_weights(strategies_data, strategy_returns)
+    
+    # XIRR of each strategy (pairs at full capital) and of the whole portfolio
+    # under every method, from the merged dated cash flows
+    strategy_xirr = solve_xirr([weighted_cash_flows({name: df}, {name: 1.0})
+                                for name, df in strategies_data.items()]) * 100
+    strategy_capitals = {name: df['Correct_Initial_Balance'].sum() for name, df in strategies_data.items()}
+    total_capital_req = sum(strategy_capitals.values())
+    method_xirr = dict(zip(weights, solve_xirr([
+        weighted_cash_flows(strategies_data, {
+            name: w / 100 * total_capital_req / strategy_capitals[name] if strategy_capitals[name] > 0 else 0
+            for name, w in zip(strategies_data, method_weights)
+        })
+        for method_weights in weights.values()
+    ]) * 100))
     
-    ws.cell(row=row, column=1, value="STRATEGY WEIGHTS BY ALLOCATION METHOD")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=12)
-    style_strategy_header(ws, row, 1, 12, "1F4E79")
+    write_row(ws, row, ["STRATEGY WEIGHTS BY ALLOCATION METHOD"], ['Strategy Header 1F4E79'] * 15, merge_to=15)
     row += 1
     
     headers = ['Strategy', 'Pairs', 'Sharpe', 'Return_%', 'XIRR_%', 'Capital_Req',
-               'Equal_%', 'Inv_Vol_%', 'Sharpe_%', 'Risk_Parity_%', 'Max_Sharpe_%', 'Profit']
-    
-    for col_idx, header in enumerate(headers, 1):
-        ws.cell(row=row, column=col_idx, value=header)
-    style_subheader(ws, row, 1, len(headers))
+               'Equal_%', 'Inv_Vol_%', 'Sharpe_%', 'Risk_Parity_%', 'Max_Sharpe_%', 'Profit',
+               'Max_Sharpe_MV_%', 'ERC_%', 'HRP_%']
+    write_row(ws, row, headers, 'Table Header')
     row += 1
     
     start_data_row = row
     
     for i, strat_row in strategy_df.iterrows():
-        ws.cell(row=row, column=1, value=strat_row['Strategy'])
-        ws.cell(row=row, column=2, value=int(strat_row['Num_Pairs']))
-        ws.cell(row=row, column=3, value=round(strat_row['Avg_Sharpe_Ratio'], 2))
-        ws.cell(row=row, column=4, value=f"=ROUND(IF(F{row}>0, (L{row}/F{row})*100, 0), 2)")
-        trading_yrs = strat_row['Trading_Years']
-        ws.cell(row=row, column=5, value=f"=ROUND(IF(D{row}>0, ((1+D{row}/100)^(1/{trading_yrs:.4f})-1)*100, 0), 2)")
-        ws.cell(row=row, column=6, value=round(strat_row['Total_Initial_Capital'], 2))
-        ws.cell(row=row, column=7, value=f"=ROUND(100/{n_strategies}, 2)")
-        ws.cell(row=row, column=8, value=round(weights['Inverse_Volatility'][i], 2))
-        ws.cell(row=row, column=9, value=round(weights['Sharpe_Weighted'][i], 2))
-        ws.cell(row=row, column=10, value=round(weights['Risk_Parity'][i], 2))
-        ws.cell(row=row, column=11, value=round(weights['Max_Sharpe'][i], 2))
-        ws.cell(row=row, column=12, value=round(strat_row['Total_Profit'], 2))
+        write_row(ws, row, [
+            strat_row['Strategy'],
+            int(strat_row['Num_Pairs']),
+            round(strat_row['Avg_Sharpe_Ratio'], 2),
+            f"=ROUND(IF(F{row}>0, (L{row}/F{row})*100, 0), 2)",
+            round(float(np.nan_to_num(strategy_xirr[i])), 2),
+            round(strat_row['Total_Initial_Capital'], 2),
+            f"=ROUND(100/{n_strategies}, 2)",
+            round(weights['Inverse_Volatility'][i], 2),
+            round(weights['Sharpe_Weighted'][i], 2),
+            round(weights['Risk_Parity'][i], 2),
+            round(weights['Max_Sharpe'][i], 2),
+            round(strat_row['Total_Profit'], 2),
+            round(weights['Max_Sharpe_MV'][i], 2),
+            round(weights['Risk_Parity_ERC'][i], 2),
+            round(weights['HRP'][i], 2),
+        ], 'Table Cell')
         row += 1
     
     end_data_row = row - 1
     
     # TOTAL row
-    ws.cell(row=row, column=1, value="TOTAL")
-    ws.cell(row=row, column=2, value=f"=SUM(B{start_data_row}:B{end_data_row})")
-    ws.cell(row=row, column=6, value=f"=ROUND(SUM(F{start_data_row}:F{end_data_row}), 2)")
-    for c in range(7, 12):
-        ws.cell(row=row, column=c, value=f"=ROUND(SUM({get_column_letter(c)}{start_data_row}:{get_column_letter(c)}{end_data_row}), 2)")
-    ws.cell(row=row, column=12, value=f"=ROUND(SUM(L{start_data_row}:L{end_data_row}), 2)")
-    style_result_row(ws, row, 1, 12, "D9E1F2")
-    total_row = row
+    def column_sum(c):
+        return f"=ROUND(SUM({get_column_letter(c)}{start_data_row}:{get_column_letter(c)}{end_data_row}), 2)"
     
-    add_border(ws, start_data_row - 1, row, 1, 12)
+    write_row(ws, row, ["TOTAL", f"=SUM(B{start_data_row}:B{end_data_row})", None, None, None] +
+              [column_sum(c) for c in range(6, 16)], 'Table Total D9E1F2')
+    total_row = row
     row += 3
     
     # =========================================================================
     # SECTION 2: FINAL PORTFOLIO METRICS BY ALLOCATION METHOD
     # =========================================================================
-    ws.cell(row=row, column=1, value="FINAL PORTFOLIO METRICS BY ALLOCATION METHOD")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=7)
-    style_strategy_header(ws, row, 1, 7, "70AD47")
+    write_row(ws, row, ["FINAL PORTFOLIO METRICS BY ALLOCATION METHOD"], ['Strategy Header 70AD47'] * 7, merge_to=7)
     row += 1
     
-    ws.cell(row=row, column=1, value="Use this table to compare what your final portfolio would look like with each allocation method")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=7)
-    ws.cell(row=row, column=1).font = Font(italic=True, size=10, color="666666")
+    write_row(ws, row, ["Use this table to compare what your final portfolio would look like with each allocation method"],
+              'Grey Note', merge_to=7)
     row += 1
     
     # Headers for portfolio metrics table
     perf_headers = ['Allocation_Method', 'Portfolio_Sharpe', 'Portfolio_XIRR_%', 
                     'Total_Capital_$', 'Expected_Profit_$', 'Overall_Return_%', 'Rating']
-    for col_idx, header in enumerate(perf_headers, 1):
-        ws.cell(row=row, column=col_idx, value=header)
-    style_subheader(ws, row, 1, len(perf_headers))
+    write_row(ws, row, perf_headers, 'Table Header')
     row += 1
     
-    perf_start_row = row
-    rho = STRATEGY_CORRELATION
-    
-    # Calculate portfolio metrics for each allocation method
-    method_names = ['Equal_Weight', 'Inverse_Volatility', 'Sharpe_Weighted', 'Risk_Parity', 'Max_Sharpe']
+    # Portfolio Sharpe of every method in one batch, against the empirical
+    # covariance of daily strategy returns
+    mu, cov = estimate_return_moments(strategy_returns)
+    method_scores = evaluate_portfolios([weights[m] for m in ALLOCATION_METHODS], mu, cov)
     weight_cols = {'Equal_Weight': 'G', 'Inverse_Volatility': 'H', 'Sharpe_Weighted': 'I', 
-                   'Risk_Parity': 'J', 'Max_Sharpe': 'K'}
+                   'Risk_Parity': 'J', 'Max_Sharpe': 'K', 'Max_Sharpe_MV': 'M', 'Risk_Parity_ERC': 'N',
+                   'HRP': 'O'}
     
-    for method_name in method_names:
+    for method_idx, method_name in enumerate(ALLOCATION_METHODS):
         w_col = weight_cols[method_name]
         
-        ws.cell(row=row, column=1, value=method_name)
-        ws.cell(row=row, column=1).font = Font(bold=True)
-        
-        # Portfolio Sharpe using weighted average formula with covariance
-        # S_p = SUMPRODUCT(w, Sharpe*Vol) / SQRT((1-ρ)*SUMPRODUCT(w², Vol²) + ρ*(SUMPRODUCT(w, Vol))²)
-        # Vol proxy = Capital/2 = Max_DD, so we use F column (Capital) / 2
-        # But simpler: weighted average of Sharpe ratios adjusted for diversification
-        # For Excel formula: use weighted average Sharpe
-        numerator = f"SUMPRODUCT({w_col}{start_data_row}:{w_col}{end_data_row}/100, C{start_data_row}:C{end_data_row})"
-        ws.cell(row=row, column=2, value=f"=ROUND({numerator}, 2)")
-        
-        # Portfolio XIRR = weighted average
-        ws.cell(row=row, column=3, value=f"=ROUND(SUMPRODUCT({w_col}{start_data_row}:{w_col}{end_data_row}/100, E{start_data_row}:E{end_data_row}), 2)")
-        
-        # Total Capital = always the same (sum of all strategy capital requirements)
-        ws.cell(row=row, column=4, value=f"=ROUND(F{total_row}, 2)")
-        
         # Expected Profit = Total_Capital × Weighted_Average_Return%
         # Where Weighted_Average_Return = SUMPRODUCT(weight/100, Return_%)
         # Column D = Return_% for each strategy = (Profit/Capital)*100
         # Formula: Total_Capital × Weighted_Return / 100
         weighted_return_formula = f"SUMPRODUCT({w_col}{start_data_row}:{w_col}{end_data_row}/100, D{start_data_row}:D{end_data_row})"
-        ws.cell(row=row, column=5, value=f"=ROUND(F{total_row} * {weighted_return_formula} / 100, 2)")
-        
-        # Overall Return = Weighted Average Return (same as what we used for Expected Profit)
-        ws.cell(row=row, column=6, value=f"=ROUND({weighted_return_formula}, 2)")
-        
-        # Rating based on Portfolio Sharpe
-        ws.cell(row=row, column=7, value=f'=IF(B{row}>=1.5,"★★★★★",IF(B{row}>=1,"★★★★",IF(B{row}>=0.5,"★★★",IF(B{row}>=0.25,"★★","★"))))')
         
+        write_row(ws, row, [
+            method_name,
+            # Portfolio Sharpe = √365 × (wᵀμ) / √(wᵀΣw) from daily strategy returns
+            round(float(method_scores['sharpe'][method_idx]), 2),
+            # Portfolio XIRR from the cash flows of every strategy at this method's weight
+            round(float(np.nan_to_num(method_xirr[method_name])), 2),
+            # Total Capital = always the same (sum of all strategy capital requirements)
+            f"=ROUND(F{total_row}, 2)",
+            f"=ROUND(F{total_row} * {weighted_return_formula} / 100, 2)",
+            # Overall Return = Weighted Average Return (same as what we used for Expected Profit)
+            f"=ROUND({weighted_return_formula}, 2)",
+            # Rating based on Portfolio Sharpe
+            f'=IF(B{row}>=1.5,"★★★★★",IF(B{row}>=1,"★★★★",IF(B{row}>=0.5,"★★★",IF(B{row}>=0.25,"★★","★"))))',
+        ], ['Table Cell Bold'] + ['Table Cell'] * 6)
         row += 1
     
-    perf_end_row = row - 1
-    add_border(ws, perf_start_row - 1, perf_end_row, 1, 7)
     row += 2
     
     # Best method recommendation
-    ws.cell(row=row, column=1, value="RECOMMENDATION:")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=12, color="C00000")
-    ws.cell(row=row, column=2, value="Select the allocation method with highest Portfolio Sharpe for risk-adjusted returns")
-    ws.merge_cells(start_row=row, start_column=2, end_row=row, end_column=7)
-    
-    # Column widths
-    for col in range(1, 13):
-        ws.column_dimensions[get_column_letter(col)].width = 16
-    ws.column_dimensions['A'].width = 22
+    write_row(ws, row, ["RECOMMENDATION:",
+                        "Select the allocation method with highest Portfolio Sharpe for risk-adjusted returns"],
+              ['Recommendation', None])
+    ws.merged_cells.add(f"B{row}:G{row}")
     
     return ws
 
 
 def create_sheet4_final_portfolio(wb, strategies_data):
     """Create Sheet 4: Final Portfolio Analysis with correct Sharpe formula and borders"""
-    ws = wb.create_sheet("Final_Portfolio_Analysis", 0)
+    add_styles(wb, TABLE_STYLES)
+    widths = {'A': 36, 'B': 18, 'C': 18}
+    widths.update({get_column_letter(col): 16 for col in range(4, 13)})
+    ws = new_sheet(wb, "Final_Portfolio_Analysis", widths=widths, index=0)
     row = 1
     
-    ws.cell(row=row, column=1, value="FINAL PORTFOLIO ANALYSIS")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=10)
-    ws.cell(row=row, column=1).font = Font(bold=True, size=18, color="FFFFFF")
-    ws.cell(row=row, column=1).fill = PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid")
-    ws.cell(row=row, column=1).alignment = Alignment(horizontal='center', vertical='center')
+    write_row(ws, row, ["FINAL PORTFOLIO ANALYSIS"], 'Banner Title', merge_to=10)
     row += 2
     
     # ALLOCATION CONFIGURATION section with border
-    config_start_row = row
-    ws.cell(row=row, column=1, value="ALLOCATION CONFIGURATION")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=3)
-    style_strategy_header(ws, row, 1, 3, "70AD47")
+    write_row(ws, row, ["ALLOCATION CONFIGURATION"], ['Boxed Header 70AD47'] * 3, merge_to=3)
     row += 1
     
-    ws.cell(row=row, column=1, value="Strategy Level Allocation:")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=11)
-    ws.cell(row=row, column=2, value=STRATEGY_ALLOCATION_METHOD)
-    ws.cell(row=row, column=2).font = Font(size=11, color="0066CC")
+    write_row(ws, row, ["Strategy Level Allocation:", STRATEGY_ALLOCATION_METHOD],
+              ['Boxed Label', 'Boxed Setting', 'Table Cell'])
     row += 1
     
-    ws.cell(row=row, column=1, value="Pair Level Methods:")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=11)
+    write_row(ws, row, ["Pair Level Methods:"], ['Boxed Label', 'Table Cell', 'Table Cell'])
     row += 1
     
     for strategy, method in STRATEGY_PAIR_METHODS.items():
         display_name = get_strategy_display_name(strategy)
-        ws.cell(row=row, column=1, value=f"  • {display_name}:")
-        ws.cell(row=row, column=2, value=method)
-        ws.cell(row=row, column=2).font = Font(color="0066CC")
+        write_row(ws, row, [f"  • {display_name}:", method], ['Table Cell', 'Boxed Method', 'Table Cell'])
         row += 1
     
-    add_border(ws, config_start_row, row - 1, 1, 3)
     row += 2
     
+    # Strategy and portfolio Sharpe from the empirical covariance of daily
+    # returns, with each strategy's pairs at their selected method's weights
+    active_data = {name: df for name, df in strategies_data.items() if len(df) > 0}
+    capital_returns = build_capital_returns(active_data)
+    selected_pair_weights = {
+        name: get_pair_weights(df, STRATEGY_PAIR_METHODS.get(name, 'Equal_Weight'),
+                               strategy_pair_returns(capital_returns, name))
+        for name, df in active_data.items()
+    }
+    strategy_returns = strategy_capital_returns(capital_returns, active_data, selected_pair_weights)
+    mu, cov = estimate_return_moments(strategy_returns)
+    strategy_sharpes = evaluate_portfolios(np.eye(len(active_data)), mu, cov)['sharpe']
+    portfolio_sharpe = calculate_portfolio_sharpe(np.ones(len(active_data)), mu, cov)
+    
+    # The final portfolio (Sections 2 and 3) holds every strategy at an equal
+    # share of the total capital: its Sharpe, XIRR and drawdowns all use it
+    full_capital = {name: 1.0 for name in active_data}
+    portfolio_capital = sum(df['Correct_Initial_Balance'].sum() for df in active_data.values())
+    equal_share = {
+        name: portfolio_capital / len(active_data) / df['Correct_Initial_Balance'].sum()
+        if df['Correct_Initial_Balance'].sum() > 0 else 0
+        for name, df in active_data.items()
+    }
+    
+    # Drawdowns from merged closed-trade equity curves (pairs at their
+    # selected weights): every strategy at its full capital for the Section 1
+    # totals, equal strategy shares for the final portfolio
+    full_capital_dd = equity_drawdown_stats(
+        weighted_trade_events(active_data, full_capital, selected_pair_weights), portfolio_capital)
+    portfolio_dd = equity_drawdown_stats(
+        weighted_trade_events(active_data, equal_share, selected_pair_weights), portfolio_capital)
+    
+    # XIRR from dated cash flows: each strategy with its pairs at the selected
+    # weights, and the portfolio at the equal strategy weights of Section 2
+    strategy_xirrs = np.nan_to_num(solve_xirr([
+        weighted_cash_flows({name: df}, full_capital, selected_pair_weights)
+        for name, df in active_data.items()
+    ])) * 100
+    portfolio_xirr = float(np.nan_to_num(solve_xirr([
+        weighted_cash_flows(active_data, equal_share, selected_pair_weights)])[0])) * 100
+    
     # Calculate strategy results
     strategy_results = []
-    for strategy_name, df in strategies_data.items():
-        if len(df) == 0:
-            continue
-        
+    for strategy_idx, (strategy_name, df) in enumerate(active_data.items()):
         pair_method = STRATEGY_PAIR_METHODS.get(strategy_name, 'Equal_Weight')
-        pair_weights = get_pair_weights(df, pair_method)
+        pair_weights = selected_pair_weights[strategy_name]
         
         total_capital = df['Correct_Initial_Balance'].sum()
         total_profit = df['Total_Profit'].sum()
-        max_dd = df['Max_Drawdown'].sum()
+        strategy_dd = equity_drawdown_stats(
+            weighted_trade_events({strategy_name: df}, full_capital, selected_pair_weights), total_capital)
         avg_trading_years = df['Trading_Years'].mean()
         
-        # Calculate weighted average Sharpe (MT5 standard)
-        # Portfolio Sharpe = weighted average of individual Sharpe ratios
-        strategy_sharpe = np.sum((pair_weights / 100) * df['Sharpe_Ratio'].values)
-        strategy_xirr = calculate_portfolio_xirr(pair_weights, df['Correct_XIRR'].values)
+        strategy_sharpe = strategy_sharpes[strategy_idx]
+        strategy_xirr = strategy_xirrs[strategy_idx]
         
         display_name = get_strategy_display_name(strategy_name)
         strategy_results.append({
@@ -1161,7 +2825,9 @@ def create_sheet4_final_portfolio(wb, strategies_data):
             'Strategy_XIRR': strategy_xirr,
             'Total_Capital': total_capital,
             'Total_Profit': total_profit,
-            'Max_Drawdown': max_dd,
+            'Max_Drawdown': strategy_dd['max_drawdown'],
+            'Underwater_Days': strategy_dd['max_underwater_days'],
+            'Sum_Pair_Drawdowns': df['Max_Drawdown'].sum(),
             'Avg_Trading_Years': avg_trading_years
         })
     
@@ -1169,335 +2835,500 @@ def create_sheet4_final_portfolio(wb, strategies_data):
     n_strategies = len(strategy_df)
     
     # SECTION 1: Strategy-Level Performance
-    ws.cell(row=row, column=1, value="SECTION 1: STRATEGY-LEVEL PERFORMANCE")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=11)
-    style_strategy_header(ws, row, 1, 11, "4472C4")
+    write_row(ws, row, ["SECTION 1: STRATEGY-LEVEL PERFORMANCE"], ['Strategy Header 4472C4'] * 12, merge_to=12)
     row += 1
     
     headers = ['Strategy', 'Pair_Method', 'Pairs', 'Sharpe', 'XIRR_%', 'Simple_Return_%', 'Return_%', 
-               'Capital', 'Profit', 'Max_DD', 'Years']
-    for col_idx, header in enumerate(headers, 1):
-        ws.cell(row=row, column=col_idx, value=header)
-    style_subheader(ws, row, 1, len(headers))
+               'Capital', 'Profit', 'Merged_Max_DD', 'Years', 'Underwater_Days']
+    write_row(ws, row, headers, 'Table Header')
     row += 1
     
     start_data_row = row
     
     for idx, strat in strategy_df.iterrows():
-        ws.cell(row=row, column=1, value=strat['Strategy'])
-        ws.cell(row=row, column=2, value=strat['Pair_Method'])
-        ws.cell(row=row, column=3, value=int(strat['Num_Pairs']))
-        ws.cell(row=row, column=4, value=round(strat['Strategy_Sharpe'], 2))
-        ws.cell(row=row, column=5, value=round(strat['Strategy_XIRR'], 2))
-        # Simple Return % = (Profit / Capital / Years) * 100
-        ws.cell(row=row, column=6, value=f"=ROUND(IF(H{row}>0, (I{row}/H{row}/K{row})*100, 0), 2)")
-        # Return % = (Profit / Capital) * 100 (total return, not annualized)
-        ws.cell(row=row, column=7, value=f"=ROUND(IF(H{row}>0, (I{row}/H{row})*100, 0), 2)")
-        ws.cell(row=row, column=8, value=round(strat['Total_Capital'], 2))
-        ws.cell(row=row, column=9, value=round(strat['Total_Profit'], 2))
-        ws.cell(row=row, column=10, value=round(strat['Max_Drawdown'], 2))
-        ws.cell(row=row, column=11, value=round(strat['Avg_Trading_Years'], 2))
+        write_row(ws, row, [
+            strat['Strategy'],
+            strat['Pair_Method'],
+            int(strat['Num_Pairs']),
+            round(strat['Strategy_Sharpe'], 2),
+            round(strat['Strategy_XIRR'], 2),
+            # Simple Return % = (Profit / Capital / Years) * 100
+            f"=ROUND(IF(H{row}>0, (I{row}/H{row}/K{row})*100, 0), 2)",
+            # Return % = (Profit / Capital) * 100 (total return, not annualized)
+            f"=ROUND(IF(H{row}>0, (I{row}/H{row})*100, 0), 2)",
+            round(strat['Total_Capital'], 2),
+            round(strat['Total_Profit'], 2),
+            round(strat['Max_Drawdown'], 2),
+            round(strat['Avg_Trading_Years'], 2),
+            round(strat['Underwater_Days'], 1),
+        ], 'Table Cell')
         row += 1
     
     end_data_row = row - 1
     
     # TOTAL row
-    ws.cell(row=row, column=1, value="TOTAL")
-    ws.cell(row=row, column=3, value=f"=SUM(C{start_data_row}:C{end_data_row})")
-    ws.cell(row=row, column=8, value=f"=ROUND(SUM(H{start_data_row}:H{end_data_row}), 2)")
-    ws.cell(row=row, column=9, value=f"=ROUND(SUM(I{start_data_row}:I{end_data_row}), 2)")
-    ws.cell(row=row, column=10, value=f"=ROUND(SUM(J{start_data_row}:J{end_data_row}), 2)")
-    style_result_row(ws, row, 1, 11, "FFF2CC")
+    write_row(ws, row, [
+        "TOTAL", None,
+        f"=SUM(C{start_data_row}:C{end_data_row})",
+        None, None, None, None,
+        f"=ROUND(SUM(H{start_data_row}:H{end_data_row}), 2)",
+        f"=ROUND(SUM(I{start_data_row}:I{end_data_row}), 2)",
+        # Merged drawdown of all strategies at full capital (strategies lose at
+        # different times, so no SUM)
+        round(full_capital_dd['max_drawdown'], 2),
+        None,
+        round(full_capital_dd['max_underwater_days'], 1),
+    ], 'Table Total FFF2CC')
     total_row_section1 = row
-    
-    add_border(ws, start_data_row - 1, row, 1, 11)
     row += 3
     
     # SECTION 2: Final Portfolio Allocation
-    ws.cell(row=row, column=1, value="SECTION 2: FINAL PORTFOLIO ALLOCATION")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=8)
-    style_strategy_header(ws, row, 1, 8, "ED7D31")
+    write_row(ws, row, ["SECTION 2: FINAL PORTFOLIO ALLOCATION"], ['Strategy Header ED7D31'] * 8, merge_to=8)
     row += 1
     
     headers = ['Strategy', 'Weight_%', 'Allocated_Capital', 'Min_Required', 
                'Expected_Return_%', 'Expected_Profit', 'Sharpe', 'XIRR_%']
-    for col_idx, header in enumerate(headers, 1):
-        ws.cell(row=row, column=col_idx, value=header)
-    style_subheader(ws, row, 1, len(headers))
+    write_row(ws, row, headers, 'Table Header')
     row += 1
     
     start_alloc_row = row
     
     for idx, strat in strategy_df.iterrows():
         data_row_ref = start_data_row + idx
-        ws.cell(row=row, column=1, value=strat['Strategy'])
-        ws.cell(row=row, column=2, value=f"=ROUND(100/{n_strategies}, 2)")
-        ws.cell(row=row, column=3, value=f"=ROUND((B{row}/100)*$H${total_row_section1}, 2)")
-        ws.cell(row=row, column=4, value=f"=ROUND(H{data_row_ref}, 2)")
-        # Expected_Return_% uses Simple Return % (annualized) from Section 1, column 6
-        ws.cell(row=row, column=5, value=f"=ROUND(F{data_row_ref}, 2)")
-        ws.cell(row=row, column=6, value=f"=ROUND(C{row}*(E{row}/100), 2)")
-        ws.cell(row=row, column=7, value=f"=ROUND(D{data_row_ref}, 2)")
-        ws.cell(row=row, column=8, value=f"=ROUND(E{data_row_ref}, 2)")
+        write_row(ws, row, [
+            strat['Strategy'],
+            f"=ROUND(100/{n_strategies}, 2)",
+            f"=ROUND((B{row}/100)*$H${total_row_section1}, 2)",
+            f"=ROUND(H{data_row_ref}, 2)",
+            # Expected_Return_% uses Simple Return % (annualized) from Section 1, column 6
+            f"=ROUND(F{data_row_ref}, 2)",
+            f"=ROUND(C{row}*(E{row}/100), 2)",
+            f"=ROUND(D{data_row_ref}, 2)",
+            f"=ROUND(E{data_row_ref}, 2)",
+        ], 'Table Cell')
         row += 1
     
     end_alloc_row = row - 1
     
     # TOTAL row
-    ws.cell(row=row, column=1, value="TOTAL")
-    ws.cell(row=row, column=2, value=f"=ROUND(SUM(B{start_alloc_row}:B{end_alloc_row}), 2)")
-    ws.cell(row=row, column=3, value=f"=ROUND(SUM(C{start_alloc_row}:C{end_alloc_row}), 2)")
-    ws.cell(row=row, column=4, value=f"=ROUND(SUM(D{start_alloc_row}:D{end_alloc_row}), 2)")
-    ws.cell(row=row, column=6, value=f"=ROUND(SUM(F{start_alloc_row}:F{end_alloc_row}), 2)")
-    style_result_row(ws, row, 1, 8, "FFF2CC")
+    write_row(ws, row, [
+        "TOTAL",
+        f"=ROUND(SUM(B{start_alloc_row}:B{end_alloc_row}), 2)",
+        f"=ROUND(SUM(C{start_alloc_row}:C{end_alloc_row}), 2)",
+        f"=ROUND(SUM(D{start_alloc_row}:D{end_alloc_row}), 2)",
+        None,
+        f"=ROUND(SUM(F{start_alloc_row}:F{end_alloc_row}), 2)",
+        None, None,
+    ], 'Table Total FFF2CC')
     total_alloc_row = row
-    
-    add_border(ws, start_alloc_row - 1, row, 1, 8)
     row += 3
     
     # SECTION 3: Final Portfolio Performance
-    ws.cell(row=row, column=1, value="SECTION 3: FINAL PORTFOLIO PERFORMANCE")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=3)
-    style_strategy_header(ws, row, 1, 3, "70AD47")
+    write_row(ws, row, ["SECTION 3: FINAL PORTFOLIO PERFORMANCE"], ['Strategy Header 70AD47'] * 3, merge_to=3)
+    row += 1
+    
+    def performance_row(label, value, unit=None, styles=('Boxed Label', 'Table Cell', 'Table Cell')):
+        nonlocal row
+        write_row(ws, row, [label, value, unit], list(styles))
+        row += 1
+    
+    performance_row("Total Trading Pairs", f"=C{total_row_section1}")
+    performance_row("Total Capital Required (MDD×2)", f"=ROUND(H{total_row_section1}, 2)", "$")
+    
+    # Portfolio Maximum Drawdown - merged equity curve of all strategies at
+    # the equal strategy weights of Section 2 (as the Sharpe and XIRR below)
+    performance_row("Portfolio Max Drawdown (merged)", round(portfolio_dd['max_drawdown'], 2), "$")
+    performance_row("Portfolio Maximum Drawdown %", round(portfolio_dd['max_drawdown_pct'], 2), "%")
+    performance_row("Max Drawdown Period",
+                    f"{portfolio_dd['peak_date']:%Y-%m-%d} → {portfolio_dd['trough_date']:%Y-%m-%d}"
+                    if pd.notna(portfolio_dd['trough_date']) else None)
+    if portfolio_dd['recovery_days'] is not None:
+        performance_row("Recovery Time", round(portfolio_dd['recovery_days'], 1), "days")
+    else:
+        performance_row("Recovery Time", "Not recovered")
+    performance_row("Longest Time Under Water", round(portfolio_dd['max_underwater_days'], 1), "days")
+    performance_row("Time Under Water", round(portfolio_dd['underwater_pct'], 2), "%")
+    performance_row("Sum of Pair Report Drawdowns", round(float(strategy_df['Sum_Pair_Drawdowns'].sum()), 2), "$",
+                    styles=('Boxed Aside', 'Table Cell', 'Table Cell'))
+    
+    # Portfolio Sharpe Ratio - empirical covariance of strategy returns
+    # (equal strategy weights, as in Section 2)
+    performance_row("Portfolio Sharpe Ratio", round(portfolio_sharpe, 2), "★",
+                    styles=('Boxed Label', 'Boxed Sharpe', 'Boxed Star'))
+    performance_row("Portfolio XIRR", round(portfolio_xirr, 2), "%")
+    
+    # Portfolio Simple Return %: weighted average of Simple Return % from Section 1
+    performance_row("Portfolio Simple Return %",
+                    f"=ROUND(SUMPRODUCT(B{start_alloc_row}:B{end_alloc_row}/100, F{start_data_row}:F{end_data_row}), 2)",
+                    "%")
+    
+    # Expected Total Profit
+    # Each strategy's profit scaled to its Section 2 allocated capital
+    allocated_profit = (f"SUMPRODUCT(C{start_alloc_row}:C{end_alloc_row}/H{start_data_row}:H{end_data_row}, "
+                        f"I{start_data_row}:I{end_data_row})")
+    performance_row("Expected Total Profit", f"=ROUND({allocated_profit}, 2)", "$")
+    
+    # Overall Return on Capital
+    performance_row("Overall Return on Capital",
+                    f"=ROUND(IF(C{total_alloc_row}>0, ({allocated_profit}/C{total_alloc_row})*100, 0), 2)", "%")
+    row += 1
+    
+    # Formula explanation
+    write_row(ws, row, ["SHARPE RATIO FORMULA:"], 'Formula Title')
+    for line in ["Portfolio Sharpe = √365 × (wᵀμ) / √(wᵀΣw)",
+                 "Where μ, Σ = mean and covariance of daily strategy returns on capital (MDD×2)",
+                 "Merged_Max_DD / time under water: all closed trades on one timeline (pairs at selected weights);",
+                 "report drawdowns also include floating losses and are summed without diversification",
+                 "Section 3 figures describe the Section 2 book: every strategy at an equal share of the total capital"]:
+        row += 1
+        write_row(ws, row, [line], 'Grey Note')
+    
+    return ws
+
+
+def create_monte_carlo_sheet(wb, strategies_data, n_paths=None):
+    """Create Monte Carlo sheet: bootstrapped drawdown distributions per pair, strategy and portfolio"""
+    n_paths = MONTE_CARLO_PATHS if n_paths is None else n_paths
+    add_styles(wb, TABLE_STYLES)
+    widths = {get_column_letter(col): 14 for col in range(1, 16)}
+    widths.update({'B': 20, 'C': 28})
+    ws = new_sheet(wb, "Monte_Carlo_Drawdowns", widths=widths)
+    row = 1
+    
+    write_row(ws, row, ["MONTE CARLO TRADE BOOTSTRAP: DRAWDOWN DISTRIBUTIONS"], 'Sheet Title', merge_to=15)
     row += 1
     
-    perf_start_row = row
+    resampling = (f"blocks of {MONTE_CARLO_BLOCK_SIZE} consecutive trades"
+                  if MONTE_CARLO_BLOCK_SIZE and MONTE_CARLO_BLOCK_SIZE > 1 else "iid trades")
+    write_row(ws, row, [f"Up to {n_paths:,} paths per row, resampling {resampling}, drawn in batches of "
+                        f"{MONTE_CARLO_BATCH_PATHS:,} until the 95% CI of DD_P99 is within "
+                        f"±{MONTE_CARLO_DD_TOLERANCE:.0%} (DD_P99_±) and of the ruin probability within "
+                        f"±{MONTE_CARLO_RUIN_TOLERANCE * 100:.1f} pts; "
+                        f"ruin = losing {MONTE_CARLO_RUIN_FRACTION:.0%} of capital; "
+                        f"Capital_@{MONTE_CARLO_CONFIDENCE:.0%} = drawdown at that confidence × 2"],
+              'Grey Note', merge_to=15)
+    row += 2
+    
+    active_data = {name: df for name, df in strategies_data.items() if len(df) > 0}
+    capital_returns = build_capital_returns(active_data)
+    pair_weights = {
+        name: get_pair_weights(df, STRATEGY_PAIR_METHODS.get(name, 'Equal_Weight'),
+                               strategy_pair_returns(capital_returns, name))
+        for name, df in active_data.items()
+    }
+    results = run_monte_carlo(active_data, pair_weights, n_paths)
+    
+    headers = ['Level', 'Strategy', 'Pair / Method', 'Trades', 'Paths', 'Capital', 'Hist_Trade_DD',
+               'DD_P50', 'DD_P95', 'DD_P99', 'DD_P99_±', 'Terminal_P5', 'Terminal_P50', 'Ruin_Prob_%',
+               f"Capital_@{MONTE_CARLO_CONFIDENCE:.0%}"]
+    write_row(ws, row, headers, 'Table Header')
+    row += 1
+    
+    level_styles = {'Strategy': 'Table Total D9E1F2', 'Portfolio': 'Table Total E2EFDA'}
+    for result in results:
+        write_row(ws, row, [
+            result['Level'], result['Strategy'], result['Pair'], result['Trades'], result['Paths'],
+            round(result['Capital'], 2), round(result['Hist_DD'], 2),
+            round(result['DD_P50'], 2), round(result['DD_P95'], 2), round(result['DD_P99'], 2),
+            round(result['DD_P99_CI'], 2), round(result['Terminal_P5'], 2),
+            round(result['Terminal_P50'], 2), round(result['Ruin_Prob'] * 100, 2),
+            round(result['Capital_At_Conf'], 2),
+        ], level_styles.get(result['Level'], 'Table Cell'))
+        row += 1
+    
+    return ws
+
+
+def create_walk_forward_sheet(wb, strategies_data):
+    """Create Walk-Forward sheet: out-of-sample performance of every allocation method"""
+    active_data = {name: df for name, df in strategies_data.items() if len(df) > 0}
+    wf = aggregate_result('walk_forward', tuple(active_data), lambda: run_walk_forward(active_data),
+                          (active_data, build_capital_returns(active_data)))
+    methods = list(wf['portfolio_oos'])
+    n_cols = max(len(methods) + 2, 8)
+    
+    add_styles(wb, TABLE_STYLES)
+    widths = {get_column_letter(col): 17 for col in range(2, n_cols + 1)}
+    widths['A'] = 22
+    ws = new_sheet(wb, "Walk_Forward_Backtest", widths=widths)
+    row = 1
     
-    # Total Trading Pairs
-    ws.cell(row=row, column=1, value="Total Trading Pairs")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=11)
-    ws.cell(row=row, column=2, value=f"=C{total_row_section1}")
+    write_row(ws, row, ["WALK-FORWARD ALLOCATION BACKTEST (OUT-OF-SAMPLE)"], 'Sheet Title', merge_to=n_cols)
     row += 1
     
-    # Total Capital Required
-    ws.cell(row=row, column=1, value="Total Capital Required (MDD×2)")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=11)
-    ws.cell(row=row, column=2, value=f"=ROUND(H{total_row_section1}, 2)")
-    ws.cell(row=row, column=3, value="$")
+    period = (f"{pd.Timestamp(wf['dates'][0]):%Y-%m-%d} to {pd.Timestamp(wf['dates'][-1]):%Y-%m-%d}"
+              if len(wf['dates']) else "no out-of-sample days")
+    write_row(ws, row, [f"Weights refitted every {WALK_FORWARD_STEP_DAYS} days on the previous "
+                        f"{WALK_FORWARD_TRAIN_DAYS} days of capital returns; OOS period {period}; "
+                        f"each strategy runs at its full capital"], 'Grey Note', merge_to=n_cols)
+    row += 2
+    
+    # Section 1: portfolio per method
+    write_row(ws, row, ["SECTION 1: PORTFOLIO OUT-OF-SAMPLE PERFORMANCE (% OF CAPITAL)"], 'Section Title')
     row += 1
     
-    # Total Maximum Drawdown
-    ws.cell(row=row, column=1, value="Total Maximum Drawdown")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=11)
-    ws.cell(row=row, column=2, value=f"=ROUND(J{total_row_section1}, 2)")
-    ws.cell(row=row, column=3, value="$")
+    headers = ['Method', 'OOS_Return_%', 'OOS_Annual_%', 'OOS_Volatility_%', 'OOS_Sharpe',
+               'OOS_Max_DD_%', 'In_Sample_Sharpe', 'Sharpe_Decay']
+    write_row(ws, row, headers, 'Table Header')
     row += 1
     
-    # Portfolio Sharpe Ratio - Using CORRECT weighted average formula
-    # Portfolio Sharpe = Σ(weight_i × Sharpe_i) for MT5 standard
-    ws.cell(row=row, column=1, value="Portfolio Sharpe Ratio")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=11)
-    sharpe_formula = f"=ROUND(SUMPRODUCT(B{start_alloc_row}:B{end_alloc_row}/100, G{start_alloc_row}:G{end_alloc_row}), 2)"
-    ws.cell(row=row, column=2, value=sharpe_formula)
-    ws.cell(row=row, column=2).font = Font(bold=True, size=12, color="006600")
-    ws.cell(row=row, column=3, value="★")
-    ws.cell(row=row, column=3).font = Font(size=14, color="FFD700")
+    best_method = max(methods, key=lambda m: performance_summary(wf['portfolio_oos'][m])['sharpe'])
+    for method in methods:
+        oos = performance_summary(wf['portfolio_oos'][method])
+        in_sample = performance_summary(wf['in_sample'][method])
+        write_row(ws, row, [method, round(oos['total_return'], 2), round(oos['annual_return'], 2),
+                            round(oos['volatility'], 2), round(oos['sharpe'], 2), round(oos['max_drawdown'], 2),
+                            round(in_sample['sharpe'], 2), round(in_sample['sharpe'] - oos['sharpe'], 2)],
+                  'Table Total E2EFDA' if method == best_method else 'Table Cell')
+        row += 1
+    write_row(ws, row, ["In_Sample_Sharpe applies full-history weights to the same OOS days; "
+                        "Sharpe_Decay = In_Sample_Sharpe - OOS_Sharpe"], 'Small Note')
+    row += 2
+    
+    # Section 2: OOS Sharpe per strategy and method
+    write_row(ws, row, ["SECTION 2: OUT-OF-SAMPLE SHARPE BY STRATEGY"], 'Section Title')
     row += 1
     
-    # Portfolio XIRR
-    ws.cell(row=row, column=1, value="Portfolio XIRR")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=11)
-    ws.cell(row=row, column=2, value=f"=ROUND(SUMPRODUCT(B{start_alloc_row}:B{end_alloc_row}/100, H{start_alloc_row}:H{end_alloc_row}), 2)")
-    ws.cell(row=row, column=3, value="%")
+    write_row(ws, row, ['Strategy'] + methods + ['Selected'], 'Table Header')
     row += 1
     
-    # Portfolio Simple Return %
-    ws.cell(row=row, column=1, value="Portfolio Simple Return %")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=11)
-    # Weighted average of Simple Return % from Section 1
-    ws.cell(row=row, column=2, value=f"=ROUND(SUMPRODUCT(B{start_alloc_row}:B{end_alloc_row}/100, F{start_data_row}:F{end_data_row}), 2)")
-    ws.cell(row=row, column=3, value="%")
+    for strategy_name, strategy_oos in wf['strategy_oos'].items():
+        selected = STRATEGY_PAIR_METHODS.get(strategy_name, 'Equal_Weight')
+        write_row(ws, row, [get_strategy_display_name(strategy_name)] +
+                  [round(performance_summary(strategy_oos[method])['sharpe'], 2) for method in methods] + [selected],
+                  ['Table Cell'] + ['Table Cell Bold' if method == selected else 'Table Cell' for method in methods] +
+                  ['Table Cell'])
+        row += 1
+    row += 2
+    
+    # Section 3: month-end OOS equity per method
+    write_row(ws, row, ["SECTION 3: PORTFOLIO OUT-OF-SAMPLE EQUITY (CUMULATIVE % OF CAPITAL, MONTH END)"],
+              'Section Title')
     row += 1
     
-    # Expected Total Profit
-    ws.cell(row=row, column=1, value="Expected Total Profit")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=11)
-    ws.cell(row=row, column=2, value=f"=ROUND(I{total_row_section1}, 2)")
-    ws.cell(row=row, column=3, value="$")
+    write_row(ws, row, ['Month'] + methods, 'Table Header')
     row += 1
     
-    # Overall Return on Capital
-    ws.cell(row=row, column=1, value="Overall Return on Capital")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=11)
-    ws.cell(row=row, column=2, value=f"=ROUND(IF(H{total_row_section1}>0, (I{total_row_section1}/H{total_row_section1})*100, 0), 2)")
-    ws.cell(row=row, column=3, value="%")
+    equity = pd.DataFrame({method: np.cumsum(wf['portfolio_oos'][method]) * 100 for method in methods},
+                          index=pd.DatetimeIndex(wf['dates']))
+    month_end = equity.groupby(equity.index.to_period('M')).last()
+    for period, values in month_end.iterrows():
+        write_row(ws, row, [str(period)] + [round(values[method], 2) for method in methods], 'Table Cell')
+        row += 1
     
-    add_border(ws, perf_start_row, row, 1, 3)
+    return ws
+
+
+def create_efficient_frontier_sheet(wb, strategies_data):
+    """Create Efficient Frontier sheet: strategy weight simplex sweep and each method's distance from it"""
+    active_data = {name: df for name, df in strategies_data.items() if len(df) > 0}
+    fr = aggregate_result('efficient_frontier', tuple(active_data), lambda: run_efficient_frontier(active_data),
+                          (active_data, build_capital_returns(active_data)))
+    display_names = [get_strategy_display_name(name) for name in fr['strategies']]
+    n_grid = len(fr['weights']) - len(fr['methods'])
+    n_cols = max(len(display_names) + 4, 10)
+    
+    add_styles(wb, TABLE_STYLES)
+    widths = {get_column_letter(col): 17 for col in range(2, n_cols + 1)}
+    widths['A'] = 24
+    ws = new_sheet(wb, "Efficient_Frontier", widths=widths)
+    row = 1
+    
+    write_row(ws, row, ["EFFICIENT FRONTIER: STRATEGY WEIGHT SWEEP"], 'Sheet Title', merge_to=n_cols)
+    row += 1
+    
+    write_row(ws, row, [f"{n_grid:,} strategy weightings in steps of {100 / fr['steps']:.2f}% plus the "
+                        f"{len(fr['methods'])} allocation methods; daily strategy returns on required "
+                        f"capital; Max_DD_% = worst drawdown of the daily portfolio equity"], 'Grey Note', merge_to=n_cols)
     row += 2
     
-    # Formula explanation
-    ws.cell(row=row, column=1, value="SHARPE RATIO FORMULA:")
-    ws.cell(row=row, column=1).font = Font(bold=True, size=10, color="1F4E79")
+    volatility, drawdown = fr['volatility'], fr['max_drawdown']
+    vol_frontier, dd_frontier = fr['vol_frontier'], fr['dd_frontier']
+    
+    # Section 1: where each method sits
+    write_row(ws, row, ["SECTION 1: ALLOCATION METHODS VS THE FRONTIER"], 'Section Title')
     row += 1
-    ws.cell(row=row, column=1, value="Portfolio Sharpe = Σ(Weight_i × Sharpe_i)")
-    ws.cell(row=row, column=1).font = Font(italic=True, size=10, color="666666")
+    
+    headers = ['Method', 'Return_%', 'Volatility_%', 'Sharpe', 'Max_DD_%',
+               'Frontier_Return_@Vol_%', 'Return_Gap_Vol_%', 'Frontier_Return_@DD_%', 'Return_Gap_DD_%',
+               'Sharpe_Percentile']
+    write_row(ws, row, headers, 'Table Header')
     row += 1
-    ws.cell(row=row, column=1, value="Where Sharpe_i = (Mean Profit / Std Dev) × √(Trades per Year)")
-    ws.cell(row=row, column=1).font = Font(italic=True, size=10, color="666666")
     
-    # Column widths
-    ws.column_dimensions['A'].width = 30
-    ws.column_dimensions['B'].width = 18
-    ws.column_dimensions['C'].width = 18
-    for col in range(4, 12):
-        ws.column_dimensions[get_column_letter(col)].width = 16
+    grid_sharpe = np.sort(fr['sharpe'][:n_grid])
+    for method, k in fr['methods'].items():
+        at_vol = frontier_reward_at(volatility[vol_frontier], fr['return'][vol_frontier], volatility[k])
+        at_dd = frontier_reward_at(drawdown[dd_frontier], fr['return'][dd_frontier], drawdown[k])
+        percentile = np.searchsorted(grid_sharpe, fr['sharpe'][k], side='right') / max(n_grid, 1) * 100
+        write_row(ws, row, [method, round(fr['return'][k] * 100, 2), round(volatility[k] * 100, 2),
+                            round(fr['sharpe'][k], 2), round(drawdown[k] * 100, 2),
+                            round(float(at_vol) * 100, 2), round(float(at_vol - fr['return'][k]) * 100, 2),
+                            round(float(at_dd) * 100, 2), round(float(at_dd - fr['return'][k]) * 100, 2),
+                            round(percentile, 1)],
+                  'Table Total FFF2CC' if method == STRATEGY_ALLOCATION_METHOD else 'Table Cell')
+        row += 1
+    write_row(ws, row, [f"Return gaps: frontier return at the same volatility / drawdown minus the "
+                        f"method's return; highlighted = STRATEGY_ALLOCATION_METHOD "
+                        f"({STRATEGY_ALLOCATION_METHOD})"], 'Small Note')
+    row += 3
+    
+    def write_portfolios(title, rows):
+        nonlocal row
+        write_row(ws, row, [title], 'Section Title')
+        row += 1
+        write_row(ws, row, ['Portfolio', 'Return_%', 'Volatility_%', 'Sharpe', 'Max_DD_%'] +
+                  [f"{name}_%" for name in display_names], 'Table Header')
+        row += 1
+        for label, k in rows:
+            write_row(ws, row, [label, round(fr['return'][k] * 100, 2), round(volatility[k] * 100, 2),
+                                round(fr['sharpe'][k], 2), round(drawdown[k] * 100, 2)] +
+                      [round(w * 100, 2) for w in fr['weights'][k]], 'Table Cell')
+            row += 1
+        row += 3
+    
+    # Section 2: notable grid portfolios
+    calmar = np.divide(fr['return'][:n_grid], drawdown[:n_grid],
+                       out=np.zeros(n_grid), where=drawdown[:n_grid] > 0)
+    write_portfolios("SECTION 2: BEST GRID PORTFOLIOS", [
+        ('Max Sharpe', int(np.argmax(fr['sharpe'][:n_grid]))),
+        ('Min Volatility', int(np.argmin(volatility[:n_grid]))),
+        ('Min Drawdown', int(np.argmin(drawdown[:n_grid]))),
+        ('Max Return / Drawdown', int(np.argmax(calmar))),
+        ('Max Return', int(np.argmax(fr['return'][:n_grid]))),
+    ])
+    
+    # Sections 3-4: the frontiers, thinned evenly to FRONTIER_REPORT_POINTS rows
+    def thin(indices):
+        keep = np.unique(np.linspace(0, len(indices) - 1, min(len(indices), FRONTIER_REPORT_POINTS)).round())
+        return indices[keep.astype(int)]
+    
+    write_portfolios(f"SECTION 3: RETURN / VOLATILITY FRONTIER ({len(vol_frontier)} points)",
+                     [(f"Vol {volatility[k] * 100:.2f}%", k) for k in thin(vol_frontier)])
+    write_portfolios(f"SECTION 4: RETURN / DRAWDOWN FRONTIER ({len(dd_frontier)} points)",
+                     [(f"DD {drawdown[k] * 100:.2f}%", k) for k in thin(dd_frontier)])
     
     return ws
 
 
+
 # ============================================================================
 # SHEET CREATION FUNCTIONS - CORRELATION ANALYSIS
 # ============================================================================
 
 def create_within_strategy_correlation_sheet(wb):
     """Create sheet showing correlation within each strategy"""
-    ws = wb.create_sheet("Within_Strategy_Correlations")
+    add_styles(wb, TABLE_STYLES)
+    widths = {get_column_letter(col): 14 for col in range(1, 15)}
+    widths['A'] = 25
+    ws = new_sheet(wb, "Within_Strategy_Correlations", widths=widths)
     row = 1
     
-    ws.cell(row=row, column=1, value="CORRELATION ANALYSIS: PAIRS WITHIN EACH STRATEGY")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=10)
-    ws.cell(row=row, column=1).font = Font(bold=True, size=16, color="1F4E79")
-    ws.cell(row=row, column=1).alignment = Alignment(horizontal='center')
+    write_row(ws, row, ["CORRELATION ANALYSIS: PAIRS WITHIN EACH STRATEGY"], 'Sheet Title', merge_to=10)
     row += 2
     
-    for idx, (strategy_name, paths) in enumerate(STRATEGY_EQUITY_PATHS.items()):
+    matrix = build_returns_matrix()
+    
+    for idx, strategy_name in enumerate(STRATEGY_EQUITY_PATHS):
         print(f"  Loading {strategy_name}...")
-        returns, pair_names = load_strategy_equity_data(strategy_name, paths)
+        returns, pair_names = strategy_returns_block(matrix, strategy_name)
         
         if returns is None or len(pair_names) < 2:
             continue
         
-        corr_matrix = returns.corr()
+        corr_matrix = correlation_matrix(returns)
+        if CORRELATION_CLUSTER_ORDER:
+            order = cluster_order(corr_matrix)
+            corr_matrix = corr_matrix[np.ix_(order, order)]
+            pair_names = [pair_names[i] for i in order]
         
         display_name = get_strategy_display_name(strategy_name)
-        ws.cell(row=row, column=1, value=f"STRATEGY: {display_name}")
-        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=len(pair_names)+1)
-        style_strategy_header(ws, row, 1, len(pair_names)+1, STRATEGY_COLORS[idx % len(STRATEGY_COLORS)])
+        header_style = f"Strategy Header {STRATEGY_COLORS[idx % len(STRATEGY_COLORS)]}"
+        write_row(ws, row, [f"STRATEGY: {display_name}"], [header_style] * (len(pair_names) + 1),
+                  merge_to=len(pair_names) + 1)
         row += 1
         
-        ws.cell(row=row, column=1, value="Pair")
-        for col_idx, pair in enumerate(pair_names, 2):
-            ws.cell(row=row, column=col_idx, value=pair)
-        style_header(ws, row, 1, len(pair_names)+1)
+        write_row(ws, row, ["Pair"] + pair_names, 'Matrix Header')
         row += 1
         
         start_data_row = row
         
         for i, pair in enumerate(pair_names):
-            ws.cell(row=row, column=1, value=pair)
-            ws.cell(row=row, column=1).font = Font(bold=True)
-            
-            for j, _ in enumerate(pair_names):
-                corr_val = corr_matrix.iloc[i, j]
-                cell = ws.cell(row=row, column=j+2, value=round(corr_val, 4))
-                cell.alignment = Alignment(horizontal='center')
-                if i == j:
-                    cell.fill = PatternFill(start_color="E8E8E8", end_color="E8E8E8", fill_type="solid")
+            write_row(ws, row, [pair] + [round(corr_val, 4) for corr_val in corr_matrix[i]],
+                      ['Table Cell Bold'] + ['Matrix Diagonal' if i == j else 'Matrix Cell'
+                                             for j in range(len(pair_names))])
             row += 1
         
         apply_correlation_color_scale(ws, start_data_row, row-1, 2, len(pair_names)+1)
-        add_border(ws, start_data_row-1, row-1, 1, len(pair_names)+1)
         
-        mask = np.triu(np.ones_like(corr_matrix, dtype=bool), k=1)
-        correlations = corr_matrix.where(mask).stack().values
+        correlations = upper_triangle(corr_matrix)
         
         if len(correlations) > 0:
             row += 1
-            ws.cell(row=row, column=1, value="Average Correlation:")
-            ws.cell(row=row, column=2, value=round(np.mean(correlations), 4))
+            write_row(ws, row, ["Average Correlation:", round(np.mean(correlations), 4)])
             row += 1
-            ws.cell(row=row, column=1, value="Diversification Benefit:")
-            ws.cell(row=row, column=2, value=f"{round((1 - np.mean(correlations)) * 100, 2)}%")
-            ws.cell(row=row, column=1).font = Font(bold=True, color="006600")
+            write_row(ws, row, ["Diversification Benefit:", f"{round((1 - np.mean(correlations)) * 100, 2)}%"],
+                      ['Good Label', None])
         
         row += 3
     
-    for col in range(1, 15):
-        ws.column_dimensions[get_column_letter(col)].width = 14
-    ws.column_dimensions['A'].width = 25
-    
     return ws
 
 
 def create_between_strategy_correlation_sheet(wb):
     """Create sheet showing correlation between strategies"""
-    ws = wb.create_sheet("Between_Strategy_Correlations")
+    add_styles(wb, TABLE_STYLES)
+    widths = {get_column_letter(col): 18 for col in range(2, 10)}
+    widths['A'] = 30
+    ws = new_sheet(wb, "Between_Strategy_Correlations", widths=widths)
     row = 1
     
-    ws.cell(row=row, column=1, value="CORRELATION ANALYSIS: BETWEEN STRATEGIES")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=8)
-    ws.cell(row=row, column=1).font = Font(bold=True, size=16, color="1F4E79")
-    ws.cell(row=row, column=1).alignment = Alignment(horizontal='center')
+    write_row(ws, row, ["CORRELATION ANALYSIS: BETWEEN STRATEGIES"], 'Sheet Title', merge_to=8)
     row += 2
     
-    strategy_returns = {}
-    strategy_names = []
-    
-    for strategy_name, paths in STRATEGY_EQUITY_PATHS.items():
-        returns, pair_names = load_strategy_equity_data(strategy_name, paths)
-        if returns is None:
-            continue
-        combined_return = returns.mean(axis=1)
-        strategy_returns[strategy_name] = combined_return
-        strategy_names.append(strategy_name)
+    # Equal-weighted strategy returns, defined only on each strategy's own dates
+    matrix = build_returns_matrix()
+    strategy_names = matrix['strategies']
+    column_counts = np.bincount(matrix['column_strategy'], minlength=len(strategy_names))
+    strategy_returns = np.zeros((len(matrix['dates']), len(strategy_names)))
+    np.add.at(strategy_returns.T, matrix['column_strategy'], matrix['values'].T)
+    strategy_returns /= np.maximum(column_counts, 1)
     
     if len(strategy_names) < 2:
-        ws.cell(row=row, column=1, value="Error: Insufficient strategy data")
+        write_row(ws, row, ["Error: Insufficient strategy data"])
         return ws
     
-    strategy_df = pd.DataFrame(strategy_returns)
-    corr_matrix = strategy_df.corr()
+    corr_matrix = masked_correlation_matrix(strategy_returns, matrix['row_mask'].T)
     
-    ws.cell(row=row, column=1, value="STRATEGY CORRELATION MATRIX")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=len(strategy_names)+1)
-    style_strategy_header(ws, row, 1, len(strategy_names)+1, "1F4E79")
+    write_row(ws, row, ["STRATEGY CORRELATION MATRIX"], ['Strategy Header 1F4E79'] * (len(strategy_names) + 1),
+              merge_to=len(strategy_names) + 1)
     row += 1
     
-    ws.cell(row=row, column=1, value="Strategy")
-    for col_idx, strategy in enumerate(strategy_names, 2):
-        display_name = get_strategy_display_name(strategy)
-        ws.cell(row=row, column=col_idx, value=display_name)
-    style_header(ws, row, 1, len(strategy_names)+1)
+    write_row(ws, row, ["Strategy"] + [get_strategy_display_name(strategy) for strategy in strategy_names],
+              'Matrix Header')
     row += 1
     
     start_data_row = row
     
     for i, strategy in enumerate(strategy_names):
-        display_name = get_strategy_display_name(strategy)
-        ws.cell(row=row, column=1, value=display_name)
-        ws.cell(row=row, column=1).font = Font(bold=True)
-        
-        for j, _ in enumerate(strategy_names):
-            corr_val = corr_matrix.iloc[i, j]
-            cell = ws.cell(row=row, column=j+2, value=round(corr_val, 4))
-            cell.alignment = Alignment(horizontal='center')
-            if i == j:
-                cell.fill = PatternFill(start_color="E8E8E8", end_color="E8E8E8", fill_type="solid")
+        write_row(ws, row, [get_strategy_display_name(strategy)] + [round(corr_val, 4) for corr_val in corr_matrix[i]],
+                  ['Table Cell Bold'] + ['Matrix Diagonal' if i == j else 'Matrix Cell'
+                                         for j in range(len(strategy_names))])
         row += 1
     
     apply_correlation_color_scale(ws, start_data_row, row-1, 2, len(strategy_names)+1)
-    add_border(ws, start_data_row-1, row-1, 1, len(strategy_names)+1)
     
     row += 2
     
-    mask = np.triu(np.ones_like(corr_matrix, dtype=bool), k=1)
-    correlations = corr_matrix.where(mask).stack().values
+    correlations = upper_triangle(corr_matrix)
     avg_corr = np.mean(correlations)
     
-    ws.cell(row=row, column=1, value="PORTFOLIO DIVERSIFICATION ANALYSIS")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
-    style_strategy_header(ws, row, 1, 6, "70AD47")
+    write_row(ws, row, ["PORTFOLIO DIVERSIFICATION ANALYSIS"], ['Strategy Header 70AD47'] * 6, merge_to=6)
     row += 1
     
-    ws.cell(row=row, column=1, value="Average Strategy Correlation:")
-    ws.cell(row=row, column=2, value=round(avg_corr, 4))
-    ws.cell(row=row, column=1).font = Font(bold=True)
+    write_row(ws, row, ["Average Strategy Correlation:", round(avg_corr, 4)], ['Bold Label', None])
     row += 1
     
-    ws.cell(row=row, column=1, value="Diversification Benefit:")
-    ws.cell(row=row, column=2, value=f"{round((1-avg_corr)*100, 2)}%")
-    ws.cell(row=row, column=1).font = Font(bold=True, color="006600")
-    ws.cell(row=row, column=2).font = Font(bold=True, color="006600", size=12)
+    write_row(ws, row, ["Diversification Benefit:", f"{round((1-avg_corr)*100, 2)}%"], ['Good Label', 'Good Value'])
     row += 2
     
     if avg_corr < 0.3:
@@ -1509,36 +3340,195 @@ def create_between_strategy_correlation_sheet(wb):
     else:
         interpretation = "Poor - Strategies are highly correlated"
     
-    ws.cell(row=row, column=1, value="Interpretation:")
-    ws.cell(row=row, column=2, value=interpretation)
+    write_row(ws, row, ["Interpretation:", interpretation])
+    
+    return ws
+
+
+def create_pair_cluster_sheet(wb):
+    """Create sheet showing all pairs' correlations across strategies in cluster order"""
+    matrix = build_returns_matrix()
+    n_pairs = matrix['values'].shape[1]
+    
+    add_styles(wb, TABLE_STYLES)
+    widths = {get_column_letter(col): 14 for col in range(2, n_pairs + 2)}
+    widths['A'] = 34
+    ws = new_sheet(wb, "Pair_Cluster_Correlations", widths=widths)
+    row = 1
+    
+    write_row(ws, row, ["CORRELATION ANALYSIS: ALL PAIRS IN HIERARCHICAL CLUSTER ORDER"], 'Sheet Title', merge_to=10)
+    row += 2
+    
+    if n_pairs < 2:
+        write_row(ws, row, ["Error: Insufficient pair data"])
+        return ws
+    
+    corr = pair_correlation_matrix(matrix)
+    order = cluster_order(corr)
+    strategy_names = [matrix['strategies'][i] for i in matrix['column_strategy']]
+    labels = [f"{get_strategy_display_name(strategy_names[i])}: {matrix['column_pair'][i]}" for i in order]
+    
+    # Most correlated pairs traded by different strategies
+    write_row(ws, row, ["MOST CORRELATED PAIRS ACROSS STRATEGIES"], ['Strategy Header C00000'] * 3, merge_to=3)
+    row += 1
+    
+    write_row(ws, row, ['Pair_A', 'Pair_B', 'Correlation'], 'Table Header')
+    row += 1
+    
+    upper_i, upper_j = np.triu_indices(n_pairs, k=1)
+    cross = matrix['column_strategy'][upper_i] != matrix['column_strategy'][upper_j]
+    cross_values = np.nan_to_num(corr[upper_i, upper_j], nan=-np.inf)
+    for k in np.flatnonzero(cross)[np.argsort(-cross_values[cross])][:10]:
+        i, j = upper_i[k], upper_j[k]
+        write_row(ws, row, [f"{get_strategy_display_name(strategy_names[i])}: {matrix['column_pair'][i]}",
+                            f"{get_strategy_display_name(strategy_names[j])}: {matrix['column_pair'][j]}",
+                            round(corr[i, j], 4)], 'Table Cell')
+        row += 1
+    row += 2
+    
+    write_row(ws, row, ["PAIR CORRELATION MATRIX (CLUSTER ORDER)"], ['Strategy Header 1F4E79'] * 10, merge_to=10)
+    row += 1
+    
+    write_row(ws, row, ["Pair"] + labels, 'Matrix Header')
+    row += 1
+    
+    start_data_row = row
+    ordered = corr[np.ix_(order, order)]
+    for i, label in enumerate(labels):
+        write_row(ws, row, [label] + [None if np.isnan(value) else round(value, 4) for value in ordered[i]],
+                  ['Table Cell Bold'] + ['Table Cell'] * n_pairs)
+        row += 1
+    
+    apply_correlation_color_scale(ws, start_data_row, row - 1, 2, n_pairs + 1)
+    
+    return ws
+
+
+def create_rolling_correlation_sheet(wb):
+    """Create sheet showing rolling average correlations, their peaks and stress periods"""
+    results = aggregate_result('rolling_correlations', (), run_rolling_correlations, build_returns_matrix())
+    
+    add_styles(wb, TABLE_STYLES)
+    widths = {get_column_letter(col): 18 for col in range(2, 2 * len(results) + 2)}
+    widths['A'] = 28
+    ws = new_sheet(wb, "Rolling_Correlations", widths=widths)
+    row = 1
+    
+    write_row(ws, row, ["CORRELATION ANALYSIS: ROLLING WINDOWS"], 'Sheet Title', merge_to=10)
+    row += 1
+    
+    write_row(ws, row, ["Within = average correlation of pairs in the same strategy; "
+                        "Between = average correlation of strategy returns; "
+                        "each value covers the window ending on its date"], 'Grey Note', merge_to=10)
+    row += 2
+    
+    if not results:
+        write_row(ws, row, ["Error: Insufficient data for the rolling windows"])
+        return ws
+    
+    def peak(series, dates, mask=None):
+        valid = ~np.isnan(series) if mask is None else ~np.isnan(series) & mask
+        if not valid.any():
+            return None, None
+        k = np.flatnonzero(valid)[np.argmax(series[valid])]
+        return series[k], pd.Timestamp(dates[k]).strftime('%Y-%m-%d')
+    
+    # Section 1: peaks per window
+    write_row(ws, row, ["PEAK CORRELATION BY WINDOW"], ['Strategy Header 1F4E79'] * 7, merge_to=7)
+    row += 1
+    
+    write_row(ws, row, ['Window_Days', 'Median_Within', 'Peak_Within', 'Peak_Within_Date',
+                        'Median_Between', 'Peak_Between', 'Peak_Between_Date'], 'Table Header')
+    row += 1
+    
+    for window, result in results.items():
+        within_peak, within_date = peak(result['within'], result['dates'])
+        between_peak, between_date = peak(result['between'], result['dates'])
+        write_row(ws, row, [window, round(np.nanmedian(result['within']), 4),
+                            None if within_peak is None else round(within_peak, 4), within_date,
+                            round(np.nanmedian(result['between']), 4),
+                            None if between_peak is None else round(between_peak, 4), between_date], 'Table Cell')
+        row += 1
+    row += 2
+    
+    # Section 2: stress periods
+    write_row(ws, row, ["STRESS PERIODS (WINDOWS ENDING IN THE PERIOD)"], ['Strategy Header C00000'] * 7, merge_to=7)
+    row += 1
+    
+    write_row(ws, row, ['Period', 'Window_Days', 'Peak_Within', 'Within_vs_Median',
+                        'Peak_Between', 'Between_vs_Median', 'Peak_Between_Date'], 'Table Header')
+    row += 1
+    
+    for period_name, (start, end) in CORRELATION_STRESS_PERIODS.items():
+        for window, result in results.items():
+            in_period = (result['dates'] >= np.datetime64(start)) & (result['dates'] <= np.datetime64(end))
+            within_peak, _ = peak(result['within'], result['dates'], in_period)
+            between_peak, between_date = peak(result['between'], result['dates'], in_period)
+            write_row(ws, row, [period_name, window,
+                                'n/a' if within_peak is None else round(within_peak, 4),
+                                'n/a' if within_peak is None else round(within_peak - np.nanmedian(result['within']), 4),
+                                'n/a' if between_peak is None else round(between_peak, 4),
+                                'n/a' if between_peak is None else round(between_peak - np.nanmedian(result['between']), 4),
+                                between_date or 'n/a'], 'Table Cell')
+            row += 1
+    row += 2
+    
+    # Section 3: strategy pairs' peaks on the shortest window
+    window = min(results)
+    write_row(ws, row, [f"HIGHEST {window}-DAY CORRELATION BETWEEN STRATEGIES"], ['Strategy Header C00000'] * 4,
+              merge_to=4)
+    row += 1
+    
+    write_row(ws, row, ['Strategy_A', 'Strategy_B', 'Peak_Correlation', 'Date'], 'Table Header')
+    row += 1
+    
+    strategy_peaks = sorted(results[window]['strategy_peaks'].items(), key=lambda item: -item[1][0])
+    for (strategy_a, strategy_b), (value, date) in strategy_peaks[:10]:
+        write_row(ws, row, [get_strategy_display_name(strategy_a), get_strategy_display_name(strategy_b),
+                            round(value, 4), pd.Timestamp(date).strftime('%Y-%m-%d')], 'Table Cell')
+        row += 1
+    row += 2
+    
+    # Section 4: month-end series
+    write_row(ws, row, ["ROLLING AVERAGE CORRELATION (MONTH END)"],
+              ['Strategy Header 1F4E79'] * (2 * len(results) + 1), merge_to=2 * len(results) + 1)
+    row += 1
+    
+    series = {}
+    for window, result in results.items():
+        index = pd.DatetimeIndex(result['dates'])
+        series[f"Within_{window}d"] = pd.Series(result['within'], index=index)
+        series[f"Between_{window}d"] = pd.Series(result['between'], index=index)
+    monthly = pd.DataFrame(series)
+    monthly = monthly.groupby(monthly.index.to_period('M')).last()
+    
+    headers = ['Month'] + list(monthly.columns)
+    write_row(ws, row, headers, 'Matrix Header')
+    row += 1
     
-    ws.column_dimensions['A'].width = 30
-    for col in range(2, 10):
-        ws.column_dimensions[get_column_letter(col)].width = 18
+    start_data_row = row
+    for period, values in monthly.iterrows():
+        write_row(ws, row, [str(period)] + [None if np.isnan(value) else round(value, 4) for value in values],
+                  'Table Cell')
+        row += 1
+    apply_correlation_color_scale(ws, start_data_row, row - 1, 2, len(headers))
     
     return ws
 
 
 def create_correlation_summary_sheet(wb):
     """Create executive summary sheet for correlation analysis"""
-    ws = wb.create_sheet("Executive_Summary", 0)
+    add_styles(wb, TABLE_STYLES)
+    ws = new_sheet(wb, "Executive_Summary", widths={'A': 60}, index=0)
     row = 1
     
-    ws.cell(row=row, column=1, value="PORTFOLIO CORRELATION ANALYSIS - EXECUTIVE SUMMARY")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=8)
-    ws.cell(row=row, column=1).font = Font(bold=True, size=18, color="1F4E79")
-    ws.cell(row=row, column=1).alignment = Alignment(horizontal='center')
+    write_row(ws, row, ["PORTFOLIO CORRELATION ANALYSIS - EXECUTIVE SUMMARY"], 'Summary Title', merge_to=8)
     row += 1
     
-    ws.cell(row=row, column=1, value=f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=8)
-    ws.cell(row=row, column=1).font = Font(italic=True, size=10, color="666666")
-    ws.cell(row=row, column=1).alignment = Alignment(horizontal='center')
+    write_row(ws, row, [f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"], 'Grey Note Center', merge_to=8)
     row += 3
     
-    ws.cell(row=row, column=1, value="OVERVIEW")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=8)
-    style_strategy_header(ws, row, 1, 8, "1F4E79")
+    write_row(ws, row, ["OVERVIEW"], ['Strategy Header 1F4E79'] * 8, merge_to=8)
     row += 1
     
     overview = [
@@ -1549,32 +3539,36 @@ def create_correlation_summary_sheet(wb):
         "",
         "2. Between-Strategy: How correlated are different strategies?",
         "   → Low correlation = better diversification across strategies",
+        "",
+        "3. Pair Clusters: Which pairs move together across all strategies?",
+        "   → Pairs are ordered by hierarchical clustering (as used by HRP)",
+        "",
+        "4. Rolling Windows: How does correlation change over time?",
+        "   → Peaks show when diversification failed, e.g. in stress periods",
     ]
     
     for text in overview:
-        ws.cell(row=row, column=1, value=text)
+        write_row(ws, row, [text])
         row += 1
     
     row += 2
     
-    ws.cell(row=row, column=1, value="RECOMMENDATIONS")
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=8)
-    style_strategy_header(ws, row, 1, 8, "C00000")
+    write_row(ws, row, ["RECOMMENDATIONS"], ['Strategy Header C00000'] * 8, merge_to=8)
     row += 1
     
     recommendations = [
         "✓ Review the 'Within_Strategy_Correlations' sheet for pair diversification",
         "✓ Review the 'Between_Strategy_Correlations' sheet for strategy diversification",
+        "✓ Review the 'Pair_Cluster_Correlations' sheet for the same exposure traded twice",
+        "✓ Review the 'Rolling_Correlations' sheet for correlation spikes in stress periods",
         "✓ Lower correlation values indicate better diversification",
         "✓ Aim for average correlations below 0.5 for good diversification",
     ]
     
     for rec in recommendations:
-        ws.cell(row=row, column=1, value=rec)
+        write_row(ws, row, [rec])
         row += 1
     
-    ws.column_dimensions['A'].width = 60
-    
     return ws
 
 
@@ -1582,14 +3576,16 @@ def create_correlation_summary_sheet(wb):
 # MAIN EXECUTION
 # ============================================================================
 
-def create_portfolio_analysis_workbook(strategies_data):
-    """Create the main Portfolio Analysis workbook"""
+def create_portfolio_analysis_workbook(strategies_data, mc_paths=None, walk_forward=True):
+    """
+    Create the main Portfolio Analysis workbook (mc_paths=0 skips the Monte
+    Carlo sheet, walk_forward=False the walk-forward backtest)
+    """
     print("\n" + "=" * 80)
     print("CREATING PORTFOLIO ANALYSIS SHEETS")
     print("=" * 80)
     
-    wb = Workbook()
-    wb.remove(wb.active)
+    wb = new_workbook(TABLE_STYLES)
     
     print("  Creating Sheet 1: Strategy Statistics...")
     create_sheet1_statistics(wb, strategies_data)
@@ -1603,9 +3599,22 @@ def create_portfolio_analysis_workbook(strategies_data):
     print("  Creating Sheet 4: Final Portfolio Analysis...")
     create_sheet4_final_portfolio(wb, strategies_data)
     
+    mc_paths = MONTE_CARLO_PATHS if mc_paths is None else mc_paths
+    if mc_paths > 0:
+        print(f"  Creating Monte Carlo Drawdowns (up to {mc_paths:,} paths per row)...")
+        create_monte_carlo_sheet(wb, strategies_data, mc_paths)
+    
+    if walk_forward:
+        print("  Creating Walk-Forward Backtest...")
+        create_walk_forward_sheet(wb, strategies_data)
+    
+    print("  Creating Efficient Frontier...")
+    create_efficient_frontier_sheet(wb, strategies_data)
+    
     output_path = os.path.join(BASE_PATH, 'Portfolio_Analysis_Sheets.xlsx')
-    wb.save(output_path)
-    print(f"\n  ✓ Saved: {output_path}")
+    cached, uncached = save_workbook(wb, output_path)
+    print(f"\n  ✓ Saved: {output_path} ({cached} formula values cached"
+          f"{f', {uncached} left to Excel' if uncached else ''})")
     
     return output_path
 
@@ -1616,8 +3625,7 @@ def create_correlation_analysis_workbook():
     print("CREATING CORRELATION ANALYSIS SHEETS")
     print("=" * 80)
     
-    wb = Workbook()
-    wb.remove(wb.active)
+    wb = new_workbook(TABLE_STYLES)
     
     print("  Creating Within-Strategy Correlations sheet...")
     create_within_strategy_correlation_sheet(wb)
@@ -1625,17 +3633,24 @@ def create_correlation_analysis_workbook():
     print("\n  Creating Between-Strategy Correlations sheet...")
     create_between_strategy_correlation_sheet(wb)
     
+    print("  Creating Pair Cluster Correlations sheet...")
+    create_pair_cluster_sheet(wb)
+    
+    print("  Creating Rolling Correlations sheet...")
+    create_rolling_correlation_sheet(wb)
+    
     print("  Creating Executive Summary...")
     create_correlation_summary_sheet(wb)
     
     output_path = os.path.join(BASE_PATH, 'Portfolio_Correlation_Analysis.xlsx')
-    wb.save(output_path)
-    print(f"\n  ✓ Saved: {output_path}")
+    cached, uncached = save_workbook(wb, output_path)
+    print(f"\n  ✓ Saved: {output_path} ({cached} formula values cached"
+          f"{f', {uncached} left to Excel' if uncached else ''})")
     
     return output_path
 
 
-def main():
+def main(jobs=1, mc_paths=None, walk_forward=True):
     """Main entry point - runs all analyses"""
     print("\n" + "=" * 80)
     print("COMPREHENSIVE PORTFOLIO ANALYZER")
@@ -1644,6 +3659,15 @@ def main():
     print(f"Base Path: {BASE_PATH}")
     print("=" * 80)
     
+    reset_equity_repository()
+    
+    # Parse every report up front (across worker processes with --jobs N)
+    loaded = prefetch_reports(collect_report_paths(), jobs)
+    print(f"Prefetched {loaded} reports ({jobs} job(s))")
+    
+    # Results of the previous run whose reports are unchanged are reused
+    load_manifest()
+    
     # Load all strategy data
     strategies_data = load_all_strategies()
     
@@ -1654,11 +3678,27 @@ def main():
     print(f"\nLoaded {len(strategies_data)} strategies successfully.")
     
     # Create Portfolio Analysis workbook
-    portfolio_path = create_portfolio_analysis_workbook(strategies_data)
+    portfolio_path = create_portfolio_analysis_workbook(strategies_data, mc_paths, walk_forward)
     
     # Create Correlation Analysis workbook
     correlation_path = create_correlation_analysis_workbook()
     
+    # Typed tables for the allocation simulator
+    analysis_tables = build_analysis_tables(strategies_data)
+    artifact_path = write_artifact(analysis_tables, os.path.join(BASE_PATH, ARTIFACT_DIR))
+    print(f"\n  ✓ Saved simulator hand-off: {artifact_path}")
+    
+    save_manifest()
+    print(f"\nRun manifest: reused {_MANIFEST_STATS['reused']}, "
+          f"recomputed {_MANIFEST_STATS['computed']} results")
+    
+    unconverged = [label for label, info in _ERC_DIAGNOSTICS.items() if not info['converged']]
+    print(f"ERC risk parity: {len(_ERC_DIAGNOSTICS)} solves, "
+          f"max sweeps {max((info['sweeps'] for info in _ERC_DIAGNOSTICS.values()), default=0)}, "
+          f"max RC error {max((info['max_rc_error'] for info in _ERC_DIAGNOSTICS.values()), default=0):.2e}")
+    for label in unconverged:
+        print(f"  WARNING: ERC solve did not converge for {', '.join(label)}")
+    
     # Final summary
     print("\n" + "=" * 80)
     print("ANALYSIS COMPLETE")
@@ -1667,12 +3707,19 @@ def main():
     print(f"  1. {portfolio_path}")
     print("     - Final_Portfolio_Analysis (your selected allocations)")
     print("     - Strategy_Statistics (all strategies with MT5 Sharpe)")
-    print("     - Pair_Capital_Distribution (5 allocation methods)")
-    print("     - Strategy_Capital_Distribution (5 allocation methods)")
+    print("     - Pair_Capital_Distribution (8 allocation methods)")
+    print("     - Strategy_Capital_Distribution (8 allocation methods)")
+    print("     - Monte_Carlo_Drawdowns (bootstrapped drawdown percentiles)")
+    print("     - Walk_Forward_Backtest (out-of-sample performance per method)")
+    print("     - Efficient_Frontier (strategy weight sweep, methods vs frontier)")
     print(f"\n  2. {correlation_path}")
     print("     - Executive_Summary (key insights)")
     print("     - Within_Strategy_Correlations (pair correlations)")
     print("     - Between_Strategy_Correlations (strategy correlations)")
+    print("     - Pair_Cluster_Correlations (all pairs, hierarchical cluster order)")
+    print("     - Rolling_Correlations (rolling averages, peaks and stress periods)")
+    print(f"\n  3. {artifact_path}")
+    print("     - pair_stats, pair_weights, strategy_allocation (portfolio_allocation_simulator.py input)")
     print("\n" + "=" * 80)
     
     # Print portfolio summary
@@ -1687,7 +3734,17 @@ def main():
     print(f"  Total Expected Profit: ${total_profit:,.2f}")
     print(f"  Overall Return: {(total_profit/total_capital)*100:.2f}%")
     print("=" * 80)
+    
+    return analysis_tables
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Comprehensive portfolio analyzer")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="worker processes used to parse reports (default 1)")
+    parser.add_argument('--mc-paths', type=int, default=MONTE_CARLO_PATHS,
+                        help=f"most Monte Carlo bootstrap paths per row, 0 to skip (default {MONTE_CARLO_PATHS})")
+    parser.add_argument('--no-walk-forward', dest='walk_forward', action='store_false',
+                        help="skip the walk-forward backtest sheet")
+    args = parser.parse_args()
+    main(jobs=args.jobs, mc_paths=args.mc_paths, walk_forward=args.walk_forward)
@@ -0,0 +1,181 @@
+"""
+================================================================================
+SHEET RENDER - STREAMED ROW-BY-ROW WORKBOOK WRITING
+================================================================================
+
+The report workbooks are written one whole row at a time. new_workbook()
+opens an openpyxl write-only workbook: every row is serialized to its sheet's
+XML stream as soon as it is written, so building a sheet of 10,000+ pairs or
+daily rows takes time and memory linear in the rows instead of holding a Cell
+object for every cell of the workbook until it is saved.
+
+Cells are formatted with named styles registered once per workbook from a
+style table ({name: attributes}). Every cell of a kind points at the same
+registered style instead of carrying its own Font / PatternFill / Border.
+
+Rows go out top to bottom, so column widths and frozen panes are given when
+the sheet is created and a builder works out the row numbers its formulas
+point to before writing them. Merges may be added at any time.
+
+Write-only sheets keep no cells. The raw values of their rows are kept as
+plain tuples for formula_cache, which evaluates the formulas from them when
+the workbook is saved; sheets without formulas skip this (keep_values=False).
+
+write_row() also works on regular in-memory worksheets, for workbooks that
+mix streamed tables with sheets written cell by cell.
+
+USAGE:
+    from sheet_render import new_workbook, new_sheet, write_row
+    from formula_cache import save_workbook
+    STYLES = {'Header': {'font': Font(bold=True), 'fill': 'BDD7EE', 'border': 'thin'},
+              'Money': {'border': 'thin', 'number_format': '$#,##0.00'}}
+    wb = new_workbook(STYLES)
+    ws = new_sheet(wb, 'Summary', widths={'A': 20, 'B': 14}, freeze='A2')
+    write_row(ws, 1, ['Pair', 'Profit'], 'Header')
+    write_row(ws, 2, ['EURUSD', 12.5], [None, 'Money'])
+    save_workbook(wb, 'Summary.xlsx')
+
+================================================================================
+"""
+
+import weakref
+from copy import copy
+from itertools import zip_longest
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle, PatternFill, Border, Side
+from openpyxl.styles.borders import DEFAULT_BORDER
+from openpyxl.styles.fills import DEFAULT_EMPTY_FILL
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Box borders a style table can name ('border': 'thin')
+BORDERS = {
+    style: Border(left=Side(style=style), right=Side(style=style),
+                  top=Side(style=style), bottom=Side(style=style))
+    for style in ('thin', 'medium')
+}
+
+# Workbook -> {style name: style array}, filled as styles are registered
+_STYLE_ARRAYS = weakref.WeakKeyDictionary()
+
+# Streamed worksheet -> {'rows': rows written, 'values': [row tuples] or None}
+_SHEET_STATE = weakref.WeakKeyDictionary()
+
+
+# ============================================================================
+# STYLES
+# ============================================================================
+
+def solid_fill(color):
+    """Solid PatternFill of an RGB hex colour"""
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+
+def build_named_style(name, attributes):
+    """
+    NamedStyle from a style table entry: font, fill (PatternFill or RGB hex),
+    border (Border, 'thin' or 'medium'), alignment, number_format. Unset
+    attributes are the workbook defaults.
+    """
+    fill = attributes.get('fill', DEFAULT_EMPTY_FILL)
+    border = attributes.get('border', DEFAULT_BORDER)
+    return NamedStyle(
+        name=name,
+        font=attributes.get('font', DEFAULT_FONT),
+        fill=solid_fill(fill) if isinstance(fill, str) else fill,
+        border=BORDERS[border] if isinstance(border, str) else border,
+        alignment=attributes.get('alignment'),
+        number_format=attributes.get('number_format'),
+    )
+
+
+def add_styles(wb, styles):
+    """Register a style table on wb; names already registered are kept as they are"""
+    arrays = _STYLE_ARRAYS.setdefault(wb, {})
+    registered = set(wb.named_styles)
+    for name, attributes in styles.items():
+        if name not in registered:
+            wb.add_named_style(build_named_style(name, attributes))
+            registered.add(name)
+    for style in wb._named_styles:
+        if style.name not in arrays:
+            arrays[style.name] = style.as_tuple()
+
+
+# ============================================================================
+# PUBLIC API
+# ============================================================================
+
+def new_workbook(styles=None):
+    """Empty write-only Workbook with a style table registered"""
+    wb = Workbook(write_only=True)
+    add_styles(wb, styles or {})
+    return wb
+
+
+def new_sheet(wb, title, widths=None, freeze=None, index=None, keep_values=True):
+    """
+    Create a worksheet. widths: {column letter: width}; freeze: top-left
+    cell of the scrolling pane. keep_values=False streams the rows without
+    keeping their values (only for sheets no formula contains or reads).
+    """
+    ws = wb.create_sheet(title=title, index=index)
+    for column, width in (widths or {}).items():
+        ws.column_dimensions[column].width = width
+    if freeze:
+        ws.freeze_panes = freeze
+    if isinstance(ws, WriteOnlyWorksheet):
+        _SHEET_STATE[ws] = {'rows': 0, 'values': [] if keep_values else None}
+    return ws
+
+
+def kept_rows(ws):
+    """Row value tuples kept for a streamed sheet ([] if none), None for an in-memory sheet"""
+    if not isinstance(ws, WriteOnlyWorksheet):
+        return None
+    state = _SHEET_STATE.get(ws)
+    return [] if state is None or state['values'] is None else state['values']
+
+
+def write_row(ws, row, values, styles=None, merge_to=None):
+    """
+    Write a whole row. Rows must be written in increasing order; skipped rows
+    stay empty. styles is one style name for every value or a list of names
+    by column (None leaves a cell unstyled; a style past the last value gives
+    a formatted empty cell). merge_to merges columns 1..merge_to of the row.
+    """
+    if styles is None or isinstance(styles, str):
+        styles = [styles] * len(values)
+    arrays = _STYLE_ARRAYS.get(ws.parent, {})
+    cells = []
+    for value, style in zip_longest(values, styles):
+        if style is None:
+            cells.append(value)
+            continue
+        if style not in arrays:
+            raise ValueError(f"Style '{style}' is not registered on the workbook")
+        cell = WriteOnlyCell(ws, value)
+        cell._style = copy(arrays[style])
+        cells.append(cell)
+
+    state = _SHEET_STATE.get(ws)
+    written = ws._current_row if state is None else state['rows']
+    if row <= written:
+        raise ValueError(f"Row {row} of '{ws.title}' comes after row {written} was written")
+    for _ in range(row - written - 1):
+        ws.append([])
+    ws.append(cells)
+    if state is not None:
+        state['rows'] = row
+        if state['values'] is not None:
+            state['values'].extend([()] * (row - written - 1))
+            state['values'].append(tuple(values))
+    if merge_to:
+        ws.merged_cells.add(f"A{row}:{get_column_letter(merge_to)}{row}")
+    return row
@@ -0,0 +1,712 @@
+"""
+================================================================================
+TRADE STORE - NORMALIZED MT4/MT5 REPORT DATA WITH ON-DISK CACHE
+================================================================================
+
+Every Strategy Tester export used by the analyzers (MT4 CSV/XLSX/HTM trade
+lists and MT5 XLSX/HTML deal lists) is parsed once into a single normalized
+trade table with typed columns:
+
+    time       datetime64   deal / trade timestamp
+    type       string       buy, sell, close, t/p, balance, ...
+    direction  string       in / out (MT5 deals only)
+    symbol     string       instrument (MT5 deals only)
+    order      Int64        order / ticket number
+    size       float64      lots
+    price      float64      execution price
+    profit     float64      realized P&L (NaN on rows without a profit)
+    balance    float64      account balance after the row (NaN if blank)
+
+HTML reports additionally yield their summary statistics block (Sharpe,
+profit factor, drawdown, bars, modelling quality, parameters, ...), see
+load_report_summary().
+
+Parsed tables are cached under CACHE_DIR (Parquet when pyarrow is available,
+pickle otherwise). A cache entry is keyed by the report path and validated
+against its size, mtime and content hash, so repeat runs skip parsing.
+
+USAGE:
+    from trade_store import load_trades, load_report_summary
+    trades = load_trades('Falcon/V5.csv')
+    summary = load_report_summary('Falcon/V5.htm')
+
+    # Parse many reports up front across worker processes
+    prefetch_reports(paths, jobs=8)
+
+================================================================================
+"""
+
+import pandas as pd
+import numpy as np
+import codecs
+import hashlib
+import io
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from openpyxl import load_workbook
+
+try:
+    import pyarrow  # noqa: F401
+    CACHE_FORMAT = 'parquet'
+except ImportError:
+    CACHE_FORMAT = 'pickle'
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Directory holding cached trade tables (created on first write)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.report_cache')
+
+# Bump whenever parsing output changes so stale cache entries are discarded
+STORE_VERSION = 2
+
+TRADE_COLUMNS = ['time', 'type', 'direction', 'symbol', 'order',
+                 'size', 'price', 'profit', 'balance']
+
+# Report header name -> normalized column name
+HEADER_ALIASES = {
+    'time': 'time',
+    'type': 'type',
+    'direction': 'direction',
+    'symbol': 'symbol',
+    'order': 'order',
+    'size': 'size',
+    'volume': 'size',
+    'price': 'price',
+    'profit': 'profit',
+    'balance': 'balance',
+}
+
+# Timestamp layouts written by MT4 and MT5 Strategy Tester exports
+TIME_FORMATS = ['%Y.%m.%d %H:%M:%S', '%Y.%m.%d %H:%M', '%Y.%m.%d',
+                '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d',
+                '%Y/%m/%d %H:%M', '%Y/%m/%d', '%d.%m.%Y %H:%M', '%d.%m.%Y']
+
+# Summary labels (MT4 and MT5 spellings, case-insensitive) -> summary key
+SUMMARY_FIELDS = {
+    'sharpe_ratio': ['Sharpe Ratio'],
+    'profit_factor': ['Profit factor'],
+    'expected_payoff': ['Expected payoff'],
+    'initial_deposit': ['Initial deposit'],
+    'total_net_profit': ['Total net profit'],
+    'gross_profit': ['Gross profit'],
+    'gross_loss': ['Gross loss'],
+    'max_drawdown': ['Maximal drawdown', 'Balance Drawdown Maximal'],
+    'equity_max_drawdown': ['Equity Drawdown Maximal'],
+    'total_trades': ['Total trades'],
+    'bars': ['Bars in test', 'Bars'],
+    'modelling_quality': ['Modelling quality', 'History Quality'],
+}
+
+# Bytes read per step when streaming HTML reports
+HTML_CHUNK_SIZE = 64 * 1024
+
+# In-process memo: abspath -> (fingerprint, trades, summary)
+_MEMORY_CACHE = {}
+
+# Active read recorders, see record_reads()
+_READ_RECORDERS = []
+
+
+# ============================================================================
+# VALUE NORMALIZATION
+# ============================================================================
+
+def to_number(series):
+    """Convert report numbers such as '10,044.20' or '100 000.00' to float64"""
+    if series.dtype.kind in 'iuf':
+        return series.astype('float64')
+    text = series.astype(str).str.replace(r'[\s,"$]', '', regex=True)
+    return pd.to_numeric(text, errors='coerce').astype('float64')
+
+
+def infer_time_format(text, sample_size=50):
+    """Pick the timestamp layout once per file from a sample of its values"""
+    sample = text[text.str.len() > 0].head(sample_size)
+    if sample.empty:
+        return None
+    best, best_count = None, 0
+    for fmt in TIME_FORMATS:
+        count = pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum()
+        if count > best_count:
+            best, best_count = fmt, count
+            if count == len(sample):
+                break
+    return best
+
+
+def to_datetime(series):
+    """Parse report timestamps with the format inferred from a sample"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype('datetime64[ns]')
+    text = series.astype(str).str.strip()
+    fmt = infer_time_format(text.where(series.notna(), ''))
+    if fmt is None:
+        parsed = pd.to_datetime(text, errors='coerce')
+    else:
+        parsed = pd.to_datetime(text, format=fmt, errors='coerce')
+    return parsed.astype('datetime64[ns]')
+
+
+def normalize_trades(raw):
+    """Map a raw report frame (header already applied) to the trade columns"""
+    raw = raw.rename(columns=lambda c: str(c).strip().lower())
+    n = len(raw)
+    trades = pd.DataFrame(index=pd.RangeIndex(n))
+    for header, column in HEADER_ALIASES.items():
+        if header in raw.columns and column not in trades.columns:
+            trades[column] = raw[header].to_numpy()
+
+    trades['time'] = to_datetime(trades['time']) if 'time' in trades else pd.NaT
+    for column in ['type', 'direction', 'symbol']:
+        if column in trades:
+            values = trades[column].where(trades[column].notna(), None)
+            text = values.astype(str).str.strip()
+            trades[column] = text.where(values.notna(), None)
+        else:
+            trades[column] = None
+    if 'type' in trades:
+        trades['type'] = trades['type'].str.lower()
+    for column in ['size', 'price', 'profit', 'balance']:
+        trades[column] = to_number(trades[column]) if column in trades else np.nan
+    order = to_number(trades['order']) if 'order' in trades else pd.Series(np.nan, index=trades.index)
+    trades['order'] = order.round().astype('Int64')
+
+    trades = trades[TRADE_COLUMNS]
+    for column in ['type', 'direction', 'symbol']:
+        trades[column] = trades[column].astype('string')
+
+    # Drop blank padding rows and trailing summary rows without a timestamp
+    return trades[trades['time'].notna()].reset_index(drop=True)
+
+
+def empty_trades():
+    """Return an empty trade table with the normalized schema"""
+    return normalize_trades(pd.DataFrame(columns=['Time']))
+
+
+# ============================================================================
+# REPORT PARSERS
+# ============================================================================
+
+def is_header_row(values):
+    """A trade table header names a Time column plus Profit or Balance"""
+    cells = [str(v).strip().lower() for v in values if v is not None and not pd.isna(v)]
+    return 'time' in cells and ('profit' in cells or 'balance' in cells)
+
+
+def parse_csv_report(filepath):
+    """Parse an MT4/MT5 CSV export into the normalized trade table (one read)"""
+    with open(filepath, 'r', encoding='utf-8-sig', errors='ignore') as f:
+        text = f.read()
+
+    # Locate the header line without splitting the whole file
+    offset = 0
+    while offset < len(text):
+        end = text.find('\n', offset)
+        end = len(text) if end == -1 else end + 1
+        if is_header_row(text[offset:end].split(',')):
+            break
+        offset = end
+    else:
+        return empty_trades(), {}
+
+    # Let the C parser type the numeric columns ('"10,021.49"' via thousands=',')
+    header = [h.strip().strip('"') for h in text[offset:end].strip().split(',')]
+    wanted = [h for h in header if h.lower() in HEADER_ALIASES]
+    numeric = {h: 'float64' for h in wanted
+               if HEADER_ALIASES[h.lower()] in ('size', 'price', 'profit', 'balance', 'order')}
+    source = text[offset:]
+    try:
+        raw = pd.read_csv(io.StringIO(source), usecols=wanted, thousands=',',
+                          dtype={h: numeric.get(h, str) for h in wanted},
+                          on_bad_lines='skip')
+    except (ValueError, TypeError):
+        # Stray text in a numeric column: fall back to string columns
+        raw = pd.read_csv(io.StringIO(source), dtype=str, on_bad_lines='skip')
+    return normalize_trades(raw), {}
+
+
+def parse_xlsx_report(filepath):
+    """Stream every trade table of an MT4/MT5 XLSX export in one read-only pass"""
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    frames = []
+    try:
+        for sheet in workbook.worksheets:
+            columns = None
+            for values in sheet.iter_rows(values_only=True):
+                if columns is None:
+                    if is_header_row(values):
+                        # Keep only the trade columns: index -> (header, values)
+                        columns = {i: (str(v).strip(), []) for i, v in enumerate(values)
+                                   if v is not None and str(v).strip().lower() in HEADER_ALIASES}
+                    continue
+                for i, (_, column) in columns.items():
+                    column.append(values[i] if i < len(values) else None)
+            if columns:
+                raw = pd.DataFrame({name: column for name, column in columns.values()})
+                frames.append(normalize_trades(raw))
+    finally:
+        workbook.close()
+    if not frames:
+        return empty_trades(), {}
+    return pd.concat(frames, ignore_index=True), {}
+
+
+# ============================================================================
+# HTML REPORTS (STREAMING)
+# ============================================================================
+
+def sniff_encoding(head):
+    """Pick a decoder from the first bytes of a report (BOM or NUL pattern)"""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head.startswith(codecs.BOM_UTF16_LE) or head.startswith(codecs.BOM_UTF16_BE):
+        return 'utf-16'
+    if len(head) >= 2 and head[1:2] == b'\x00':
+        return 'utf-16-le'
+    if len(head) >= 2 and head[0:1] == b'\x00':
+        return 'utf-16-be'
+    return 'utf-8'
+
+
+def parse_number(text):
+    """Leading number of a summary value: '1 298.39 (1.25%)' -> 1298.39"""
+    match = re.match(r'\s*([+-]?\d[\d ,]*(?:\.\d+)?)', text or '')
+    if not match:
+        return None
+    try:
+        return float(match.group(1).replace(' ', '').replace(',', ''))
+    except ValueError:
+        return None
+
+
+def parse_percent(text):
+    """Percentage inside a summary value: '1548.90 (15.09%)' -> 15.09"""
+    match = re.search(r'([+-]?\d+(?:\.\d+)?)%', text or '')
+    return float(match.group(1)) if match else None
+
+
+class ReportHTMLParser(HTMLParser):
+    """
+    Streaming reader for MT4 .htm / MT5 .html Strategy Tester reports.
+    Rows are handled as soon as they close: rows of the first table feed the
+    summary fields, rows under a Time/Profit/Balance header feed the trade
+    table columns. Nothing else of the document is kept.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.fields = {}
+        self.parameters = {}
+        self.tables = []
+        self._header = None
+        self._columns = None
+        self._table_index = 0
+        self._row = None
+        self._cell = None
+        self._colspan = 1
+
+    # --- tokenizer callbacks ------------------------------------------------
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            self._end_row()
+            self._table_index += 1
+        elif tag == 'tr':
+            self._end_row()
+            self._row = []
+        elif tag in ('td', 'th'):
+            self._end_cell()
+            if self._row is None:
+                self._row = []
+            try:
+                self._colspan = max(int(dict(attrs).get('colspan') or 1), 1)
+            except ValueError:
+                self._colspan = 1
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag in ('td', 'th'):
+            self._end_cell()
+        elif tag == 'tr':
+            self._end_row()
+        elif tag == 'table':
+            self._end_row()
+            self._end_table()
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def close(self):
+        super().close()
+        self._end_row()
+        self._end_table()
+
+    # --- row assembly ---------------------------------------------------------
+
+    def _end_cell(self):
+        if self._cell is None:
+            return
+        text = ' '.join(''.join(self._cell).split())
+        self._row.append((text, self._colspan))
+        self._cell = None
+
+    def _end_row(self):
+        self._end_cell()
+        row, self._row = self._row, None
+        if row and any(text for text, _ in row):
+            self._process_row(row)
+
+    def _end_table(self):
+        if self._header is not None:
+            self.tables.append((self._header, self._columns))
+        self._header, self._columns = None, None
+
+    def _process_row(self, row):
+        cells = [text for text, _ in row]
+        expanded = []
+        for text, colspan in row:
+            expanded.append(text)
+            expanded.extend([''] * (colspan - 1))
+
+        if is_header_row(expanded):
+            self._end_table()
+            self._header = expanded
+            self._columns = [[] for _ in expanded]
+        elif self._header is not None:
+            if len(expanded) == len(self._header):
+                for column, value in zip(self._columns, expanded):
+                    column.append(value)
+        elif self._table_index == 1:
+            self._collect_fields(cells)
+
+    def _collect_fields(self, cells):
+        values = [c for c in cells if c]
+        if any(c.endswith(':') for c in values):
+            # MT5: "Label:" cells, each followed by its value
+            label = None
+            for cell in values:
+                if cell.endswith(':'):
+                    label = cell[:-1].strip()
+                elif label is not None:
+                    self.fields[label] = cell
+                    label = None
+        elif len(values) == 1 and '=' in values[0] and not values[0].startswith('='):
+            # MT5: one input parameter per row under "Inputs:"
+            name, value = values[0].split('=', 1)
+            self.parameters[name.strip()] = value.strip()
+        elif len(values) == 2:
+            self.fields[values[0]] = values[1]
+        else:
+            # MT4: label/value pairs, an odd leading cell prefixes the labels
+            prefix = ''
+            if len(cells) % 2 == 1:
+                prefix, cells = cells[0], cells[1:]
+            for label, value in zip(cells[0::2], cells[1::2]):
+                if label:
+                    self.fields[f"{prefix} {label}".strip()] = value
+
+    # --- results --------------------------------------------------------------
+
+    def summary(self):
+        """Typed summary statistics plus the raw label -> text fields"""
+        lookup = {label.lower(): text for label, text in self.fields.items()}
+        summary = {}
+        for key, labels in SUMMARY_FIELDS.items():
+            text = next((lookup[l.lower()] for l in labels if l.lower() in lookup), None)
+            if key == 'modelling_quality':
+                summary[key] = parse_percent(text)
+            else:
+                summary[key] = parse_number(text)
+        drawdown_text = next((lookup[l.lower()] for l in SUMMARY_FIELDS['max_drawdown']
+                              if l.lower() in lookup), None)
+        summary['max_drawdown_percent'] = parse_percent(drawdown_text)
+        if summary['bars'] is not None:
+            summary['bars'] = int(summary['bars'])
+        if summary['total_trades'] is not None:
+            summary['total_trades'] = int(summary['total_trades'])
+
+        parameters = dict(self.parameters)
+        for item in (lookup.get('parameters') or '').split(';'):
+            if '=' in item:
+                name, value = item.split('=', 1)
+                parameters[name.strip()] = value.strip()
+        summary['parameters'] = parameters
+        summary['fields'] = dict(self.fields)
+        return summary
+
+    def trades(self):
+        """Normalized trade table of every trade/deal table in the report"""
+        frames = []
+        for header, columns in self.tables:
+            raw = pd.DataFrame(dict(zip(range(len(header)), columns)))
+            raw.columns = header
+            raw = raw.loc[:, [bool(h) for h in header]]
+            frames.append(normalize_trades(raw.replace('', None)))
+        if not frames:
+            return empty_trades()
+        return pd.concat(frames, ignore_index=True)
+
+
+def parse_html_report(filepath):
+    """Stream an MT4/MT5 HTML report once: (trade table, summary statistics)"""
+    parser = ReportHTMLParser()
+    with open(filepath, 'rb') as f:
+        head = f.read(4)
+        decoder = codecs.getincrementaldecoder(sniff_encoding(head))(errors='replace')
+        parser.feed(decoder.decode(head))
+        for chunk in iter(lambda: f.read(HTML_CHUNK_SIZE), b''):
+            parser.feed(decoder.decode(chunk))
+        parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    return parser.trades(), parser.summary()
+
+
+REPORT_PARSERS = {
+    '.csv': parse_csv_report,
+    '.xlsx': parse_xlsx_report,
+    '.htm': parse_html_report,
+    '.html': parse_html_report,
+}
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+def file_content_hash(filepath, chunk_size=1 << 20):
+    """Hash file contents (BLAKE2b) in fixed-size chunks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(filepath):
+    """Return (size, mtime_ns) - the cheap part of a cache key"""
+    stat = os.stat(filepath)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def cache_entry_paths(filepath, cache_dir):
+    """Data and metadata file paths of the cache entry for a report"""
+    key = hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()[:20]
+    extension = '.parquet' if CACHE_FORMAT == 'parquet' else '.pkl'
+    return os.path.join(cache_dir, key + extension), os.path.join(cache_dir, key + '.json')
+
+
+def read_cache_entry(filepath, cache_dir):
+    """Return cached (trades, summary) if the entry still matches the report, else None"""
+    data_path, meta_path = cache_entry_paths(filepath, cache_dir)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != STORE_VERSION or meta.get('format') != CACHE_FORMAT:
+            return None
+
+        size, mtime_ns = file_fingerprint(filepath)
+        if meta.get('size') != size:
+            return None
+        if meta.get('mtime_ns') != mtime_ns:
+            # Touched but possibly unchanged (e.g. re-copied): compare contents
+            if meta.get('hash') != file_content_hash(filepath):
+                return None
+            meta['mtime_ns'] = mtime_ns
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f)
+
+        if CACHE_FORMAT == 'parquet':
+            trades = pd.read_parquet(data_path)
+        else:
+            trades = pd.read_pickle(data_path)
+        return trades, meta.get('summary', {})
+    except Exception:
+        return None
+
+
+def write_cache_entry(filepath, cache_dir, trades, summary):
+    """Persist a parsed trade table and summary with their validation metadata"""
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        data_path, meta_path = cache_entry_paths(filepath, cache_dir)
+        if CACHE_FORMAT == 'parquet':
+            trades.to_parquet(data_path, index=False)
+        else:
+            trades.to_pickle(data_path)
+        size, mtime_ns = file_fingerprint(filepath)
+        meta = {
+            'path': os.path.abspath(filepath),
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'hash': file_content_hash(filepath),
+            'version': STORE_VERSION,
+            'format': CACHE_FORMAT,
+            'rows': len(trades),
+            'summary': summary,
+        }
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+    except Exception as e:
+        print(f"  ! Could not cache {filepath}: {e}")
+
+
+def clear_cache(cache_dir=None):
+    """Remove every cached trade table"""
+    cache_dir = cache_dir or CACHE_DIR
+    _MEMORY_CACHE.clear()
+    if not os.path.isdir(cache_dir):
+        return
+    for name in os.listdir(cache_dir):
+        if name.endswith(('.parquet', '.pkl', '.json')):
+            os.remove(os.path.join(cache_dir, name))
+
+
+# ============================================================================
+# PUBLIC API
+# ============================================================================
+
+def parse_report(filepath):
+    """Parse a report without touching the cache: (trades, summary)"""
+    extension = os.path.splitext(filepath)[1].lower()
+    parser = REPORT_PARSERS.get(extension)
+    if parser is None:
+        raise ValueError(f"Unsupported report type: {filepath}")
+    return parser(filepath)
+
+
+@contextmanager
+def record_reads():
+    """Collect the absolute path of every report loaded inside the block"""
+    reads = set()
+    _READ_RECORDERS.append(reads)
+    try:
+        yield reads
+    finally:
+        _READ_RECORDERS.remove(reads)
+
+
+def note_reads(filepaths):
+    """Mark reports as read for active recorders (callers with their own memo)"""
+    abspaths = [os.path.abspath(p) for p in filepaths]
+    for reads in _READ_RECORDERS:
+        reads.update(abspaths)
+
+
+def load_report(filepath, cache_dir=None, use_cache=True):
+    """
+    Load (trades, summary) for a report.
+    Lookup order: in-process memo -> on-disk cache -> parse (and cache).
+    """
+    abspath = os.path.abspath(filepath)
+    note_reads([abspath])
+    cache_dir = cache_dir or CACHE_DIR
+    fingerprint = file_fingerprint(abspath)
+
+    if use_cache:
+        memo = _MEMORY_CACHE.get(abspath)
+        if memo is not None and memo[0] == fingerprint:
+            return memo[1], memo[2]
+        entry = read_cache_entry(abspath, cache_dir)
+        if entry is None:
+            entry = parse_report(abspath)
+            write_cache_entry(abspath, cache_dir, *entry)
+    else:
+        entry = parse_report(abspath)
+
+    trades, summary = entry
+    _MEMORY_CACHE[abspath] = (fingerprint, trades, summary)
+    return trades, summary
+
+
+def load_trades(filepath, cache_dir=None, use_cache=True):
+    """
+    Load the normalized trade table for a report.
+    Callers get their own copy and may modify it freely.
+    """
+    trades, _ = load_report(filepath, cache_dir, use_cache)
+    return trades.copy()
+
+
+def load_report_summary(filepath, cache_dir=None, use_cache=True):
+    """
+    Load the summary statistics of an HTML report (empty for CSV/XLSX):
+    sharpe_ratio, profit_factor, max_drawdown, max_drawdown_percent, bars,
+    modelling_quality, initial_deposit, total_net_profit, total_trades,
+    parameters (dict) and fields (raw label -> text).
+    """
+    _, summary = load_report(filepath, cache_dir, use_cache)
+    return dict(summary)
+
+
+# ============================================================================
+# PARALLEL INGESTION
+# ============================================================================
+
+def trades_to_arrays(trades):
+    """Split a trade table into plain NumPy column arrays (cheap to pickle)"""
+    arrays = {}
+    for column in TRADE_COLUMNS:
+        if column in ('type', 'direction', 'symbol'):
+            arrays[column] = trades[column].to_numpy(dtype=object, na_value=None)
+        elif column == 'order':
+            arrays[column] = trades[column].to_numpy(dtype='float64', na_value=np.nan)
+        else:
+            arrays[column] = trades[column].to_numpy()
+    return arrays
+
+
+def trades_from_arrays(arrays):
+    """Rebuild a typed trade table from trades_to_arrays() output"""
+    trades = pd.DataFrame(arrays, columns=TRADE_COLUMNS)
+    for column in ['type', 'direction', 'symbol']:
+        trades[column] = trades[column].astype('string')
+    trades['order'] = trades['order'].astype('Int64')
+    return trades
+
+
+def _prefetch_worker(filepath, cache_dir):
+    """Worker process: load one report (cache or parse) and ship it as arrays"""
+    trades, summary = load_report(filepath, cache_dir)
+    return file_fingerprint(filepath), trades_to_arrays(trades), summary
+
+
+def prefetch_reports(filepaths, jobs=1, cache_dir=None):
+    """
+    Load many reports ahead of use so later load_trades() calls hit memory.
+    With jobs > 1 parsing fans out across a process pool; results are merged
+    in input order, so output does not depend on worker scheduling.
+    Returns the number of reports loaded.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    paths = []
+    for filepath in filepaths:
+        abspath = os.path.abspath(filepath)
+        if abspath in paths or not os.path.exists(abspath):
+            continue
+        memo = _MEMORY_CACHE.get(abspath)
+        if memo is None or memo[0] != file_fingerprint(abspath):
+            paths.append(abspath)
+    if not paths:
+        return 0
+
+    jobs = max(1, min(jobs or 1, len(paths)))
+    if jobs == 1:
+        for abspath in paths:
+            load_report(abspath, cache_dir)
+        return len(paths)
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(_prefetch_worker, paths, [cache_dir] * len(paths))
+        for abspath, (fingerprint, arrays, summary) in zip(paths, results):
+            _MEMORY_CACHE[abspath] = (fingerprint, trades_from_arrays(arrays), summary)
+    return len(paths)
@@ -5,329 +5,176 @@ Generates an Excel file with formulas for yearly profit distribution (2020-2025)
 
 import pandas as pd
 import numpy as np
+import argparse
 import os
 from datetime import datetime
 import warnings
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from openpyxl.styles import Font, Alignment
 from openpyxl.utils import get_column_letter
 from openpyxl.utils.dataframe import dataframe_to_rows
 
+from trade_store import load_trades, prefetch_reports
+from formula_cache import save_workbook
+from sheet_render import new_workbook, new_sheet, write_row
+
 warnings.filterwarnings('ignore')
 
 # Base path
 BASE_PATH = "/Users/sureshpatil/Desktop/Portfolio Creation"
 
+YEARS = [2020, 2021, 2022, 2023, 2024, 2025]
+
+# Initial deposits show up as a "profit" on the first row of MT5 reports
+DEPOSIT_AMOUNTS = [100000, 10000, 2000, 1000]
+
+# Named cell styles of the workbook (registered once per workbook)
+SHEET_STYLES = {
+    'Title': {'font': Font(bold=True, size=16), 'alignment': Alignment(horizontal='center')},
+    'Subtitle': {'alignment': Alignment(horizontal='center')},
+    'Section': {'font': Font(bold=True, size=14)},
+    'Column Header': {'font': Font(bold=True, color="FFFFFF", size=12), 'fill': "1F4E79", 'border': 'thin',
+                      'alignment': Alignment(horizontal='center')},
+    'Column Header Left': {'font': Font(bold=True, color="FFFFFF", size=12), 'fill': "1F4E79", 'border': 'thin'},
+    'Cell': {'border': 'thin'},
+    'Text': {'border': 'thin', 'number_format': '@'},
+    'Number': {'border': 'thin', 'number_format': '#,##0.00'},
+    'Profit': {'border': 'thin', 'number_format': '#,##0.00', 'alignment': Alignment(horizontal='right')},
+    'Profit Up': {'fill': "C6EFCE", 'border': 'thin', 'number_format': '#,##0.00',
+                  'alignment': Alignment(horizontal='right')},
+    'Profit Down': {'fill': "FFC7CE", 'border': 'thin', 'number_format': '#,##0.00',
+                    'alignment': Alignment(horizontal='right')},
+    'Row Total': {'font': Font(bold=True), 'border': 'thin', 'number_format': '#,##0.00'},
+    'Share': {'border': 'thin', 'number_format': '0.00%', 'alignment': Alignment(horizontal='right')},
+    'Share Total': {'font': Font(bold=True), 'border': 'thin', 'number_format': '0.00%'},
+    'Total': {'font': Font(bold=True, color="FFFFFF", size=11), 'fill': "2E75B6", 'border': 'thin'},
+    'Total Number': {'font': Font(bold=True, color="FFFFFF", size=11), 'fill': "2E75B6", 'border': 'thin',
+                     'number_format': '#,##0.00'},
+    'Total Share': {'font': Font(bold=True, color="FFFFFF", size=11), 'fill': "2E75B6", 'border': 'thin',
+                    'number_format': '0.00%'},
+}
+
+
+def to_yearly_trades(trades):
+    """Reduce a trade store table to date/year/profit rows within 2020-2025."""
+    dates = trades['time'].dt.normalize()
+    result = pd.DataFrame({
+        'date': dates,
+        'year': dates.dt.year,
+        'profit': trades['profit'],
+    })
+    result = result[result['date'].notna() & result['year'].between(YEARS[0], YEARS[-1])]
+    result['year'] = result['year'].astype(int)
+    return result.reset_index(drop=True)
+
+
+def empty_yearly_trades():
+    """Empty date/year/profit frame."""
+    return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'),
+                         'year': pd.Series(dtype=int),
+                         'profit': pd.Series(dtype=float)})
+
+
 def parse_csv_trades(filepath):
     """Parse trade data from MT4/MT5 CSV export files."""
-    trades = []
-    
     try:
-        # Read file with flexible parsing
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
-        # Find the header row
-        header_idx = None
-        for i, line in enumerate(lines):
-            if '#,Time,Type' in line or 'Time,Type' in line:
-                header_idx = i
-                break
-        
-        if header_idx is None:
-            return trades
-        
-        # Read data starting from header
-        df = pd.read_csv(filepath, skiprows=header_idx, encoding='utf-8', 
-                         on_bad_lines='skip')
-        
-        # Clean column names
-        df.columns = df.columns.str.strip()
-        
-        # Check for required columns
-        time_col = None
-        profit_col = None
-        type_col = None
-        
-        for col in df.columns:
-            if 'Time' in col:
-                time_col = col
-            if 'Profit' in col:
-                profit_col = col
-            if 'Type' in col:
-                type_col = col
-        
-        if time_col is None or profit_col is None:
-            return trades
-        
-        # Process each row
-        for idx, row in df.iterrows():
-            try:
-                time_val = str(row[time_col]).strip()
-                profit_val = row[profit_col]
-                
-                # Skip rows without valid profit
-                if pd.isna(profit_val) or str(profit_val).strip() == '':
-                    continue
-                
-                # Parse profit value (handle comma-formatted numbers)
-                if isinstance(profit_val, str):
-                    profit_val = profit_val.replace(',', '').replace('"', '')
-                    profit_val = float(profit_val)
-                else:
-                    profit_val = float(profit_val)
-                
-                # Parse date (format: YYYY.MM.DD HH:MM or similar)
-                date_str = time_val.split(' ')[0]  # Get just the date part
-                
-                # Try different date formats
-                for fmt in ['%Y.%m.%d', '%Y-%m-%d', '%Y/%m/%d', '%d.%m.%Y']:
-                    try:
-                        trade_date = datetime.strptime(date_str, fmt)
-                        break
-                    except:
-                        continue
-                else:
-                    continue
-                
-                year = trade_date.year
-                
-                # Only include years 2020-2025
-                if 2020 <= year <= 2025:
-                    trades.append({
-                        'date': trade_date,
-                        'year': year,
-                        'profit': profit_val
-                    })
-                    
-            except Exception as e:
-                continue
-        
+        trades = load_trades(filepath)
+        trades = trades[trades['profit'].notna()]
+        return to_yearly_trades(trades)
     except Exception as e:
         print(f"Error reading {filepath}: {e}")
     
-    return trades
+    return empty_yearly_trades()
 
 
 def parse_xlsx_trades(filepath):
     """Parse trade data from Excel files with MT4/MT5 strategy tester format."""
-    trades = []
-    
     try:
-        xls = pd.ExcelFile(filepath)
-        
-        for sheet_name in xls.sheet_names:
-            try:
-                # Read entire sheet first to find the header row
-                df_raw = pd.read_excel(filepath, sheet_name=sheet_name, header=None)
-                
-                # Find the row containing 'Time' header
-                header_row = None
-                for idx, row in df_raw.iterrows():
-                    row_str = ' '.join([str(v).lower() for v in row.values if pd.notna(v)])
-                    if 'time' in row_str and ('profit' in row_str or 'balance' in row_str):
-                        header_row = idx
-                        break
-                
-                if header_row is None:
-                    continue
-                
-                # Re-read with correct header
-                df = pd.read_excel(filepath, sheet_name=sheet_name, header=header_row)
-                
-                # Clean column names
-                df.columns = [str(c).strip() for c in df.columns]
-                
-                # Find time and profit columns
-                time_col = None
-                profit_col = None
-                
-                for col in df.columns:
-                    col_lower = col.lower()
-                    if 'time' in col_lower:
-                        time_col = col
-                    if 'profit' in col_lower:
-                        profit_col = col
-                
-                if time_col is None or profit_col is None:
-                    continue
-                
-                for idx, row in df.iterrows():
-                    try:
-                        time_val = row[time_col]
-                        profit_val = row[profit_col]
-                        
-                        # Skip empty profits or header values
-                        if pd.isna(profit_val):
-                            continue
-                        
-                        profit_str = str(profit_val).strip()
-                        if profit_str == '' or profit_str.lower() == 'profit':
-                            continue
-                        
-                        # Parse profit (handle various formats)
-                        if isinstance(profit_val, str):
-                            # Remove currency symbols, spaces, and commas
-                            profit_val = profit_val.replace(',', '').replace('"', '')
-                            profit_val = profit_val.replace(' ', '').replace('$', '')
-                            if profit_val == '':
-                                continue
-                            # Check if it's a valid number
-                            try:
-                                profit_val = float(profit_val)
-                            except ValueError:
-                                continue
-                        else:
-                            try:
-                                profit_val = float(profit_val)
-                            except (ValueError, TypeError):
-                                continue
-                        
-                        # Skip zero profits (often just position opens)
-                        if profit_val == 0:
-                            continue
-                        
-                        # Skip initial deposits (typically large round numbers like 100000, 10000, 2000)
-                        # These appear as the first "profit" but are actually deposits
-                        abs_profit = abs(profit_val)
-                        if abs_profit in [100000, 100000.00, 10000, 10000.00, 2000, 2000.00, 1000, 1000.00]:
-                            continue
-                        
-                        # Parse date
-                        trade_date = None
-                        if isinstance(time_val, datetime):
-                            trade_date = time_val
-                        elif isinstance(time_val, pd.Timestamp):
-                            trade_date = time_val.to_pydatetime()
-                        else:
-                            time_str = str(time_val).strip()
-                            if time_str.lower() == 'time' or time_str == 'nan':
-                                continue
-                            
-                            # Extract date part
-                            date_part = time_str.split(' ')[0]
-                            
-                            for fmt in ['%Y.%m.%d', '%Y-%m-%d', '%Y/%m/%d', '%d.%m.%Y', '%d-%m-%Y']:
-                                try:
-                                    trade_date = datetime.strptime(date_part, fmt)
-                                    break
-                                except:
-                                    continue
-                        
-                        if trade_date is None:
-                            continue
-                        
-                        year = trade_date.year
-                        
-                        if 2020 <= year <= 2025:
-                            trades.append({
-                                'date': trade_date,
-                                'year': year,
-                                'profit': profit_val
-                            })
-                            
-                    except Exception as e:
-                        continue
-                        
-            except Exception as e:
-                continue
-                
+        trades = load_trades(filepath)
+        profit = trades['profit']
+        # Skip empty and zero profits (position opens) and initial deposits
+        keep = profit.notna() & (profit != 0) & ~profit.abs().isin(DEPOSIT_AMOUNTS)
+        return to_yearly_trades(trades[keep])
     except Exception as e:
         print(f"Error reading {filepath}: {e}")
     
-    return trades
+    return empty_yearly_trades()
 
 
-def get_strategy_data():
-    """Collect trade data from all 8 strategies."""
-    
-    strategies = {}
+def combine_trades(frames):
+    """Concatenate per-file trade frames into one strategy frame."""
+    frames = [f for f in frames if len(f) > 0]
+    if not frames:
+        return empty_yearly_trades()
+    return pd.concat(frames, ignore_index=True)
+
+
+def list_xlsx_files(folder_path):
+    """XLSX reports inside a strategy pair folder."""
+    if not os.path.exists(folder_path):
+        return []
+    return [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith('.xlsx')]
+
+
+def get_strategy_report_files():
+    """Report files of all 8 strategies: [(name, progress label, [paths])] in output order."""
     
-    # 1. AURUM Strategy
-    print("Processing AURUM Strategy...")
-    aurum_trades = []
-    aurum_files = [
-        os.path.join(BASE_PATH, "AURUM/Gold /Gold - Indivisual TP.xlsx"),
-        os.path.join(BASE_PATH, "AURUM/USDJPY/USDJPY - AVG TP.xlsx")
-    ]
-    for f in aurum_files:
-        if os.path.exists(f):
-            aurum_trades.extend(parse_xlsx_trades(f))
-    strategies['AURUM'] = aurum_trades
-    
-    # 2. Falcon Strategy
-    print("Processing Falcon Strategy...")
-    falcon_trades = []
-    falcon_csv = os.path.join(BASE_PATH, "Falcon/V5.csv")
-    if os.path.exists(falcon_csv):
-        falcon_trades.extend(parse_csv_trades(falcon_csv))
-    strategies['Falcon'] = falcon_trades
-    
-    # 3. Gold Dip Strategy
-    print("Processing Gold Dip Strategy...")
-    gold_dip_trades = []
     gold_dip_folders = ['EURUSD', 'AUDUSD', 'GBPUSD', 'EURAUD', 'EURJPY', 'EURCHF', 'AUDJPY', 'USDCAD']
-    for folder in gold_dip_folders:
-        csv_path = os.path.join(BASE_PATH, f"Gold Dip/{folder}/{folder}.csv")
-        if os.path.exists(csv_path):
-            gold_dip_trades.extend(parse_csv_trades(csv_path))
-    strategies['Gold Dip'] = gold_dip_trades
-    
-    # 4. Pair Trading EA Strategy
-    print("Processing Pair Trading EA Strategy...")
-    pair_trading_trades = []
     pair_folders = ['AUDUSD-AUDCAD', 'EURUSD-GBPUSD', 'EURUSD_AUDUSD', 'EURGBP-GBPCHF', 'USDCAD_AUDCHF']
-    for folder in pair_folders:
-        folder_path = os.path.join(BASE_PATH, f"Pair Trading EA/{folder}")
-        if os.path.exists(folder_path):
-            for f in os.listdir(folder_path):
-                if f.endswith('.xlsx'):
-                    pair_trading_trades.extend(parse_xlsx_trades(os.path.join(folder_path, f)))
-    strategies['Pair Trading EA'] = pair_trading_trades
-    
-    # 5. Reversal Strategy
-    print("Processing Reversal Strategy...")
-    reversal_trades = []
-    reversal_xlsx = os.path.join(BASE_PATH, "Reversal Strategy/All Pairs - 1 Day.xlsx")
-    if os.path.exists(reversal_xlsx):
-        reversal_trades.extend(parse_xlsx_trades(reversal_xlsx))
-    strategies['Reversal Strategy'] = reversal_trades
-    
-    # 6. RSI 6 Trades Strategy
-    print("Processing RSI 6 Trades Strategy...")
-    rsi6_trades = []
     rsi6_folders = ['GBPAUD', 'EURAUD', 'GBPUSD', 'EURGBP', 'GBPCAD', 'EURCAD', 'EURUSD', 
                     'USDCHF', 'NZDCHF', 'USDJPY', 'CADCHF', 'GBPCHF', 'EURCHF', 'USDCAD', 'AUDUSD', 'AUDNZD']
-    for folder in rsi6_folders:
-        xlsx_path = os.path.join(BASE_PATH, f"RSI 6 trades/{folder}/{folder}.xlsx")
-        if os.path.exists(xlsx_path):
-            rsi6_trades.extend(parse_xlsx_trades(xlsx_path))
-    strategies['RSI 6 Trades'] = rsi6_trades
-    
-    # 7. RSI Correlation Strategy
-    print("Processing RSI Correlation Strategy...")
-    rsi_corr_trades = []
     rsi_corr_folders = ['AUDUSD_GBPNZD', 'EURAUD_CADCHF', 'EURGBP_GBPCHF', 
                         'GBPUSD_USDCAD', 'GBPUSD_USDCHF', 'USDCAD_AUDCHF']
-    for folder in rsi_corr_folders:
-        folder_path = os.path.join(BASE_PATH, f"RSI corelation/{folder}")
-        if os.path.exists(folder_path):
-            for f in os.listdir(folder_path):
-                if f.endswith('.xlsx'):
-                    rsi_corr_trades.extend(parse_xlsx_trades(os.path.join(folder_path, f)))
-    strategies['RSI Correlation'] = rsi_corr_trades
-    
-    # 8. 7th Strategy (RSI Pyramiding)
-    print("Processing 7th Strategy (RSI Pyramiding)...")
-    strategy7_trades = []
-    strategy7_files = [
-        os.path.join(BASE_PATH, "7th strategy/XAUUSD 20-25.csv"),
-        os.path.join(BASE_PATH, "7th strategy/XAGUSD 20-25.csv")
+    
+    report_files = [
+        ('AURUM', 'AURUM Strategy', [
+            os.path.join(BASE_PATH, "AURUM/Gold /Gold - Indivisual TP.xlsx"),
+            os.path.join(BASE_PATH, "AURUM/USDJPY/USDJPY - AVG TP.xlsx"),
+        ]),
+        ('Falcon', 'Falcon Strategy', [
+            os.path.join(BASE_PATH, "Falcon/V5.csv"),
+        ]),
+        ('Gold Dip', 'Gold Dip Strategy', [
+            os.path.join(BASE_PATH, f"Gold Dip/{folder}/{folder}.csv") for folder in gold_dip_folders
+        ]),
+        ('Pair Trading EA', 'Pair Trading EA Strategy', [
+            f for folder in pair_folders
+            for f in list_xlsx_files(os.path.join(BASE_PATH, f"Pair Trading EA/{folder}"))
+        ]),
+        ('Reversal Strategy', 'Reversal Strategy', [
+            os.path.join(BASE_PATH, "Reversal Strategy/All Pairs - 1 Day.xlsx"),
+        ]),
+        ('RSI 6 Trades', 'RSI 6 Trades Strategy', [
+            os.path.join(BASE_PATH, f"RSI 6 trades/{folder}/{folder}.xlsx") for folder in rsi6_folders
+        ]),
+        ('RSI Correlation', 'RSI Correlation Strategy', [
+            f for folder in rsi_corr_folders
+            for f in list_xlsx_files(os.path.join(BASE_PATH, f"RSI corelation/{folder}"))
+        ]),
+        ('7th Strategy (RSI Pyramiding)', '7th Strategy (RSI Pyramiding)', [
+            os.path.join(BASE_PATH, "7th strategy/XAUUSD 20-25.csv"),
+            os.path.join(BASE_PATH, "7th strategy/XAGUSD 20-25.csv"),
+        ]),
     ]
-    for f in strategy7_files:
-        if os.path.exists(f):
-            strategy7_trades.extend(parse_csv_trades(f))
-    strategies['7th Strategy (RSI Pyramiding)'] = strategy7_trades
+    
+    # Missing files are skipped, as before
+    return [(name, label, [f for f in files if os.path.exists(f)])
+            for name, label, files in report_files]
+
+
+def get_strategy_data(jobs=1):
+    """Collect trade data from all 8 strategies."""
+    
+    report_files = get_strategy_report_files()
+    
+    # Parse every report up front (across worker processes when jobs > 1)
+    prefetch_reports([f for _, _, files in report_files for f in files], jobs)
+    
+    strategies = {}
+    for name, label, files in report_files:
+        print(f"Processing {label}...")
+        frames = [parse_csv_trades(f) if f.endswith('.csv') else parse_xlsx_trades(f)
+                  for f in files]
+        strategies[name] = combine_trades(frames)
     
     return strategies
 
@@ -335,23 +182,13 @@ def get_strategy_data():
 def calculate_yearly_returns(strategies):
     """Calculate year-by-year returns for each strategy."""
     
-    years = [2020, 2021, 2022, 2023, 2024, 2025]
+    years = YEARS
     
     results = {}
     
     for strategy_name, trades in strategies.items():
-        if not trades:
-            results[strategy_name] = {year: 0.0 for year in years}
-            continue
-        
-        yearly_profits = {year: 0.0 for year in years}
-        
-        for trade in trades:
-            year = trade['year']
-            if year in yearly_profits:
-                yearly_profits[year] += trade['profit']
-        
-        results[strategy_name] = yearly_profits
+        yearly = trades.groupby('year')['profit'].sum() if len(trades) else pd.Series(dtype=float)
+        results[strategy_name] = {year: float(yearly.get(year, 0.0)) for year in years}
     
     return results
 
@@ -359,244 +196,120 @@ def calculate_yearly_returns(strategies):
 def create_excel_with_formulas(results, output_path):
     """Create Excel file with formulas for yearly returns analysis."""
     
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Yearly Returns Analysis"
-    
-    # Styling
-    header_fill = PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    total_fill = PatternFill(start_color="2E75B6", end_color="2E75B6", fill_type="solid")
-    total_font = Font(bold=True, color="FFFFFF", size=11)
-    positive_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-    negative_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
     years = [2020, 2021, 2022, 2023, 2024, 2025]
     strategies = list(results.keys())
     
+    wb = new_workbook(SHEET_STYLES)
+    widths = {'A': 32}
+    for col in range(2, 10):
+        widths[get_column_letter(col)] = 14
+    ws = new_sheet(wb, "Yearly Returns Analysis", widths=widths)
+    
     # Title
-    ws.merge_cells('A1:J1')
-    ws['A1'] = "Year-by-Year Return Distribution Analysis - All 8 Trading Strategies"
-    ws['A1'].font = Font(bold=True, size=16)
-    ws['A1'].alignment = Alignment(horizontal='center')
+    write_row(ws, 1, ["Year-by-Year Return Distribution Analysis - All 8 Trading Strategies"], 'Title', merge_to=10)
     
     # Generated date
-    ws.merge_cells('A2:J2')
-    ws['A2'] = f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-    ws['A2'].alignment = Alignment(horizontal='center')
+    write_row(ws, 2, [f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"], 'Subtitle', merge_to=10)
     
     # Section 1: Raw Profit Data (for formulas to reference)
-    ws['A4'] = "SECTION 1: YEARLY PROFIT DATA ($)"
-    ws['A4'].font = Font(bold=True, size=14)
+    write_row(ws, 4, ["SECTION 1: YEARLY PROFIT DATA ($)"], 'Section')
     
     # Headers for profit data
     headers = ['Strategy'] + [str(year) for year in years] + ['Total Profit', 'Avg Yearly']
     start_row = 6
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=start_row, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = border
+    write_row(ws, start_row, headers, 'Column Header')
     
     # Data rows with raw profit values
     for row_idx, strategy in enumerate(strategies, start_row + 1):
-        # Strategy name
-        ws.cell(row=row_idx, column=1, value=strategy).border = border
-        
-        # Yearly profits
-        for col_idx, year in enumerate(years, 2):
-            profit = results[strategy][year]
-            cell = ws.cell(row=row_idx, column=col_idx, value=round(profit, 2))
-            cell.number_format = '#,##0.00'
-            cell.border = border
-            cell.alignment = Alignment(horizontal='right')
-            
+        profits = [results[strategy][year] for year in years]
+        write_row(ws, row_idx, [strategy] + [round(profit, 2) for profit in profits] + [
+            # Total Profit and Average Yearly formulas
+            f"=SUM(B{row_idx}:G{row_idx})",
+            f"=AVERAGE(B{row_idx}:G{row_idx})",
+        ], ['Cell'] + [
             # Conditional formatting
-            if profit > 0:
-                cell.fill = positive_fill
-            elif profit < 0:
-                cell.fill = negative_fill
-        
-        # Total Profit formula
-        total_col = len(years) + 2
-        total_cell = ws.cell(row=row_idx, column=total_col)
-        total_cell.value = f"=SUM(B{row_idx}:G{row_idx})"
-        total_cell.number_format = '#,##0.00'
-        total_cell.border = border
-        total_cell.font = Font(bold=True)
-        
-        # Average Yearly formula
-        avg_col = len(years) + 3
-        avg_cell = ws.cell(row=row_idx, column=avg_col)
-        avg_cell.value = f"=AVERAGE(B{row_idx}:G{row_idx})"
-        avg_cell.number_format = '#,##0.00'
-        avg_cell.border = border
+            'Profit Up' if profit > 0 else 'Profit Down' if profit < 0 else 'Profit'
+            for profit in profits
+        ] + ['Row Total', 'Number'])
     
     # Total row for all strategies
     total_row = start_row + len(strategies) + 1
-    ws.cell(row=total_row, column=1, value="PORTFOLIO TOTAL").font = total_font
-    ws.cell(row=total_row, column=1).fill = total_fill
-    ws.cell(row=total_row, column=1).border = border
-    
-    for col_idx, year in enumerate(years, 2):
-        cell = ws.cell(row=total_row, column=col_idx)
-        col_letter = get_column_letter(col_idx)
-        cell.value = f"=SUM({col_letter}{start_row + 1}:{col_letter}{total_row - 1})"
-        cell.number_format = '#,##0.00'
-        cell.fill = total_fill
-        cell.font = total_font
-        cell.border = border
-    
-    # Total of totals
-    total_col = len(years) + 2
-    total_total = ws.cell(row=total_row, column=total_col)
-    total_total.value = f"=SUM(H{start_row + 1}:H{total_row - 1})"
-    total_total.number_format = '#,##0.00'
-    total_total.fill = total_fill
-    total_total.font = total_font
-    total_total.border = border
-    
-    # Average of averages
-    avg_col = len(years) + 3
-    avg_total = ws.cell(row=total_row, column=avg_col)
-    avg_total.value = f"=AVERAGE(I{start_row + 1}:I{total_row - 1})"
-    avg_total.number_format = '#,##0.00'
-    avg_total.fill = total_fill
-    avg_total.font = total_font
-    avg_total.border = border
+    write_row(ws, total_row, ["PORTFOLIO TOTAL"] + [
+        f"=SUM({get_column_letter(col_idx)}{start_row + 1}:{get_column_letter(col_idx)}{total_row - 1})"
+        for col_idx in range(2, len(years) + 2)
+    ] + [
+        # Total of totals, average of averages
+        f"=SUM(H{start_row + 1}:H{total_row - 1})",
+        f"=AVERAGE(I{start_row + 1}:I{total_row - 1})",
+    ], ['Total'] + ['Total Number'] * (len(years) + 2))
     
     # Section 2: Percentage Distribution
     section2_start = total_row + 3
-    ws.cell(row=section2_start, column=1, value="SECTION 2: YEARLY PROFIT AS % OF TOTAL PROFIT").font = Font(bold=True, size=14)
+    write_row(ws, section2_start, ["SECTION 2: YEARLY PROFIT AS % OF TOTAL PROFIT"], 'Section')
     
+    # 'Avg Yearly' is left out and the total column becomes "Total %"
     header_row2 = section2_start + 2
-    for col, header in enumerate(headers[:-1], 1):  # Exclude 'Avg Yearly' for this section
-        cell = ws.cell(row=header_row2, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = border
-    
-    # Add "% of Total" header
-    cell = ws.cell(row=header_row2, column=len(headers) - 1, value="Total %")
-    cell.fill = header_fill
-    cell.font = header_font
-    cell.alignment = Alignment(horizontal='center')
-    cell.border = border
+    write_row(ws, header_row2, headers[:-2] + ["Total %"], 'Column Header')
     
     # Percentage data rows
     for row_idx, strategy in enumerate(strategies, header_row2 + 1):
         data_source_row = start_row + 1 + (row_idx - header_row2 - 1)
-        
-        ws.cell(row=row_idx, column=1, value=strategy).border = border
-        
-        for col_idx, year in enumerate(years, 2):
-            cell = ws.cell(row=row_idx, column=col_idx)
-            col_letter = get_column_letter(col_idx)
-            # Formula: year profit / total profit (with error handling for zero division)
-            cell.value = f"=IF(H{data_source_row}=0,0,{col_letter}{data_source_row}/H{data_source_row})"
-            cell.number_format = '0.00%'
-            cell.border = border
-            cell.alignment = Alignment(horizontal='right')
-        
+        # Formula: year profit / total profit (with error handling for zero division)
+        shares = [
+            f"=IF(H{data_source_row}=0,0,{get_column_letter(col_idx)}{data_source_row}/H{data_source_row})"
+            for col_idx in range(2, len(years) + 2)
+        ]
         # Total percentage (should always be 100% or 0%)
-        total_pct_cell = ws.cell(row=row_idx, column=len(years) + 2)
-        total_pct_cell.value = f"=SUM(B{row_idx}:G{row_idx})"
-        total_pct_cell.number_format = '0.00%'
-        total_pct_cell.border = border
-        total_pct_cell.font = Font(bold=True)
+        write_row(ws, row_idx, [strategy] + shares + [f"=SUM(B{row_idx}:G{row_idx})"],
+                  ['Cell'] + ['Share'] * len(years) + ['Share Total'])
     
     # Section 3: Year-over-Year Growth
     section3_start = header_row2 + len(strategies) + 3
-    ws.cell(row=section3_start, column=1, value="SECTION 3: YEAR-OVER-YEAR PROFIT COMPARISON").font = Font(bold=True, size=14)
+    write_row(ws, section3_start, ["SECTION 3: YEAR-OVER-YEAR PROFIT COMPARISON"], 'Section')
     
     header_row3 = section3_start + 2
     yoy_headers = ['Strategy', '2020→2021', '2021→2022', '2022→2023', '2023→2024', '2024→2025']
-    for col, header in enumerate(yoy_headers, 1):
-        cell = ws.cell(row=header_row3, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = border
+    write_row(ws, header_row3, yoy_headers, 'Column Header')
     
     # YoY change data rows
+    year_cols = ['B', 'C', 'D', 'E', 'F', 'G']
     for row_idx, strategy in enumerate(strategies, header_row3 + 1):
         data_source_row = start_row + 1 + (row_idx - header_row3 - 1)
-        
-        ws.cell(row=row_idx, column=1, value=strategy).border = border
-        
-        # YoY change formulas
-        year_cols = ['B', 'C', 'D', 'E', 'F', 'G']
-        for col_idx in range(2, 7):
-            cell = ws.cell(row=row_idx, column=col_idx)
-            prev_col = year_cols[col_idx - 2]
-            curr_col = year_cols[col_idx - 1]
-            cell.value = f"={curr_col}{data_source_row}-{prev_col}{data_source_row}"
-            cell.number_format = '#,##0.00'
-            cell.border = border
-            cell.alignment = Alignment(horizontal='right')
+        changes = [f"={curr_col}{data_source_row}-{prev_col}{data_source_row}"
+                   for prev_col, curr_col in zip(year_cols, year_cols[1:])]
+        write_row(ws, row_idx, [strategy] + changes, ['Cell'] + ['Profit'] * len(changes))
     
     # Section 4: Portfolio Contribution Analysis
     section4_start = header_row3 + len(strategies) + 3
-    ws.cell(row=section4_start, column=1, value="SECTION 4: STRATEGY CONTRIBUTION TO YEARLY PORTFOLIO PROFIT (%)").font = Font(bold=True, size=14)
+    write_row(ws, section4_start, ["SECTION 4: STRATEGY CONTRIBUTION TO YEARLY PORTFOLIO PROFIT (%)"], 'Section')
     
     header_row4 = section4_start + 2
-    for col, header in enumerate(headers[:len(years)+1], 1):
-        cell = ws.cell(row=header_row4, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = border
+    write_row(ws, header_row4, headers[:len(years)+1], 'Column Header')
     
     # Contribution percentage rows
     for row_idx, strategy in enumerate(strategies, header_row4 + 1):
         data_source_row = start_row + 1 + (row_idx - header_row4 - 1)
-        
-        ws.cell(row=row_idx, column=1, value=strategy).border = border
-        
-        for col_idx, year in enumerate(years, 2):
-            cell = ws.cell(row=row_idx, column=col_idx)
+        # Formula: strategy yearly profit / portfolio yearly profit (with error handling)
+        shares = []
+        for col_idx in range(2, len(years) + 2):
             col_letter = get_column_letter(col_idx)
-            # Formula: strategy yearly profit / portfolio yearly profit (with error handling)
-            cell.value = f"=IF({col_letter}{total_row}=0,0,{col_letter}{data_source_row}/{col_letter}{total_row})"
-            cell.number_format = '0.00%'
-            cell.border = border
-            cell.alignment = Alignment(horizontal='right')
+            shares.append(f"=IF({col_letter}{total_row}=0,0,{col_letter}{data_source_row}/{col_letter}{total_row})")
+        write_row(ws, row_idx, [strategy] + shares, ['Cell'] + ['Share'] * len(years))
     
     # Total row (should be 100%)
     total_row4 = header_row4 + len(strategies) + 1
-    ws.cell(row=total_row4, column=1, value="TOTAL").font = total_font
-    ws.cell(row=total_row4, column=1).fill = total_fill
-    ws.cell(row=total_row4, column=1).border = border
-    
-    for col_idx in range(2, len(years) + 2):
-        cell = ws.cell(row=total_row4, column=col_idx)
-        col_letter = get_column_letter(col_idx)
-        cell.value = f"=SUM({col_letter}{header_row4 + 1}:{col_letter}{total_row4 - 1})"
-        cell.number_format = '0.00%'
-        cell.fill = total_fill
-        cell.font = total_font
-        cell.border = border
+    write_row(ws, total_row4, ["TOTAL"] + [
+        f"=SUM({get_column_letter(col_idx)}{header_row4 + 1}:{get_column_letter(col_idx)}{total_row4 - 1})"
+        for col_idx in range(2, len(years) + 2)
+    ], ['Total'] + ['Total Share'] * len(years))
     
     # Section 5: Summary Statistics
     section5_start = total_row4 + 3
-    ws.cell(row=section5_start, column=1, value="SECTION 5: SUMMARY STATISTICS").font = Font(bold=True, size=14)
+    write_row(ws, section5_start, ["SECTION 5: SUMMARY STATISTICS"], 'Section')
     
     stats_start = section5_start + 2
     stats_headers = ['Metric', 'Value', 'Formula Used']
-    for col, header in enumerate(stats_headers, 1):
-        cell = ws.cell(row=stats_start, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = border
+    write_row(ws, stats_start, stats_headers, 'Column Header Left')
     
     stats = [
         ('Best Single Year (All Strategies)', f"=MAX(B{total_row}:G{total_row})", 'MAX of portfolio yearly totals'),
@@ -611,31 +324,23 @@ def create_excel_with_formulas(results, output_path):
     
     for row_offset, (metric, formula, description) in enumerate(stats):
         row = stats_start + row_offset + 1
-        ws.cell(row=row, column=1, value=metric).border = border
-        cell = ws.cell(row=row, column=2, value=formula)
-        cell.number_format = '#,##0.00' if 'Best' not in metric and 'Worst' not in metric.split()[0] else '@'
-        cell.border = border
-        ws.cell(row=row, column=3, value=description).border = border
-    
-    # Adjust column widths
-    ws.column_dimensions['A'].width = 32
-    for col in range(2, 10):
-        ws.column_dimensions[get_column_letter(col)].width = 14
-    ws.column_dimensions['C'].width = 14  # Adjust for formula column in stats
+        value_style = 'Number' if 'Best' not in metric and 'Worst' not in metric.split()[0] else 'Text'
+        write_row(ws, row, [metric, formula, description], ['Cell', value_style, 'Cell'])
     
-    # Save workbook
-    wb.save(output_path)
-    print(f"\nExcel file saved to: {output_path}")
+    # Save workbook (formulas carry cached values for readers other than Excel)
+    cached, uncached = save_workbook(wb, output_path)
+    print(f"\nExcel file saved to: {output_path} ({cached} formula values cached"
+          f"{f', {uncached} left to Excel' if uncached else ''})")
 
 
-def main():
+def main(jobs=1):
     print("=" * 60)
     print("Year-by-Year Return Analysis for All 8 Trading Strategies")
     print("=" * 60 + "\n")
     
     # Collect trade data from all strategies
     print("Collecting trade data from all strategies...\n")
-    strategies = get_strategy_data()
+    strategies = get_strategy_data(jobs)
     
     # Show trade counts
     print("\n" + "-" * 40)
@@ -687,4 +392,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Year-by-year return analysis")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="worker processes used to parse reports (default 1)")
+    main(jobs=parser.parse_args().jobs)